@@ -1,16 +1,22 @@
 import streamlit as st
 import json
-import torch
 import sys
 import os
+import shutil
+import tempfile
+import time
 
 # Add the root directory to Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(project_root)
 
 from sentence_transformers import SentenceTransformer
-from src.webscraping_agent import scrape_website, chunk_text, generate_embeddings
-from src.content_manager import generate_faq_responses, save_autogen_responses, load_autogen_responses
+from src.content_manager import save_autogen_responses
+from src.faq_index import FAQIndex
+from src.faq_records import ensure_faq_ids, faq_text, faq_texts, load_all_faqs, load_faq_records, new_faq_id, save_faq_records
+from src.ingestion_jobs import DEFAULT_TENANT, DONE, FAILED, TENANT_PATTERN, JobStore, ensure_worker
+from src.kb_snapshots import SnapshotStore
+from src.webscraping_agent import CHUNKS_FILE, EMBEDDINGS_FILE as WEB_EMBEDDINGS_FILE, RAW_DATA_FILE
 
 # File paths
 EMBEDDINGS_FILE = "data/faq_responses_embeddings.pt"
@@ -21,6 +27,20 @@ BUSINESS_CONFIG_FILE = "data/business_config.json"
 # Initialize model
 model = SentenceTransformer("all-MiniLM-L6-v2")  # Replace with the correct model
 
+# Onboarding runs in a background worker process; this page only queues jobs and polls their progress
+JOB_POLL_SECONDS = 2
+job_store = JobStore()
+
+@st.cache_resource
+def get_faq_index():
+    """The FAQ index this page writes; the chat apps read it and see each edit on their next turn"""
+    return FAQIndex(encode=lambda texts: model.encode(texts, convert_to_tensor=True))
+
+faq_index = get_faq_index()
+
+# Published knowledge-base versions; the chat apps switch between them without a restart
+kb_store = SnapshotStore()
+
 # Utility functions
 def save_business_config(domain_type):
     """
@@ -34,38 +54,62 @@ def save_business_config(domain_type):
 
 def load_manual_faqs():
     """Load additional (manual) Q&A info from the JSON file or initialize an empty list."""
-    if os.path.exists(MANUAL_FAQS_FILE):
-        with open(MANUAL_FAQS_FILE, "r", encoding="utf-8") as file:
-            return json.load(file)
-    return []  # Return an empty list if the file doesn't exist
+    return load_faq_records(MANUAL_FAQS_FILE)
 
 def save_manual_faqs(manual_faqs):
     """Save additional (manual) Q&A info to the JSON file."""
-    os.makedirs(os.path.dirname(MANUAL_FAQS_FILE), exist_ok=True)
-    with open(MANUAL_FAQS_FILE, "w", encoding="utf-8") as file:
-        json.dump(manual_faqs, file, indent=4)
+    save_faq_records(manual_faqs, MANUAL_FAQS_FILE)
+
+def load_autogen_faqs():
+    """Load auto-generated FAQs, giving records from older files a stable ID"""
+    return load_faq_records(AUTOGEN_FAQS_FILE)
 
 def generate_combined_embeddings():
     """
-    Generate embeddings by combining auto-generated FAQs and additional (manual) Q&A.
+    Bring the FAQ index in line with auto-generated FAQs and additional (manual) Q&A, then publish
+    them as a new knowledge-base version. Only records added or changed since the last sync are encoded.
     """
-    # Load auto-generated FAQs and additional (manual) Q&A
-    autogen_faqs = load_autogen_responses() if os.path.exists(AUTOGEN_FAQS_FILE) else []
-    manual_faqs = load_manual_faqs() if os.path.exists(MANUAL_FAQS_FILE) else []
-
-    # Combine both datasets
-    combined_faqs = autogen_faqs + manual_faqs
-
-    # Prepare texts for embeddings (using question and answer)
-    texts = [f"Question: {faq['question']} Answer: {faq['answer']}" for faq in combined_faqs]
-
-    # Generate embeddings
-    embeddings = model.encode(texts, convert_to_tensor=True)
-
-    # Save embeddings and text
-    os.makedirs(os.path.dirname(EMBEDDINGS_FILE), exist_ok=True)
-    torch.save({"embeddings": embeddings, "texts": texts}, EMBEDDINGS_FILE)
-    st.success("Unified embeddings generated successfully!")
+    counts = faq_index.sync(faq_texts(load_all_faqs(AUTOGEN_FAQS_FILE, MANUAL_FAQS_FILE)))
+
+    # Site data is carried over from the current version; a tree without one starts from the files in data/
+    files = {os.path.basename(path): path for path in (AUTOGEN_FAQS_FILE, MANUAL_FAQS_FILE, BUSINESS_CONFIG_FILE)
+             if os.path.exists(path)}
+    if kb_store.current_version() is None:
+        files.update({os.path.basename(path): path for path in (RAW_DATA_FILE, CHUNKS_FILE, WEB_EMBEDDINGS_FILE)
+                      if os.path.exists(path)})
+    export_dir = tempfile.mkdtemp(prefix="faq_export_")
+    try:
+        files[os.path.basename(EMBEDDINGS_FILE)] = os.path.join(export_dir, os.path.basename(EMBEDDINGS_FILE))
+        faq_index.export(files[os.path.basename(EMBEDDINGS_FILE)])
+        version = kb_store.build_and_publish(files, source="business setup", info={"faqs": len(faq_index)})
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+    faq_index.mark_snapshot(version)
+    st.success(f"Unified embeddings updated: {counts['encoded']} encoded, "
+               f"{counts['unchanged']} unchanged, {counts['deleted']} removed. Published version {version}.")
+
+def follow_published_snapshot():
+    """Once an onboarding has published a new version, sync the FAQ index to it so edits are live again"""
+    current = kb_store.current_version()
+    if current is not None and faq_index.snapshot_version != current:
+        faq_index.sync(faq_texts(load_all_faqs(AUTOGEN_FAQS_FILE, MANUAL_FAQS_FILE)), snapshot_version=current)
+
+def roll_back_knowledge_base():
+    """Publish the previous version and restore the FAQ records it was built from"""
+    version = kb_store.rollback()
+    if version is None:
+        st.error("There is no earlier version to roll back to.")
+        return
+    published = kb_store.manifest(version)["files"]
+    for path in (AUTOGEN_FAQS_FILE, MANUAL_FAQS_FILE):
+        if os.path.basename(path) in published:
+            shutil.copyfile(kb_store.path(version, os.path.basename(path)), f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+    st.session_state.manual_faqs = load_manual_faqs()
+    faq_index.sync(faq_texts(load_all_faqs(AUTOGEN_FAQS_FILE, MANUAL_FAQS_FILE)), snapshot_version=version)
+    st.success(f"Rolled back to version {version}.")
+
+follow_published_snapshot()
 
 # App Title
 st.title("Business Interface - AI Assistant Setup")
@@ -88,32 +132,58 @@ if st.button("Save Business Type"):
 st.header("Step 2: Enter Business Website")
 business_url = st.text_input("Website URL", placeholder="Enter your business website URL here")
 
+tenant = st.text_input("Tenant", value=DEFAULT_TENANT,
+                       help="Onboardings for different tenants run in parallel; 'default' publishes to data/.")
+
 if st.button("Scrape Website"):
-    if business_url:
-        with st.spinner("Scraping website..."):
-            # Scrape raw text
-            raw_text = scrape_website(business_url)
-            st.success("Website content scraped successfully!")
-
-            # Chunk text and generate embeddings
-            with st.spinner("Processing chunks and generating embeddings..."):
-                chunks = chunk_text(raw_text)
-                generate_embeddings(chunks)
-                st.success("Chunks and embeddings generated successfully!")
-
-            # Generate FAQ-based structured chunks
-            with st.spinner("Generating FAQ responses..."):
-                generate_faq_responses()
-                st.success("FAQ responses generated successfully!")
-        st.info("Proceed to Step 3 to review and edit FAQs.")
+    if not TENANT_PATTERN.fullmatch(tenant):
+        st.error("Tenant names may only contain letters, digits, '-' and '_'.")
+    elif business_url:
+        # Scraping, chunking, embedding and FAQ generation survive a browser refresh
+        job = job_store.submit(tenant, business_url, domain_type.lower().replace(" ", "_"))
+        ensure_worker()
+        st.success(f"Onboarding job {job.job_id} queued.")
     else:
         st.error("Please enter a valid website URL.")
 
+def show_job_progress(job):
+    """Stage-by-stage progress of an onboarding job, as persisted by the worker"""
+    st.write(f"Job `{job.job_id}`: **{job.status}** (attempt {max(job.attempts, 1)})")
+    for name, state in job.stages.items():
+        counts = dict(state.get("progress", {}))
+        throughput = counts.pop("throughput", None)
+        done, total = {
+            "ingest": ("pages_fetched", "pages_total"),
+            "faq": ("faqs_generated", "faqs_total")
+        }.get(name, (None, None))
+        label = f"{name}: {state['status']}" + (f" ({', '.join(f'{k} {v}' for k, v in counts.items())})" if counts else "")
+        if total and counts.get(total):
+            st.progress(min(1.0, counts.get(done, 0) / counts[total]), text=label)
+        else:
+            st.progress(1.0 if state["status"] == DONE else 0.0, text=label)
+        if throughput:
+            # Per-stage throughput of the overlapped fetch -> extract -> dedup -> chunk -> embed -> write pipeline
+            with st.expander(f"{name} stage throughput"):
+                st.json(throughput)
+    if job.status == FAILED:
+        st.error(f"Failed: {job.error}")
+        if st.button("Retry from the failed stage", key=f"retry_{job.job_id}"):
+            job_store.retry(job.job_id)
+            ensure_worker()
+            st.rerun()
+    elif job.status == DONE:
+        st.info("Proceed to Step 3 to review and edit FAQs.")
+
+latest_jobs = job_store.list_jobs(tenant)
+polling_job = latest_jobs[0] if latest_jobs else None
+if polling_job is not None:
+    show_job_progress(polling_job)
+
 # Step 3: Review and Edit Auto-Generated FAQ Responses
 st.header("Step 3: Review and Edit Auto-Generated FAQ Responses")
 
 if os.path.exists(AUTOGEN_FAQS_FILE):
-    autogen_faqs = load_autogen_responses()
+    autogen_faqs = load_autogen_faqs()
     
     if not autogen_faqs:
         st.info("No auto-generated FAQs available. The file exists but is empty.")
@@ -122,15 +192,18 @@ if os.path.exists(AUTOGEN_FAQS_FILE):
             # Define callback functions for this FAQ
             def update_autogen_faq(idx=idx):
                 autogen_faqs[idx] = {
+                    "id": autogen_faqs[idx]["id"],
                     "question": st.session_state[f"autogen_question_{idx}"],
                     "answer": st.session_state[f"autogen_answer_{idx}"],
                     "metadata": [tag.strip() for tag in st.session_state[f"autogen_metadata_{idx}"].split(",")]
                 }
                 save_autogen_responses(autogen_faqs)
+                faq_index.upsert(autogen_faqs[idx]["id"], faq_text(autogen_faqs[idx]))
 
             def delete_autogen_faq(idx=idx):
-                autogen_faqs.pop(idx)
+                removed = autogen_faqs.pop(idx)
                 save_autogen_responses(autogen_faqs)
+                faq_index.delete(removed["id"])
 
             # Create expandable section for each FAQ
             with st.expander(f"FAQ #{idx + 1}: {faq['question'][:80]}..."):
@@ -170,6 +243,8 @@ st.header("Step 4: Add Additional Q&A")
 # Initialize session state for manual Q&A
 if "manual_faqs" not in st.session_state:
     st.session_state.manual_faqs = load_manual_faqs()  # Load existing FAQs from file
+elif ensure_faq_ids(st.session_state.manual_faqs):
+    save_manual_faqs(st.session_state.manual_faqs)  # Q&A kept in the session from before IDs existed
 if "form_submitted" not in st.session_state:
     st.session_state.form_submitted = False
 
@@ -177,12 +252,15 @@ if "form_submitted" not in st.session_state:
 def handle_form_submission():
     if st.session_state.new_question.strip() and st.session_state.new_answer.strip():
         metadata_list = [tag.strip() for tag in st.session_state.new_metadata.split(",")] if st.session_state.new_metadata else []
-        st.session_state.manual_faqs.append({
+        new_faq = {
+            "id": new_faq_id(),
             "question": st.session_state.new_question,
             "answer": st.session_state.new_answer,
             "metadata": metadata_list
-        })
+        }
+        st.session_state.manual_faqs.append(new_faq)
         save_manual_faqs(st.session_state.manual_faqs)
+        faq_index.upsert(new_faq["id"], faq_text(new_faq))
         st.session_state.form_submitted = True
         
         # Reset form by updating the keys
@@ -217,15 +295,18 @@ if st.session_state.manual_faqs:
             # Callback functions for update and delete
             def update_qa(idx=idx):
                 st.session_state.manual_faqs[idx] = {
+                    "id": st.session_state.manual_faqs[idx]["id"],
                     "question": st.session_state[f"edit_question_{idx}"],
                     "answer": st.session_state[f"edit_answer_{idx}"],
                     "metadata": [tag.strip() for tag in st.session_state[f"edit_metadata_{idx}"].split(",")]
                 }
                 save_manual_faqs(st.session_state.manual_faqs)
+                faq_index.upsert(st.session_state.manual_faqs[idx]["id"], faq_text(st.session_state.manual_faqs[idx]))
 
             def delete_qa(idx=idx):
-                st.session_state.manual_faqs.pop(idx)
+                removed = st.session_state.manual_faqs.pop(idx)
                 save_manual_faqs(st.session_state.manual_faqs)
+                faq_index.delete(removed["id"])
 
             st.text_input("Question", 
                          value=faq["question"],
@@ -248,6 +329,21 @@ if st.session_state.manual_faqs:
 st.header("Step 5: Complete AI Assistant Setup")
 
 if st.button("Complete Setup"):
-    with st.spinner("Generating unified embeddings for your AI Assistant..."):
+    with st.spinner("Updating unified embeddings for your AI Assistant..."):
         generate_combined_embeddings()
-        st.success("Your AI Assistant is ready to rock!")
\ No newline at end of file
+        st.success("Your AI Assistant is ready to rock!")
+
+with st.expander("Published Versions"):
+    current_version = kb_store.current_version()
+    for version in reversed(kb_store.versions()):
+        manifest = kb_store.manifest(version)
+        published_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(manifest["created_at"]))
+        marker = " (live)" if version == current_version else ""
+        st.write(f"`{version}`{marker}: {manifest['source']}, {published_at}, {len(manifest['files'])} files")
+    st.button("Roll back to previous version", on_click=roll_back_knowledge_base,
+              disabled=len(kb_store.versions()) < 2)
+
+# Poll the onboarding job until it finishes
+if polling_job is not None and polling_job.active:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
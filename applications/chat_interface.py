@@ -6,12 +6,12 @@ import os
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(project_root)
 
-from src.llm_service import LLMService, generate_session_id
+from src.llm_service import create_llm_service, generate_session_id
 
 # Initialize LLM Service
 @st.cache_resource
 def get_llm_service():
-    return LLMService()
+    return create_llm_service()
 
 # Get or create LLM service instance
 llm_service = get_llm_service()
@@ -1,22 +1,34 @@
 import streamlit as st
 import sys
 import os
+import threading
 from datetime import datetime
 
 # Add the src directory to Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(project_root)
 
-from src.llm_service import LLMService
+from src.llm_service import create_llm_service, speculation_stats
 from src.voice_interface import VoiceInterface
+from src.tts_cache import TTS_PREWARM_ENV
+from src.audio_codecs import SYNTHESIS_ENCODINGS, UPLOAD_ENCODERS
+from src.upstream_scheduler import PRIORITY_LIVE_VOICE, get_scheduler
 
 # Initialize LLM Service
-llm_service = LLMService()
+@st.cache_resource
+def get_llm_service():
+    return create_llm_service()
+
+llm_service = get_llm_service()
 
 # Initialize Voice Interface
 @st.cache_resource
 def get_voice_interface():
-    return VoiceInterface()
+    voice_interface = VoiceInterface()
+    if os.getenv(TTS_PREWARM_ENV, "1") != "0":
+        # Fill the TTS cache with canned responses and FAQ answers while the app starts
+        threading.Thread(target=voice_interface.prewarm_tts, name="tts-prewarm", daemon=True).start()
+    return voice_interface
 
 voice_interface = get_voice_interface()
 
@@ -36,6 +48,12 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "recording" not in st.session_state:
     st.session_state.recording = False
+if "pipelined_speech" not in st.session_state:
+    st.session_state.pipelined_speech = False
+if "speech_timings" not in st.session_state:
+    st.session_state.speech_timings = None
+if "turn_latency" not in st.session_state:
+    st.session_state.turn_latency = None
 
 # Settings and Controls Section
 with st.sidebar:
@@ -49,35 +67,141 @@ with st.sidebar:
     # Display Session ID
     st.text(f"Session ID: {st.session_state.session_id}")
 
+    # Stream audio to speech-to-text while recording so the transcript is ready when recording stops
+    voice_interface.streaming = st.checkbox(
+        "Streaming transcription", value=voice_interface.streaming, disabled=st.session_state.recording
+    )
+    # End the turn automatically when the caller stops speaking
+    voice_interface.endpointing = st.checkbox(
+        "Hands-free (end turn on silence)", value=voice_interface.endpointing, disabled=st.session_state.recording
+    )
+    # Keep listening while the reply plays so the caller can interrupt it
+    voice_interface.full_duplex = voice_interface.endpointing and st.checkbox(
+        "Full duplex (barge-in)", value=voice_interface.full_duplex, disabled=not voice_interface.endpointing
+    )
+
+    # Compressed audio cuts upload and download size on slow links
+    voice_interface.upload_encoding = st.selectbox(
+        "Upload codec", list(UPLOAD_ENCODERS), index=list(UPLOAD_ENCODERS).index(voice_interface.upload_encoding)
+    )
+    voice_interface.tts_encoding = st.selectbox(
+        "Speech codec", SYNTHESIS_ENCODINGS, index=SYNTHESIS_ENCODINGS.index(voice_interface.tts_encoding)
+    )
+
+    # Speak each sentence as soon as the LLM finishes it instead of waiting for the whole reply
+    st.session_state.pipelined_speech = st.checkbox(
+        "Pipelined speech", value=st.session_state.pipelined_speech
+    )
+    # End of the caller's speech to the first audio of the reply, by stage
+    if st.session_state.turn_latency:
+        with st.expander("Last Turn Latency"):
+            st.json(st.session_state.turn_latency)
+    if st.session_state.speech_timings:
+        with st.expander("Last Response Timings"):
+            st.json(st.session_state.speech_timings)
+
+    # Turns prepared from interim transcripts (streaming transcription only)
+    with st.expander("Speculative Retrieval"):
+        st.json(speculation_stats)
+
+    # Upstream queue depth and admission wait times
+    with st.expander("Upstream Load"):
+        st.json(get_scheduler().stats())
+
+    # Synthesized audio reused across turns
+    with st.expander("TTS Cache"):
+        st.json({
+            **voice_interface.tts_cache.stats,
+            "files": len(voice_interface.tts_cache),
+            "megabytes": round(voice_interface.tts_cache.size_bytes() / 1e6, 1)
+        })
+
+def speak_response(user_text, trace=None):
+    """Answer the caller and speak the answer; a traced turn is saved with its stage timings"""
+    try:
+        if st.session_state.pipelined_speech:
+            # Sentences are spoken while the rest of the reply is generated
+            with st.chat_message("assistant"):
+                placeholder = st.empty()
+                shown = []
+                def show(piece):
+                    shown.append(piece)
+                    placeholder.markdown("".join(shown))
+                response, timings = voice_interface.speak_stream(
+                    llm_service.handle_chat_stream(
+                        user_text, st.session_state.session_id, priority=PRIORITY_LIVE_VOICE, trace=trace
+                    ),
+                    on_text=show
+                )
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.speech_timings = timings.as_dict()
+            return
+
+        with st.spinner("Generating response..."):
+            response = llm_service.handle_chat(
+                user_text, st.session_state.session_id, priority=PRIORITY_LIVE_VOICE, trace=trace
+            )
+            st.chat_message("assistant").markdown(response)
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            
+            audio_file = voice_interface.text_to_speech(response)
+            if audio_file:
+                voice_interface.speak(audio_file)
+    finally:
+        if trace is not None:
+            # Normally finished when the first audio played; a reply that never played is saved without a latency
+            trace.abandon()
+            st.session_state.turn_latency = trace.to_turn_fields()
+
+def speculate_on(session_id):
+    """Transcript callback: prepare the turn from interim transcripts while the caller is talking"""
+    def on_transcript(result):
+        if not result.is_final:
+            llm_service.speculate(session_id, result.text)
+    return on_transcript
+
+def respond_to_recording():
+    """Transcribe the recorded utterance, answer it and speak the answer"""
+    with st.spinner("Transcribing..."):
+        transcribed_text = voice_interface.finish_transcription()
+    if not transcribed_text:
+        llm_service.cancel_speculation(st.session_state.session_id)
+        return
+    st.chat_message("user").markdown(transcribed_text)
+    st.session_state.messages.append({"role": "user", "content": transcribed_text})
+
+    speak_response(transcribed_text, trace=voice_interface.turn_trace)
+
 # Voice Recording Interface
 st.header("Voice Controls")
 col1, col2 = st.columns(2)
 
 with col1:
-    if st.button(
+    if voice_interface.endpointing:
+        if st.button("🎤 Speak", type="primary"):
+            while True:
+                if not voice_interface.is_recording:
+                    voice_interface.start_recording(on_transcript=speculate_on(st.session_state.session_id))
+                with st.spinner("Listening..."):
+                    spoke = voice_interface.wait_for_utterance()
+                if not spoke:
+                    st.info("No speech detected.")
+                    break
+                respond_to_recording()
+                if not voice_interface.full_duplex:
+                    break
+                # Full duplex: the microphone stayed open during the reply, so the next turn may already be recorded
+    elif st.button(
         "🎤 Start Recording" if not st.session_state.recording else "⏹️ Stop Recording",
         type="primary" if not st.session_state.recording else "secondary"
     ):
         if not st.session_state.recording:
-            voice_interface.start_recording()
+            voice_interface.start_recording(on_transcript=speculate_on(st.session_state.session_id))
             st.session_state.recording = True
         else:
             voice_interface.stop_recording()
             st.session_state.recording = False
-            
-            with st.spinner("Transcribing..."):
-                transcribed_text = voice_interface.transcribe_audio()
-                if transcribed_text:
-                    st.chat_message("user").markdown(transcribed_text)
-                    st.session_state.messages.append({"role": "user", "content": transcribed_text})
-
-                    with st.spinner("Generating response..."):
-                        response = llm_service.handle_chat(transcribed_text, st.session_state.session_id)
-                        st.chat_message("assistant").markdown(response)
-                        st.session_state.messages.append({"role": "assistant", "content": response})
-                        
-                        audio_file = voice_interface.text_to_speech(response)
-                        voice_interface.play_audio_response(audio_file)
+            respond_to_recording()
 
 with col2:
     if st.session_state.recording:
@@ -94,10 +218,6 @@ if text_input := st.chat_input("Type your message here..."):
     st.chat_message("user").markdown(text_input)
     st.session_state.messages.append({"role": "user", "content": text_input})
     
-    with st.spinner("Generating response..."):
-        response = llm_service.handle_chat(text_input, st.session_state.session_id)
-        st.chat_message("assistant").markdown(response)
-        st.session_state.messages.append({"role": "assistant", "content": response})
-        
-        audio_file = voice_interface.text_to_speech(response)
-        voice_interface.play_audio_response(audio_file)
+    # Typed turns are not traced
+    voice_interface.turn_trace = None
+    speak_response(text_input)
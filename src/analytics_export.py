@@ -0,0 +1,308 @@
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.session_cache import CachedSessionStore
+from src.session_ids import new_ulid
+from src.session_log import LEGACY_SESSION_EXTENSION, SESSION_LOG_EXTENSION
+from src.session_store import FileSessionStore, SessionStore, SQLiteSessionStore, create_session_store
+
+ANALYTICS_DIR = "data/analytics"
+TURNS_DATASET = "turns"  # <ANALYTICS_DIR>/turns/date=YYYY-MM-DD/part-<ulid>.parquet
+EXPORT_STATE_FILE = "export_state.json"
+MAX_BUFFERED_ROWS = 500_000  # rows held in memory before they are written out
+FALLBACK_INTENT = "fallback"
+
+TURN_SCHEMA = pa.schema([
+    ("session_id", pa.string()),
+    ("turn", pa.int32()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("hour", pa.int8()),
+    ("intent", pa.string()),
+    ("fallback", pa.bool_()),
+    ("user_chars", pa.int32()),
+    ("assistant_chars", pa.int32()),
+    # Filled once turns record them; null otherwise
+    ("latency_ms", pa.float64()),
+    ("prompt_tokens", pa.int32()),
+    ("completion_tokens", pa.int32())
+])
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+def turn_row(session_id: str, position: Optional[int], turn: dict) -> Optional[dict]:
+    """Flatten one stored turn into an analytics row; turns without a timestamp are skipped"""
+    timestamp = _parse_timestamp(turn.get("timestamp"))
+    if timestamp is None:
+        return None
+    intent = turn.get("intent")
+    return {
+        "session_id": session_id,
+        "turn": (turn.get("dialogue_state") or {}).get("turns") or position,
+        "timestamp": timestamp,
+        "hour": timestamp.hour,
+        "intent": intent,
+        "fallback": intent == FALLBACK_INTENT,
+        "user_chars": len(turn.get("user") or ""),
+        "assistant_chars": len(turn.get("assistant") or ""),
+        "latency_ms": turn.get("latency_ms"),
+        "prompt_tokens": turn.get("prompt_tokens"),
+        "completion_tokens": turn.get("completion_tokens")
+    }
+
+class SessionExporter:
+    """
+    Incrementally copies chat turns from a session store into a Parquet dataset partitioned by day.
+    The exporter remembers how far it has read (byte offset per JSONL file, last row id for SQLite),
+    so each run only reads turns added since the previous one. State is saved after the new
+    Parquet files are in place: a crash in between re-exports those turns on the next run.
+    A session whose history was replaced (save, reset, migration of a legacy file) has its
+    exported rows removed before it is read again, so rows are never duplicated.
+    """
+
+    def __init__(self, output_dir: str = ANALYTICS_DIR):
+        self.output_dir = output_dir
+        self.dataset_dir = os.path.join(output_dir, TURNS_DATASET)
+        self.state_file = os.path.join(output_dir, EXPORT_STATE_FILE)
+        self.state = self._load_state()
+        self._buffers: Dict[str, Dict[str, list]] = defaultdict(lambda: {name: [] for name in TURN_SCHEMA.names})
+        self._buffered = 0
+        self._exported = 0
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            state = {"files": {}, "sqlite": {}, "dates": {}}
+        # State written before exported dates were tracked: retracting a session scans every day
+        self._dates_known = "dates" in state
+        state.setdefault("dates", {})
+        return state
+
+    def _save_state(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.state, file)
+        os.replace(temp_path, self.state_file)
+
+    # Row buffering
+
+    def _add(self, row: Optional[dict]):
+        if row is None:
+            return
+        date = row["timestamp"].date().isoformat()
+        dates = self.state["dates"].setdefault(row["session_id"], [])
+        if date not in dates:
+            dates.append(date)
+        columns = self._buffers[date]
+        for name in TURN_SCHEMA.names:
+            columns[name].append(row[name])
+        self._buffered += 1
+        self._exported += 1
+        if self._buffered >= MAX_BUFFERED_ROWS:
+            self._write_buffers()
+
+    def _write_buffers(self):
+        for date, columns in self._buffers.items():
+            partition_dir = os.path.join(self.dataset_dir, f"date={date}")
+            os.makedirs(partition_dir, exist_ok=True)
+            path = os.path.join(partition_dir, f"part-{new_ulid()}.parquet")
+            # Dot-prefixed files are ignored by dataset readers until they are renamed into place
+            temp_path = os.path.join(partition_dir, f".{os.path.basename(path)}.tmp")
+            pq.write_table(pa.Table.from_pydict(columns, schema=TURN_SCHEMA), temp_path, compression="zstd")
+            os.replace(temp_path, path)
+        self._buffers.clear()
+        self._buffered = 0
+
+    def _retract(self, session_ids: set):
+        """Remove every exported row of the given sessions, before their replaced history is read again"""
+        if not session_ids or not os.path.isdir(self.dataset_dir):
+            return
+        if self._dates_known:
+            partitions = sorted({f"date={date}" for session_id in session_ids
+                                 for date in self.state["dates"].get(session_id, [])})
+        else:
+            partitions = sorted(os.listdir(self.dataset_dir))
+        for session_id in session_ids:
+            self.state["dates"].pop(session_id, None)
+        value_set = pa.array(sorted(session_ids), pa.string())
+        for partition in partitions:
+            partition_dir = os.path.join(self.dataset_dir, partition)
+            if not os.path.isdir(partition_dir):
+                continue
+            for name in sorted(os.listdir(partition_dir)):
+                if not (name.startswith("part-") and name.endswith(".parquet")):
+                    continue
+                path = os.path.join(partition_dir, name)
+                table = pq.read_table(path, schema=TURN_SCHEMA)
+                kept = table.filter(pc.invert(pc.is_in(table["session_id"], value_set=value_set)))
+                if kept.num_rows == table.num_rows:
+                    continue
+                if kept.num_rows == 0:
+                    os.remove(path)
+                    continue
+                temp_path = os.path.join(partition_dir, f".{name}.tmp")
+                pq.write_table(kept, temp_path, compression="zstd")
+                os.replace(temp_path, path)
+
+    # Sources
+
+    def _export_files(self, store: FileSessionStore):
+        offsets = self.state["files"]
+        directory = store.log.directory
+        # Logs live in shards; legacy JSON arrays not yet migrated sit directly in the directory
+        paths = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.endswith(SESSION_LOG_EXTENSION):
+                    paths[name[:-len(SESSION_LOG_EXTENSION)]] = (os.path.join(root, name), False)
+                elif name.endswith(LEGACY_SESSION_EXTENSION) and root == directory:
+                    # A JSONL log for the same session wins: it is the one appended to
+                    paths.setdefault(name[:-len(LEGACY_SESSION_EXTENSION)], (os.path.join(root, name), True))
+
+        # Find replaced logs and retract their rows before anything is buffered or written
+        pending = []
+        replaced = set()
+        for session_id, (path, legacy) in sorted(paths.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            inode, offset, position = offsets.get(session_id, (None, 0, 0))
+            if inode is not None and (inode != stat.st_ino or stat.st_size < offset
+                                      or (legacy and stat.st_size != offset)):
+                # The log was replaced (reset, rewrite or migration): read it again from the start
+                replaced.add(session_id)
+                offset, position = 0, 0
+            elif inode is not None and stat.st_size == offset:
+                continue
+            pending.append((session_id, path, legacy, stat, offset, position))
+        self._retract(replaced)
+
+        for session_id, path, legacy, stat, offset, position in pending:
+            if legacy:
+                try:
+                    with open(path, "r", encoding="utf-8") as file:
+                        turns = json.load(file)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    continue
+                for position, turn in enumerate(turns, 1):
+                    self._add(turn_row(session_id, position, turn))
+                offsets[session_id] = (stat.st_ino, stat.st_size, len(turns))
+                continue
+            with open(path, "rb") as file:
+                file.seek(offset)
+                data = file.read(stat.st_size - offset)
+            # Leave a record that is still being written for the next run
+            complete = data.rfind(b"\n") + 1
+            for line in data[:complete].split(b"\n"):
+                if not line.strip():
+                    continue
+                try:
+                    turn = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                position += 1
+                self._add(turn_row(session_id, position, turn))
+            offsets[session_id] = (stat.st_ino, offset + complete, position)
+
+    def _export_sqlite(self, store: SQLiteSessionStore):
+        db_key = os.path.abspath(store.db_file)
+        state = self.state["sqlite"].get(db_key, 0)
+        if isinstance(state, int):
+            state = {"last_id": state, "first_rows": {}}
+        first_rows = state["first_rows"]
+        # save() and reset() delete a session's rows: if its first exported row is gone, so is its history
+        present = store.existing_turn_ids(first_rows.values())
+        replaced = {session_id for session_id, row_id in first_rows.items() if row_id not in present}
+        for session_id in replaced:
+            del first_rows[session_id]
+        self._retract(replaced)
+
+        last_id = state["last_id"]
+        for row_id, session_id, turn in store.iter_turns_since(last_id):
+            first_rows.setdefault(session_id, row_id)
+            self._add(turn_row(session_id, None, turn))
+            last_id = row_id
+        state["last_id"] = last_id
+        self.state["sqlite"][db_key] = state
+
+    def export(self, store: SessionStore) -> int:
+        """Export turns added since the last run; returns the number of rows written"""
+        if isinstance(store, CachedSessionStore):
+            store.flush()
+            store = store.store
+        self._exported = 0
+        if isinstance(store, FileSessionStore):
+            self._export_files(store)
+        elif isinstance(store, SQLiteSessionStore):
+            self._export_sqlite(store)
+        else:
+            raise ValueError(f"Cannot export from {type(store).__name__}.")
+        self._write_buffers()
+        self._save_state()
+        return self._exported
+
+    def compact(self, min_parts: int = 2) -> int:
+        """Merge each day's part files into one file; returns the number of days compacted"""
+        compacted = 0
+        if not os.path.isdir(self.dataset_dir):
+            return compacted
+        for partition in sorted(os.listdir(self.dataset_dir)):
+            partition_dir = os.path.join(self.dataset_dir, partition)
+            parts = sorted(os.path.join(partition_dir, name) for name in os.listdir(partition_dir)
+                           if name.startswith("part-") and name.endswith(".parquet"))
+            if len(parts) < min_parts:
+                continue
+            table = pa.concat_tables([pq.read_table(path, schema=TURN_SCHEMA) for path in parts])
+            table = table.sort_by([("timestamp", "ascending")])
+            path = os.path.join(partition_dir, f"part-{new_ulid()}.parquet")
+            temp_path = os.path.join(partition_dir, f".{os.path.basename(path)}.tmp")
+            pq.write_table(table, temp_path, compression="zstd")
+            os.replace(temp_path, path)
+            for old_path in parts:
+                os.remove(old_path)
+            compacted += 1
+        return compacted
+
+def main():
+    parser = argparse.ArgumentParser(description="Export chat session turns to a Parquet dataset for analytics.")
+    parser.add_argument("--store", choices=["file", "sqlite"], default=None,
+                        help="Session store to read (defaults to SESSION_STORE or file)")
+    parser.add_argument("--output-dir", default=ANALYTICS_DIR)
+    parser.add_argument("--compact", action="store_true", help="Merge each day's part files after exporting")
+    args = parser.parse_args()
+
+    exporter = SessionExporter(args.output_dir)
+    store = create_session_store(args.store)
+    rows = exporter.export(store)
+    print(f"Exported {rows} turns to {exporter.dataset_dir}")
+    if args.compact:
+        print(f"Compacted {exporter.compact()} day partitions")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.analytics_export import ANALYTICS_DIR, TURN_SCHEMA, TURNS_DATASET
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+def open_dataset(analytics_dir: str = ANALYTICS_DIR) -> ds.Dataset:
+    return ds.dataset(os.path.join(analytics_dir, TURNS_DATASET), format="parquet",
+                      schema=TURN_SCHEMA.append(pa.field("date", pa.string())), partitioning=PARTITIONING)
+
+def load_turns(columns: List[str],
+               start_date: Optional[str] = None,
+               end_date: Optional[str] = None,
+               analytics_dir: str = ANALYTICS_DIR) -> pa.Table:
+    """
+    Read only the given columns for turns between start_date and end_date (inclusive, YYYY-MM-DD).
+    The date filter prunes whole day partitions before any file is opened.
+    """
+    condition = None
+    if start_date:
+        condition = ds.field("date") >= start_date
+    if end_date:
+        before_end = ds.field("date") <= end_date
+        condition = before_end if condition is None else condition & before_end
+    return open_dataset(analytics_dir).to_table(columns=columns, filter=condition)
+
+COUNT_ALL = pc.CountOptions(mode="all")
+
+def _group(table: pa.Table, key: str, aggregations: list) -> List[Dict]:
+    """Group rows by key; aggregate columns are named <column>_<function> as in pyarrow"""
+    return table.group_by(key).aggregate(aggregations).sort_by([(key, "ascending")]).to_pylist()
+
+def intent_distribution(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        analytics_dir: str = ANALYTICS_DIR) -> List[Dict]:
+    """Turns per detected intent, most frequent first"""
+    table = load_turns(["intent"], start_date, end_date, analytics_dir)
+    total = max(table.num_rows, 1)
+    rows = [{"intent": row["intent"], "turns": row["intent_count"], "share": round(row["intent_count"] / total, 4)}
+            for row in _group(table, "intent", [("intent", "count", COUNT_ALL)])]
+    return sorted(rows, key=lambda row: row["turns"], reverse=True)
+
+def fallback_rate(by: str = "date", start_date: Optional[str] = None, end_date: Optional[str] = None,
+                  analytics_dir: str = ANALYTICS_DIR) -> List[Dict]:
+    """Share of turns that fell back, grouped by "date" or "hour" of day"""
+    table = load_turns([by, "fallback"], start_date, end_date, analytics_dir)
+    table = table.append_column("fallback_turns", pc.cast(table["fallback"], pa.int64()))
+    rows = []
+    for row in _group(table, by, [("fallback_turns", "sum"), ("fallback", "count", COUNT_ALL)]):
+        turns = row["fallback_count"]
+        rows.append({by: row[by], "turns": turns, "fallback_turns": row["fallback_turns_sum"],
+                     "fallback_rate": round(row["fallback_turns_sum"] / turns, 4) if turns else 0.0})
+    return rows
+
+def turns_per_hour(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   analytics_dir: str = ANALYTICS_DIR) -> List[Dict]:
+    """Turns by hour of day (UTC)"""
+    table = load_turns(["hour"], start_date, end_date, analytics_dir)
+    return [{"hour": row["hour"], "turns": row["hour_count"]}
+            for row in _group(table, "hour", [("hour", "count", COUNT_ALL)])]
+
+def session_turn_counts(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        analytics_dir: str = ANALYTICS_DIR) -> Dict:
+    """Number of sessions and the distribution of turns per session"""
+    table = load_turns(["session_id"], start_date, end_date, analytics_dir)
+    if table.num_rows == 0:
+        return {"sessions": 0}
+    turns = table.group_by("session_id").aggregate([("session_id", "count")])["session_id_count"]
+    p50, p95 = pc.quantile(turns, q=[0.5, 0.95]).to_pylist()
+    return {
+        "sessions": len(turns),
+        "turns": table.num_rows,
+        "mean": round(pc.mean(turns).as_py(), 2),
+        "p50": p50,
+        "p95": p95,
+        "max": pc.max(turns).as_py()
+    }
+
+def latency_percentiles(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        analytics_dir: str = ANALYTICS_DIR) -> Dict:
+    """p50/p95/p99 turn latency over turns that recorded one"""
+    latency = load_turns(["latency_ms"], start_date, end_date, analytics_dir)["latency_ms"]
+    recorded = len(latency) - latency.null_count
+    if recorded == 0:
+        return {"turns": 0}
+    p50, p95, p99 = pc.quantile(latency, q=[0.5, 0.95, 0.99]).to_pylist()
+    return {"turns": recorded, "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1)}
+
+def token_usage(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                analytics_dir: str = ANALYTICS_DIR) -> List[Dict]:
+    """Prompt and completion tokens per day"""
+    table = load_turns(["date", "prompt_tokens", "completion_tokens"], start_date, end_date, analytics_dir)
+    return [{"date": row["date"], "prompt_tokens": row["prompt_tokens_sum"], "completion_tokens": row["completion_tokens_sum"]}
+            for row in _group(table, "date", [("prompt_tokens", "sum"), ("completion_tokens", "sum")])]
+
+REPORTS = {
+    "intents": intent_distribution,
+    "fallback": fallback_rate,
+    "hours": turns_per_hour,
+    "sessions": session_turn_counts,
+    "latency": latency_percentiles,
+    "tokens": token_usage
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate exported chat session analytics.")
+    parser.add_argument("report", choices=sorted(REPORTS), nargs="?", default="intents")
+    parser.add_argument("--start", help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--analytics-dir", default=ANALYTICS_DIR)
+    args = parser.parse_args()
+    result = REPORTS[args.report](start_date=args.start, end_date=args.end, analytics_dir=args.analytics_dir)
+    print(json.dumps(result, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
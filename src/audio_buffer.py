@@ -0,0 +1,121 @@
+import io
+import struct
+import threading
+from typing import Iterator, List
+
+MAX_RECORDING_SECONDS = 120  # longest utterance kept; older audio is overwritten beyond this
+
+class AudioRingBuffer:
+    """
+    Preallocated circular buffer for captured PCM audio.
+    Frames are copied in once; readers get memoryview slices of the buffer instead of copies.
+    Memory is fixed at max_seconds of audio however long a call runs: when full, the oldest
+    audio is overwritten. reset() starts the next utterance without reallocating.
+    """
+
+    def __init__(self,
+                 max_seconds: float = MAX_RECORDING_SECONDS,
+                 sample_rate: int = 16000,
+                 sample_width: int = 2,
+                 channels: int = 1):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.bytes_per_second = sample_rate * sample_width * channels
+        frame_size = sample_width * channels
+        self.capacity = int(max_seconds * self.bytes_per_second) // frame_size * frame_size
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        self._written = 0  # total bytes written since reset (the end of the audio, modulo capacity)
+        self._length = 0   # bytes of audio held, at most capacity
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._written = 0
+            self._length = 0
+
+    def write(self, data: bytes):
+        """Append captured audio, overwriting the oldest audio when the buffer is full"""
+        data = memoryview(data).cast("B")
+        with self._lock:
+            if len(data) > self.capacity:
+                # Only the newest capacity bytes survive
+                self._written += len(data) - self.capacity
+                data = data[-self.capacity:]
+            position = self._written % self.capacity
+            first = min(len(data), self.capacity - position)
+            self._view[position:position + first] = data[:first]
+            if first < len(data):
+                self._view[:len(data) - first] = data[first:]
+            self._written += len(data)
+            self._length = min(self._length + len(data), self.capacity)
+
+    def truncate(self, n_bytes: int):
+        """Drop the newest n_bytes of audio (such as trailing silence)"""
+        with self._lock:
+            n_bytes = min(n_bytes - n_bytes % (self.sample_width * self.channels), self._length)
+            self._written -= n_bytes
+            self._length -= n_bytes
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def duration(self) -> float:
+        return len(self) / self.bytes_per_second
+
+    @property
+    def overflowed(self) -> bool:
+        return self._written > self.capacity
+
+    def views(self) -> List[memoryview]:
+        """The buffered audio, oldest first, as at most two zero-copy slices"""
+        with self._lock:
+            start = (self._written - self._length) % self.capacity
+            end = start + self._length
+            if end <= self.capacity:
+                return [self._view[start:end]]
+            return [self._view[start:], self._view[:end - self.capacity]]
+
+    def frames(self, frame_bytes: int) -> Iterator[memoryview]:
+        """Iterate the buffered audio in frame_bytes slices (copying only a frame that wraps around)"""
+        pending = b""
+        for view in self.views():
+            start = 0
+            if pending:
+                start = frame_bytes - len(pending)
+                yield memoryview(pending + bytes(view[:start]))
+                pending = b""
+            while start + frame_bytes <= len(view):
+                yield view[start:start + frame_bytes]
+                start += frame_bytes
+            pending = bytes(view[start:])
+        if pending:
+            yield memoryview(pending)
+
+def wav_header(data_bytes: int, sample_rate: int, sample_width: int, channels: int) -> bytes:
+    """44-byte RIFF header for PCM data"""
+    byte_rate = sample_rate * sample_width * channels
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, sample_width * channels, sample_width * 8,
+        b"data", data_bytes
+    )
+
+def encode_wav(buffer: AudioRingBuffer) -> bytes:
+    """WAV file bytes for the buffered audio, built in memory with a single copy"""
+    views = buffer.views()
+    header = wav_header(sum(len(view) for view in views), buffer.sample_rate, buffer.sample_width, buffer.channels)
+    return b"".join([header, *views])
+
+def encode_flac(buffer: AudioRingBuffer) -> bytes:
+    """FLAC file bytes for the buffered 16-bit audio (lossless, roughly half the size of WAV)"""
+    import numpy as np
+    import soundfile
+
+    samples = np.frombuffer(b"".join(buffer.views()), dtype=np.int16).reshape(-1, buffer.channels)
+    output = io.BytesIO()
+    soundfile.write(output, samples, buffer.sample_rate, format="FLAC", subtype="PCM_16")
+    return output.getvalue()
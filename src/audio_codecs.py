@@ -0,0 +1,79 @@
+import io
+import wave
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator
+
+from src.audio_buffer import AudioRingBuffer, encode_flac, encode_wav
+
+# Sample rates Opus (and Google's OGG_OPUS recognition) accepts
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+DECODE_BLOCK_FRAMES = 1024  # frames decoded and written to the output stream at a time
+
+def encode_ogg_opus(buffer: AudioRingBuffer) -> bytes:
+    """Ogg Opus file bytes for the buffered 16-bit audio (lossy speech codec, around a tenth of WAV)"""
+    import numpy as np
+    import soundfile
+
+    if buffer.sample_rate not in OPUS_SAMPLE_RATES:
+        raise ValueError(f"Opus needs one of {OPUS_SAMPLE_RATES} Hz, got {buffer.sample_rate} Hz.")
+    samples = np.frombuffer(b"".join(buffer.views()), dtype=np.int16).reshape(-1, buffer.channels)
+    output = io.BytesIO()
+    soundfile.write(output, samples, buffer.sample_rate, format="OGG", subtype="OPUS")
+    return output.getvalue()
+
+# Speech-to-text upload encodings (Google RecognitionConfig.AudioEncoding names) and their encoders
+UPLOAD_ENCODERS: Dict[str, Callable[[AudioRingBuffer], bytes]] = {
+    "LINEAR16": encode_wav,
+    "FLAC": encode_flac,
+    "OGG_OPUS": encode_ogg_opus
+}
+
+# Text-to-speech audio encodings (Google AudioConfig.audioEncoding names) the player can decode
+SYNTHESIS_ENCODINGS = ("LINEAR16", "OGG_OPUS", "MP3")
+
+def encode_upload(buffer: AudioRingBuffer, encoding: str) -> bytes:
+    """File bytes for the buffered audio in the given upload encoding"""
+    if encoding not in UPLOAD_ENCODERS:
+        raise ValueError(f"Unsupported upload encoding '{encoding}'; use one of {list(UPLOAD_ENCODERS)}.")
+    return UPLOAD_ENCODERS[encoding](buffer)
+
+@dataclass
+class DecodedStream:
+    """16-bit PCM decoded block by block from an audio file"""
+    sample_rate: int
+    channels: int
+    blocks: Iterator[bytes]
+
+def _wav_blocks(wav, block_frames: int) -> Iterator[bytes]:
+    with wav:
+        data = wav.readframes(block_frames)
+        while data:
+            yield data
+            data = wav.readframes(block_frames)
+
+def _soundfile_blocks(audio_file, block_frames: int) -> Iterator[bytes]:
+    with audio_file:
+        for block in audio_file.blocks(blocksize=block_frames, dtype="int16", always_2d=True):
+            yield block.tobytes()
+
+def open_decoder(path: str, block_frames: int = DECODE_BLOCK_FRAMES) -> DecodedStream:
+    """
+    Open a WAV, Ogg Opus or MP3 file for streaming decode.
+    Blocks are decoded as they are read, so playback can start after the first block instead
+    of after the whole file has been decoded.
+    """
+    with open(path, "rb") as file:
+        is_wav = file.read(4) == b"RIFF"
+    if is_wav:
+        wav = wave.open(path, "rb")
+        sample_width = wav.getsampwidth()
+        if sample_width != 2:
+            wav.close()
+            raise ValueError(f"Expected 16-bit WAV, got {sample_width * 8}-bit: {path}")
+        return DecodedStream(wav.getframerate(), wav.getnchannels(), _wav_blocks(wav, block_frames))
+
+    import soundfile
+
+    audio_file = soundfile.SoundFile(path)
+    return DecodedStream(audio_file.samplerate, audio_file.channels, _soundfile_blocks(audio_file, block_frames))
@@ -2,41 +2,69 @@ import os
 import json
 import torch
 from sentence_transformers import SentenceTransformer, util
-from openai import OpenAI
+from src.faq_records import FAQ_AUTOGEN_RESPONSES_FILE, FAQ_MANUAL_RESPONSES_FILE, new_faq_id
+from src.kb_snapshots import KB_DIR, SnapshotFile, SnapshotStore
+from src.llm_backend import get_default_backend
+from src.singleflight import SingleFlight
+from src.upstream_scheduler import PRIORITY_BACKGROUND, estimate_tokens, get_scheduler
 
 # File paths
 EMBEDDINGS_FILE = "data/web_scraped_data_embeddings.pt"
-FAQ_AUTOGEN_RESPONSES_FILE = "data/faq_autogen_responses.json"
-FAQ_MANUAL_RESPONSES_FILE = "data/faq_manual_responses.json"
 DOMAIN_FAQ_FILE = "data/domain_faqs.json"
 BUSINESS_CONFIG_FILE = "data/business_config.json"
 FAQ_RESPONSES_EMBEDDINGS_FILE = "data/faq_responses_embeddings.pt"
 
-# Initialize OpenAI client and embedding model
-client = OpenAI()
+FAQ_MODEL = "gpt-4o-mini"
+
+# Initialize embedding model
 model = SentenceTransformer("all-MiniLM-L6-v2")  # Replace with the actual model used
 
-def load_embeddings():
+# Concurrent encodes of the same query share one model.encode call
+QUERY_ENCODE_TIMEOUT = 10
+query_encode_inflight = SingleFlight(default_timeout=QUERY_ENCODE_TIMEOUT)
+
+def load_embeddings_data(path):
+    return torch.load(path, map_location=torch.device("cpu"), weights_only=True)
+
+# The site embeddings of the published snapshot, reloaded only when a new version is published
+web_embeddings_snapshot = SnapshotFile(SnapshotStore(KB_DIR), os.path.basename(EMBEDDINGS_FILE), load_embeddings_data)
+
+def load_embeddings(embeddings_file=EMBEDDINGS_FILE):
     """
     Load embeddings and their associated texts from the embeddings file.
-    """
-    if not os.path.exists(EMBEDDINGS_FILE):
-        raise FileNotFoundError(f"Embeddings file not found at {EMBEDDINGS_FILE}.")
-    embedding_data = torch.load(EMBEDDINGS_FILE, map_location=torch.device("cpu"), weights_only=True)
+    The default file comes from the published knowledge-base snapshot when there is one.
+    """
+    if embeddings_file == EMBEDDINGS_FILE and web_embeddings_snapshot.available():
+        web_embeddings_snapshot.warn_if_shadowed(embeddings_file)
+        embedding_data = web_embeddings_snapshot.get()
+        if embedding_data is not None:
+            return embedding_data["embeddings"], embedding_data["texts"]
+    if not os.path.exists(embeddings_file):
+        raise FileNotFoundError(f"Embeddings file not found at {embeddings_file}.")
+    embedding_data = load_embeddings_data(embeddings_file)
     return embedding_data["embeddings"], embedding_data["texts"]
 
-def search_embeddings(query, top_k=5):
+def encode_query(query):
+    """
+    Encode a search query, coalescing identical concurrent requests into one encode.
+    The returned tensor may be shared between callers and must not be modified in place.
+    """
+    return query_encode_inflight.do(query, lambda: model.encode(query, convert_to_tensor=True))
+
+def search_embeddings(query, top_k=5, query_embedding=None, embeddings_file=EMBEDDINGS_FILE):
     """
     Search for the most relevant chunks using embeddings.
+    A query embedding that was already computed for this query can be passed in to skip encoding.
     """
-    embeddings, texts = load_embeddings()
+    embeddings, texts = load_embeddings(embeddings_file)
 
     # Encode the query
-    query_embedding = model.encode(query, convert_to_tensor=True)
+    if query_embedding is None:
+        query_embedding = encode_query(query)
 
     # Compute cosine similarity
     cos_scores = util.pytorch_cos_sim(query_embedding, embeddings)[0]
-    top_results = torch.topk(cos_scores, k=top_k)
+    top_results = torch.topk(cos_scores, k=min(top_k, len(texts)))
 
     # Retrieve the top-k relevant chunks
     results = [texts[idx] for idx in top_results.indices]
@@ -61,47 +89,56 @@ def load_business_config():
     with open(BUSINESS_CONFIG_FILE, "r", encoding="utf-8") as file:
         return json.load(file)
 
-def generate_faq_responses():
+def generate_faq_responses(backend=None):
     """
     Generate FAQ responses using domain-specific questions and embeddings search.
+    An LLMBackend can be passed in; the process-wide default is used otherwise.
     """
+    backend = backend or get_default_backend()
     business_config = load_business_config()
     domain_type = business_config.get("domain_type")
     if not domain_type:
         raise ValueError("Domain type is missing in the business config file.")
 
     faqs = load_domain_faqs(domain_type)
-    faq_responses = []
-
-    for question in faqs:
-        top_chunks = search_embeddings(question, top_k=5)
-
-        prompt = f"""
-        Based on the following relevant information, provide a concise and specific answer to the question: "{question}".
-
-        Relevant Information:
-        {"\n".join(top_chunks)}
-        """
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an assistant specialized in generating FAQs for businesses."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        answer = response.choices[0].message.content.strip()
-
-        metadata_tags = generate_tags(question)
-        faq_responses.append({
-            "question": question,
-            "answer": answer,
-            "metadata": metadata_tags
-        })
+    faq_responses = [answer_faq(question, backend) for question in faqs]
 
     save_autogen_responses(faq_responses)
     print("FAQ responses generated and saved successfully!")
 
+def answer_faq(question, backend, embeddings_file=EMBEDDINGS_FILE):
+    """
+    Answer one domain FAQ from the most relevant scraped chunks.
+    Returns the FAQ record (question, answer, metadata).
+    """
+    top_chunks = search_embeddings(question, top_k=5, embeddings_file=embeddings_file)
+    relevant_information = "\n".join(top_chunks)
+
+    prompt = f"""
+    Based on the following relevant information, provide a concise and specific answer to the question: "{question}".
+
+    Relevant Information:
+    {relevant_information}
+    """
+    messages = [
+        {"role": "system", "content": "You are an assistant specialized in generating FAQs for businesses."},
+        {"role": "user", "content": prompt}
+    ]
+    # Background priority: live callers are always admitted ahead of FAQ regeneration
+    answer = get_scheduler().call(
+        "llm",
+        lambda: backend.chat(messages, model=FAQ_MODEL, temperature=0.7),
+        priority=PRIORITY_BACKGROUND,
+        tokens=estimate_tokens(prompt)
+    )
+
+    return {
+        "id": new_faq_id(),
+        "question": question,
+        "answer": answer,
+        "metadata": generate_tags(question)
+    }
+
 def generate_tags(question):
     """
     Generate metadata tags for a given question by inferring variations.
@@ -126,17 +163,18 @@ def load_autogen_responses():
             return json.load(file)
     raise FileNotFoundError(f"Auto-generated FAQ responses file not found at {FAQ_AUTOGEN_RESPONSES_FILE}.")
 
-def save_autogen_responses(responses):
+def save_autogen_responses(responses, responses_file=FAQ_AUTOGEN_RESPONSES_FILE):
     """
     Save auto-generated FAQ responses to the JSON file.
     """
-    os.makedirs(os.path.dirname(FAQ_AUTOGEN_RESPONSES_FILE), exist_ok=True)
-    with open(FAQ_AUTOGEN_RESPONSES_FILE, "w", encoding="utf-8") as file:
+    os.makedirs(os.path.dirname(responses_file), exist_ok=True)
+    with open(responses_file, "w", encoding="utf-8") as file:
         json.dump(responses, file, indent=4)
 
 def create_embeddings_for_faq_responses():
     """
     Generate embeddings for FAQ responses (question + answer) and save them to a file.
+    Once knowledge-base snapshots are in use, the file is also published as a new snapshot.
     """
     autogen_responses = load_autogen_responses()
     manual_responses = []
@@ -152,3 +190,8 @@ def create_embeddings_for_faq_responses():
 
     torch.save({"embeddings": embeddings, "texts": combined_texts}, FAQ_RESPONSES_EMBEDDINGS_FILE)
     print(f"Embeddings for FAQ responses saved to {FAQ_RESPONSES_EMBEDDINGS_FILE}.")
+    kb_store = SnapshotStore(KB_DIR)
+    if kb_store.current_version() is not None:
+        version = kb_store.build_and_publish({os.path.basename(FAQ_RESPONSES_EMBEDDINGS_FILE): FAQ_RESPONSES_EMBEDDINGS_FILE},
+                                             source="faq embeddings", info={"faqs": len(combined_texts)})
+        print(f"Published knowledge-base snapshot {version}.")
@@ -2,6 +2,17 @@ from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 import random
 from datetime import datetime
+from src.intent_matcher import IntentMatcher
+from src.dialogue_state import DialogueState, extract_slots, format_slots
+
+CANDIDATE_MATCHER_CACHE_SIZE = 256
+
+# Used when a response template needs a slot the caller has not given yet
+SLOT_PLACEHOLDERS = {"date": "the day you mentioned", "time": "the time you mentioned"}
+
+class _SlotValues(dict):
+    def __missing__(self, key):
+        return SLOT_PLACEHOLDERS.get(key, "")
 
 @dataclass
 class Intent:
@@ -10,45 +21,66 @@ class Intent:
     responses: List[str]
     conditions: Optional[List[str]] = None
     next_intents: List[str] = field(default_factory=list)
+    examples: List[str] = field(default_factory=list)  # sample utterances for the embedding classifier
+    slots: List[str] = field(default_factory=list)  # slot values the intent needs, e.g. ["date", "time"]
     
 @dataclass
 class ConversationFlow:
     intents: Dict[str, Intent]
     fallback_responses: List[str]
+    _matcher: Optional[IntentMatcher] = field(default=None, init=False, repr=False, compare=False)
+    _matcher_key: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    _candidate_matchers: Dict[tuple, IntentMatcher] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _version: int = field(default=0, init=False, repr=False, compare=False)
     
-    def analyze_intent(self, user_input: str) -> tuple[str, float]:
-        user_input = user_input.lower()
-        
-        # Check each intent
-        max_score = 0
-        detected_intent = "fallback"
+    def compile(self, candidates: Optional[List[str]] = None) -> IntentMatcher:
+        """
+        Compile intent keywords and conditions into one matcher (cached until the flow changes).
+        With candidates, a small matcher over just those intents is built and cached instead.
+        """
+        key = (id(self.intents), len(self.intents), self._version)
+        if self._matcher_key != key:
+            self._matcher = None
+            self._candidate_matchers = {}
+            self._matcher_key = key
         
-        for intent_name, intent in self.intents.items():
-            score = 0
-            # Check keywords
-            for keyword in intent.keywords:
-                if keyword in user_input:
-                    score += 1
-            
-            # Check conditions if they exist
-            if intent.conditions:
-                for condition in intent.conditions:
-                    if condition.lower() in user_input:
-                        score += 0.5
-                        
-            # Normalize score
-            score = score / (len(intent.keywords) + (len(intent.conditions or [])) * 0.5)
-            
-            if score > max_score:
-                max_score = score
-                detected_intent = intent_name
+        if candidates is None:
+            if self._matcher is None:
+                self._matcher = IntentMatcher(self.intents)
+            return self._matcher
         
-        return detected_intent, max_score
+        subset = tuple(name for name in candidates if name in self.intents)
+        matcher = self._candidate_matchers.get(subset)
+        if matcher is None:
+            if len(self._candidate_matchers) >= CANDIDATE_MATCHER_CACHE_SIZE:
+                self._candidate_matchers.pop(next(iter(self._candidate_matchers)))
+            matcher = IntentMatcher({name: self.intents[name] for name in subset})
+            self._candidate_matchers[subset] = matcher
+        return matcher
+    
+    def invalidate(self):
+        """Drop compiled state; call after editing an intent's keywords or conditions in place"""
+        self._version += 1
+    
+    def add_intent(self, intent: Intent):
+        self.intents[intent.name] = intent
+        self.invalidate()
     
-    def get_response(self, intent_name: str) -> str:
+    def remove_intent(self, intent_name: str):
+        self.intents.pop(intent_name, None)
+        self.invalidate()
+    
+    def analyze_intent(self, user_input: str, candidates: Optional[List[str]] = None) -> tuple[str, float]:
+        return self.compile(candidates).best_intent(user_input)
+    
+    def get_response(self, intent_name: str, slots: Optional[Dict[str, str]] = None) -> str:
         if intent_name == "fallback":
             return random.choice(self.fallback_responses)
-        return random.choice(self.intents[intent_name].responses)
+        intent = self.intents[intent_name]
+        response = random.choice(intent.responses)
+        if intent.slots:
+            response = response.format_map(_SlotValues(format_slots(slots or {})))
+        return response
     
     def get_next_intents(self, current_intent: str) -> List[str]:
         if current_intent in self.intents:
@@ -66,6 +98,7 @@ default_flow = ConversationFlow(
                 "Welcome! What can I help you with?",
                 "Hi there! How may I help you?"
             ],
+            examples=["Hi, is anyone there?", "Hello, I have a quick question"],
             next_intents=["appointment", "business_hours", "location"]
         ),
         "appointment": Intent(
@@ -76,8 +109,20 @@ default_flow = ConversationFlow(
                 "I'd be happy to help you book an appointment. When would you like to come in?"
             ],
             conditions=["urgent", "asap", "emergency"],
+            examples=["Can I come in next Tuesday?", "I need to see the dentist this week", "Do you have any openings tomorrow?"],
             next_intents=["confirm_appointment", "business_hours"]
         ),
+        "confirm_appointment": Intent(
+            name="confirm_appointment",
+            keywords=["confirm", "works for me", "sounds good", "that works"],
+            responses=[
+                "Thank you! I've noted your request for {date} at {time}. Our team will confirm the booking shortly.",
+                "Great, {date} at {time} it is. We'll be in touch to confirm your appointment."
+            ],
+            examples=["Tomorrow at 3 works", "Can we do Friday morning?", "Yes, please book that"],
+            slots=["date", "time"],
+            next_intents=["business_hours", "location", "farewell"]
+        ),
         "business_hours": Intent(
             name="business_hours",
             keywords=["hours", "open", "close", "timing", "schedule"],
@@ -85,6 +130,7 @@ default_flow = ConversationFlow(
                 "Our business hours are Monday-Friday, 9 AM to 5 PM.",
                 "We're open from 9 AM to 5 PM, Monday through Friday."
             ],
+            examples=["When are you open?", "Are you open on Saturday?", "What time do you close today?"],
             next_intents=["appointment", "location"]
         ),
         "location": Intent(
@@ -94,6 +140,7 @@ default_flow = ConversationFlow(
                 "We're located at 123 Business Street, Suite 100.",
                 "Our address is 123 Business Street, Suite 100. Would you like directions?"
             ],
+            examples=["How do I get to your office?", "Where are you located?", "Is there parking nearby?"],
             next_intents=["business_hours", "appointment"]
         ),
         "farewell": Intent(
@@ -104,6 +151,7 @@ default_flow = ConversationFlow(
                 "You're welcome! Have a wonderful day!",
                 "Goodbye! Feel free to contact us if you need anything else."
             ],
+            examples=["That's all I needed", "Have a good day", "Thanks, that helps"],
             next_intents=[]
         )
     },
@@ -115,26 +163,64 @@ default_flow = ConversationFlow(
 )
 
 class ConversationManager:
-    def __init__(self, flow: ConversationFlow = default_flow):
+    def __init__(self, flow: ConversationFlow = default_flow, intent_classifier=None):
         self.flow = flow
         self.confidence_threshold = 0.3
+        self.intent_classifier = intent_classifier
     
-    def process_message(self, user_input: str) -> dict:
-        # Detect intent
-        intent, confidence = self.flow.analyze_intent(user_input)
+    def process_message(self,
+                        user_input: str,
+                        query_embedding=None,
+                        state: Optional[DialogueState] = None,
+                        now: Optional[datetime] = None) -> dict:
+        state = state or DialogueState()
+        new_slots = extract_slots(user_input, now)
+        slots = {**state.slots, **new_slots}
+        intent, confidence = "fallback", 0
+        resolved_by_state = False
+        
+        # Score the follow-ups the previous intent expects before the full flow
+        expected = [name for name in state.expected_intents if name in self.flow.intents]
+        if expected:
+            intent, confidence = self.flow.analyze_intent(user_input, candidates=expected)
+            if confidence < self.confidence_threshold and new_slots:
+                # A bare slot answer such as "tomorrow at 3" completes the first expected intent it fills
+                for name in expected:
+                    required = self.flow.intents[name].slots
+                    if required and all(slot in slots for slot in required):
+                        intent, confidence, resolved_by_state = name, 1.0, True
+                        break
+        
+        if confidence < self.confidence_threshold:
+            # Detect intent
+            intent, confidence = self.flow.analyze_intent(user_input)
+            
+            # Fall back to the embedding classifier for paraphrases the keywords miss
+            if (confidence < self.confidence_threshold
+                    and self.intent_classifier is not None
+                    and query_embedding is not None):
+                embedding_intent, similarity = self.intent_classifier.classify(query_embedding)
+                if similarity >= self.intent_classifier.threshold:
+                    intent, confidence = embedding_intent, similarity
         
         # Get response based on confidence
         if confidence >= self.confidence_threshold:
-            response = self.flow.get_response(intent)
+            response = self.flow.get_response(intent, slots)
             next_intents = self.flow.get_next_intents(intent)
+            new_state = DialogueState(intent, list(next_intents), slots, state.turns + 1)
         else:
             intent = "fallback"
             response = self.flow.get_response("fallback")
             next_intents = []
+            # Keep the previous expectations so the caller can still answer them next turn
+            new_state = DialogueState(state.current_intent, list(state.expected_intents), slots, state.turns + 1)
             
         return {
             "intent": intent,
             "confidence": confidence,
             "response": response,
-            "next_intents": next_intents
-        }
\ No newline at end of file
+            "next_intents": next_intents,
+            "slots": slots,
+            "resolved_by_state": resolved_by_state,
+            "dialogue_state": new_state
+        }
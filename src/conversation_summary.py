@@ -0,0 +1,156 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from src.llm_backend import LLMBackend, get_default_backend
+from src.session_store import SessionStore
+from src.upstream_scheduler import PRIORITY_BACKGROUND, SchedulerOverloaded, estimate_tokens, get_scheduler
+
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 250       # cap on the running summary
+SUMMARY_BATCH_TURNS = 4        # turns that must fall out of the window before a fold runs
+MAX_FOLD_TURNS = 40            # turns folded by one call when a summary has fallen far behind
+HISTORY_TOKEN_BUDGET = 1500    # summary plus verbatim turns in the response prompt
+CHARS_PER_TOKEN = 4
+
+# Shared by all summarizers so Streamlit reruns don't fold the same session twice
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summarizer")
+_in_progress = set()
+_in_progress_lock = threading.Lock()
+
+def turn_number(turn: dict) -> Optional[int]:
+    """1-based position of a turn in its session, taken from the dialogue state saved with it"""
+    return (turn.get("dialogue_state") or {}).get("turns")
+
+def format_turn(turn: dict) -> str:
+    return f"User: {turn['user']}\nAssistant: {turn['assistant']}"
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+def unsummarized_turns(turns: List[dict], meta: dict) -> List[dict]:
+    """Turns not yet folded into the session's summary (turns without a number count as not folded)"""
+    summarized_through = meta.get("summarized_through", 0)
+    return [turn for turn in turns if (turn_number(turn) or summarized_through + 1) > summarized_through]
+
+def build_history_context(turns: List[dict], meta: dict, token_budget: int = HISTORY_TOKEN_BUDGET) -> str:
+    """
+    Running summary followed by as many of the newest unsummarized turns as fit in token_budget.
+    The newest turn is always kept, truncated if it alone exceeds what is left of the budget.
+    """
+    summary = meta.get("summary", "")
+    sections = []
+    remaining = token_budget
+    if summary:
+        summary = truncate_to_tokens(summary, min(SUMMARY_MAX_TOKENS, token_budget // 2))
+        sections.append(f"Summary of earlier conversation: {summary}")
+        remaining -= len(summary) // CHARS_PER_TOKEN
+
+    recent = []
+    for turn in reversed(unsummarized_turns(turns, meta)):
+        text = format_turn(turn)
+        cost = len(text) // CHARS_PER_TOKEN + 1
+        if cost > remaining:
+            if not recent and remaining > 0:
+                recent.append(truncate_to_tokens(text, remaining))
+            break
+        recent.append(text)
+        remaining -= cost
+    sections.extend(reversed(recent))
+    return "\n".join(sections)
+
+def get_summary_prompt(summary: str, turns: List[dict], max_words: int) -> str:
+    conversation = "\n".join(format_turn(turn) for turn in turns)
+    return f"""You maintain a running summary of a conversation between a customer and our business receptionist.
+
+    Update the summary with the new turns below. Keep every fact needed later in the conversation:
+    names, contact details, requested services, preferred dates and times, decisions made and open questions.
+    Drop greetings and small talk. Write at most {max_words} words and return only the updated summary.
+
+    Current summary:
+    {summary or "(none)"}
+
+    New turns:
+    {conversation}
+    """
+
+class ConversationSummarizer:
+    """
+    Folds turns that leave the prompt window into a running summary stored in the session's meta.
+    Each fold sends only the previous summary and the newly dropped turns, so its cost does not grow
+    with the length of the call. Folds run on a background pool at background priority.
+    """
+
+    def __init__(self,
+                 session_store: SessionStore,
+                 backend: Optional[LLMBackend] = None,
+                 window_turns: int = 5,
+                 batch_turns: int = SUMMARY_BATCH_TURNS,
+                 max_summary_tokens: int = SUMMARY_MAX_TOKENS):
+        self.session_store = session_store
+        self.backend = backend or get_default_backend()
+        self.window_turns = window_turns
+        self.batch_turns = batch_turns
+        self.max_summary_tokens = max_summary_tokens
+
+    def maybe_summarize(self, session_id: str, latest_turn: int, meta: dict):
+        """Schedule a fold once batch_turns turns beyond the window are unsummarized"""
+        pending = latest_turn - meta.get("summarized_through", 0) - self.window_turns
+        if pending < self.batch_turns:
+            return None
+        with _in_progress_lock:
+            if session_id in _in_progress:
+                return None
+            _in_progress.add(session_id)
+        return _executor.submit(self._run, session_id, latest_turn)
+
+    def _run(self, session_id: str, latest_turn: int):
+        try:
+            self.fold(session_id, latest_turn)
+        except SchedulerOverloaded:
+            # Retried the next time a turn is added
+            pass
+        except Exception as e:
+            print(f"Failed to summarize session {session_id}: {e}")
+        finally:
+            with _in_progress_lock:
+                _in_progress.discard(session_id)
+
+    def fold(self, session_id: str, latest_turn: int) -> dict:
+        """Fold turns up to latest_turn - window_turns into the summary and save it"""
+        meta = self.session_store.load_meta(session_id)
+        summarized_through = meta.get("summarized_through", 0)
+        if summarized_through > latest_turn:
+            # Summary left over from before the session was reset
+            meta, summarized_through = {}, 0
+        fold_through = min(latest_turn - self.window_turns, summarized_through + MAX_FOLD_TURNS)
+        if fold_through <= summarized_through:
+            return meta
+
+        turns = self.session_store.load(session_id, last_n=latest_turn - summarized_through)
+        to_fold = [turn for turn in turns
+                   if turn_number(turn) is not None and summarized_through < turn_number(turn) <= fold_through]
+        if not to_fold:
+            return meta
+
+        max_words = self.max_summary_tokens * 3 // 4
+        prompt = get_summary_prompt(meta.get("summary", ""), to_fold, max_words)
+        summary = get_scheduler().call(
+            "llm",
+            lambda: self.backend.chat([{"role": "user", "content": prompt}], model=SUMMARY_MODEL, temperature=0),
+            priority=PRIORITY_BACKGROUND,
+            tokens=estimate_tokens(prompt, completion_tokens=self.max_summary_tokens)
+        )
+
+        meta = {
+            **meta,
+            "summary": truncate_to_tokens(summary.strip(), self.max_summary_tokens),
+            "summarized_through": turn_number(to_fold[-1]),
+            "summary_updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        self.session_store.save_meta(session_id, meta)
+        return meta
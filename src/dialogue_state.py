@@ -0,0 +1,131 @@
+import re
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+# Bare hours ("at 3") are read as business hours: 8-11 in the morning, 12-7 in the afternoon
+MORNING_HOURS = range(8, 12)
+
+TIME_PATTERN = re.compile(r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)?(?=\W|$)")
+AT_HOUR_PATTERN = re.compile(r"\bat\s+(\d{1,2})(?::(\d{2}))?\b")
+MONTH_DAY_PATTERN = re.compile(r"\b(" + "|".join(m[:3] for m in MONTHS) + r")[a-z]*\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b")
+DAY_OF_MONTH_PATTERN = re.compile(r"\bthe\s+(\d{1,2})(?:st|nd|rd|th)\b")
+
+@dataclass
+class DialogueState:
+    """Per-session conversation state, stored with each turn of the session"""
+    current_intent: Optional[str] = None
+    expected_intents: List[str] = field(default_factory=list)
+    slots: Dict[str, str] = field(default_factory=dict)
+    turns: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "DialogueState":
+        if not data:
+            return cls()
+        return cls(
+            current_intent=data.get("current_intent"),
+            expected_intents=list(data.get("expected_intents", [])),
+            slots=dict(data.get("slots", {})),
+            turns=data.get("turns", 0)
+        )
+
+    @classmethod
+    def from_history(cls, session_history: List[dict]) -> "DialogueState":
+        """Restore the state saved with the latest turn of a session"""
+        for turn in reversed(session_history):
+            if "dialogue_state" in turn:
+                return cls.from_dict(turn["dialogue_state"])
+        return cls()
+
+def _extract_date(text: str, now: datetime) -> Optional[str]:
+    if "day after tomorrow" in text:
+        return (now + timedelta(days=2)).date().isoformat()
+    if re.search(r"\btomorrow\b", text):
+        return (now + timedelta(days=1)).date().isoformat()
+    if re.search(r"\b(today|tonight)\b", text):
+        return now.date().isoformat()
+
+    for index, weekday in enumerate(WEEKDAYS):
+        if re.search(rf"\b{weekday}\b", text):
+            days_ahead = (index - now.weekday()) % 7
+            if days_ahead == 0 or re.search(rf"\bnext\s+{weekday}\b", text):
+                days_ahead = days_ahead or 7
+            return (now + timedelta(days=days_ahead)).date().isoformat()
+
+    match = MONTH_DAY_PATTERN.search(text)
+    if match:
+        month = [m[:3] for m in MONTHS].index(match.group(1)) + 1
+        day = int(match.group(2))
+        try:
+            candidate = now.replace(month=month, day=day)
+        except ValueError:
+            return None
+        if candidate.date() < now.date():
+            candidate = candidate.replace(year=now.year + 1)
+        return candidate.date().isoformat()
+
+    match = DAY_OF_MONTH_PATTERN.search(text)
+    if match:
+        day = int(match.group(1))
+        try:
+            candidate = now.replace(day=day)
+            if candidate.date() < now.date():
+                candidate = (now.replace(day=1) + timedelta(days=32)).replace(day=day)
+        except ValueError:
+            return None
+        return candidate.date().isoformat()
+    return None
+
+def _extract_time(text: str) -> Optional[str]:
+    if re.search(r"\bnoon\b", text):
+        return "12:00"
+
+    for match in TIME_PATTERN.finditer(text):
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+        explicit_at = match.group(0).lstrip().startswith("at")
+        # A bare number is only a time when it has am/pm, minutes or a preceding "at"
+        if not (meridiem or match.group(2) or explicit_at):
+            continue
+        if hour > 23 or minute > 59:
+            continue
+        if meridiem:
+            if hour > 12:
+                continue
+            if meridiem.startswith("p") and hour != 12:
+                hour += 12
+            elif meridiem.startswith("a") and hour == 12:
+                hour = 0
+        elif hour <= 12 and hour not in MORNING_HOURS and hour != 12:
+            hour += 12
+        return f"{hour:02d}:{minute:02d}"
+    return None
+
+def extract_slots(user_input: str, now: Optional[datetime] = None) -> Dict[str, str]:
+    """Extract date (ISO yyyy-mm-dd) and time (HH:MM) slot values from a user turn"""
+    now = now or datetime.now()
+    text = user_input.lower()
+    slots = {}
+    date = _extract_date(text, now)
+    if date:
+        slots["date"] = date
+    time = _extract_time(text)
+    if time:
+        slots["time"] = time
+    return slots
+
+def format_slots(slots: Dict[str, str]) -> Dict[str, str]:
+    """Human-readable slot values for response templates"""
+    formatted = dict(slots)
+    if "date" in slots:
+        formatted["date"] = datetime.strptime(slots["date"], "%Y-%m-%d").strftime("%A, %B %d").replace(" 0", " ")
+    if "time" in slots:
+        formatted["time"] = datetime.strptime(slots["time"], "%H:%M").strftime("%I:%M %p").lstrip("0")
+    return formatted
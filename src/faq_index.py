@@ -0,0 +1,343 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+
+FAQ_INDEX_DIR = "data/faq_index"
+MANIFEST_FILE = "manifest.json"
+
+COMPACT_TOMBSTONE_RATIO = 0.2  # compact once this share of the rows are replaced or deleted...
+COMPACT_MIN_TOMBSTONES = 16    # ...and there are at least this many of them
+COMPACT_LOG_OPS = 500          # or once the log holds this many operations
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+def _default_encode(texts: List[str]) -> torch.Tensor:
+    from src.content_manager import model
+    return model.encode(texts, convert_to_tensor=True)
+
+def _write_json_atomic(path: str, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+class FAQIndex:
+    """
+    Embedding index over FAQ records keyed by stable ID, updated one record at a time.
+
+    On disk: manifest.json names the current generation, base.<gen>.pt holds the rows compacted into
+    it, and log.<gen>.jsonl every upsert and delete since. An upsert encodes only its own record and
+    appends one log line; the row it replaces, like a deleted row, becomes a tombstone that search
+    skips. compact() drops tombstones into a new generation and runs in the background once they
+    pile up. Readers in other processes (the chat apps) apply new log lines on refresh(), so an
+    edit is searchable there on the next turn. One writing process per index directory.
+    """
+
+    def __init__(self, index_dir: str = FAQ_INDEX_DIR,
+                 encode: Optional[Callable[[List[str]], torch.Tensor]] = None,
+                 read_only: bool = False,
+                 background_compaction: bool = True):
+        self.index_dir = index_dir
+        self.encode = encode or _default_encode
+        self.read_only = read_only
+        self.background_compaction = background_compaction
+        self.generation = 0
+        self.snapshot_version: Optional[str] = None  # knowledge-base snapshot the records were last synced from
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._reset()
+        if not read_only:
+            os.makedirs(index_dir, exist_ok=True)
+        self.load()
+
+    def _reset(self):
+        self._ids: List[Optional[str]] = []  # None marks a tombstone
+        self._texts: List[str] = []
+        self._hashes: List[str] = []
+        self._embeddings: Optional[torch.Tensor] = None
+        self._rows: Dict[str, int] = {}
+        self._log_offset = 0
+        self._log_ops = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _base_file(self, generation: int) -> str:
+        return self._path(f"base.{generation}.pt")
+
+    def _log_file(self, generation: Optional[int] = None) -> str:
+        return self._path(f"log.{self.generation if generation is None else generation}.jsonl")
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self._path(MANIFEST_FILE), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_manifest(self, generation: int):
+        _write_json_atomic(self._path(MANIFEST_FILE), {"generation": generation, "snapshot": self.snapshot_version})
+
+    # ---- Loading and refreshing ----
+
+    def load(self):
+        """Load the current generation: its base rows, then its log"""
+        for _ in range(3):
+            manifest = self._read_manifest()
+            generation = manifest.get("generation", 0)
+            try:
+                base = None
+                if os.path.exists(self._base_file(generation)) or generation > 0:
+                    base = torch.load(self._base_file(generation), map_location=torch.device("cpu"), weights_only=True)
+            except FileNotFoundError:
+                # Compacted again while loading; read the new manifest
+                continue
+            with self._lock:
+                self._reset()
+                self.generation = generation
+                self.snapshot_version = manifest.get("snapshot")
+                if base is not None and base["ids"]:
+                    self._ids, self._texts, self._hashes = list(base["ids"]), list(base["texts"]), list(base["hashes"])
+                    self._embeddings = base["embeddings"]
+                    self._rows = {record_id: row for row, record_id in enumerate(self._ids)}
+                self._replay()
+            return
+
+    def refresh(self):
+        """Apply changes made by the writing process since the last load or refresh"""
+        manifest = self._read_manifest()
+        if manifest.get("generation", 0) != self.generation:
+            self.load()
+            return
+        with self._lock:
+            self.snapshot_version = manifest.get("snapshot")
+            self._replay()
+
+    def _replay(self):
+        """Apply complete log lines past the current offset"""
+        try:
+            with open(self._log_file(), "rb") as file:
+                file.seek(self._log_offset)
+                data = file.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1  # a line still being written is picked up next time
+        if not end:
+            return
+        ops = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        self._apply(ops)
+        self._log_offset += end
+
+    def _apply(self, ops: List[dict]):
+        new_rows, new_embeddings = [], []
+        for op in ops:
+            self._log_ops += 1
+            row = self._rows.pop(op["id"], None)
+            if row is not None:
+                self._ids[row] = None
+            if op["op"] == "upsert":
+                self._rows[op["id"]] = len(self._ids)
+                self._ids.append(op["id"])
+                self._texts.append(op["text"])
+                self._hashes.append(op["hash"])
+                new_rows.append(op["embedding"])
+        if new_rows:
+            new_embeddings = torch.tensor(new_rows, dtype=torch.float32)
+            self._embeddings = new_embeddings if self._embeddings is None else torch.cat([self._embeddings, new_embeddings])
+
+    # ---- Writing ----
+
+    def _append_log(self, ops: List[dict]):
+        data = "".join(json.dumps(op) + "\n" for op in ops).encode("utf-8")
+        with open(self._log_file(), "ab") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        self._log_offset += len(data)
+        self._apply(ops)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError(f"FAQ index at {self.index_dir} is opened read-only.")
+
+    def upsert(self, record_id: str, text: str) -> bool:
+        """Add or replace one record; encodes only this record. Returns False if the text is unchanged."""
+        return self.upsert_many({record_id: text})[0] > 0
+
+    def upsert_many(self, texts: Dict[str, str]) -> Tuple[int, int]:
+        """Add or replace records, encoding only those whose text changed; returns (changed, unchanged)"""
+        self._check_writable()
+        with self._lock:
+            changed = {record_id: text for record_id, text in texts.items()
+                       if record_id not in self._rows or self._hashes[self._rows[record_id]] != text_hash(text)}
+        if changed:
+            ids = list(changed)
+            embeddings = self.encode([changed[record_id] for record_id in ids]).cpu().float()
+            with self._lock:
+                self._append_log([
+                    {"op": "upsert", "id": record_id, "text": changed[record_id], "hash": text_hash(changed[record_id]),
+                     "embedding": embedding}
+                    for record_id, embedding in zip(ids, embeddings.tolist())
+                ])
+            self.maybe_compact()
+        return len(changed), len(texts) - len(changed)
+
+    def delete(self, record_id: str) -> bool:
+        """Remove one record (it becomes a tombstone until compaction)"""
+        return self.delete_many([record_id]) > 0
+
+    def delete_many(self, record_ids: List[str]) -> int:
+        self._check_writable()
+        with self._lock:
+            present = [record_id for record_id in record_ids if record_id in self._rows]
+            if present:
+                self._append_log([{"op": "delete", "id": record_id} for record_id in present])
+        if present:
+            self.maybe_compact()
+        return len(present)
+
+    def sync(self, texts: Dict[str, str], snapshot_version: Optional[str] = None) -> dict:
+        """
+        Make the index hold exactly these records: re-encode changed ones, delete missing ones.
+        The first sync publishes the index to readers, so they never see it half built; snapshot_version
+        records which published knowledge-base snapshot the records match.
+        """
+        with self._lock:
+            missing = [record_id for record_id in self._rows if record_id not in texts]
+        deleted = self.delete_many(missing) if missing else 0
+        changed, unchanged = self.upsert_many(texts)
+        if snapshot_version is not None or not index_exists(self.index_dir):
+            self.mark_snapshot(snapshot_version or self.snapshot_version)
+        return {"encoded": changed, "unchanged": unchanged, "deleted": deleted}
+
+    def mark_snapshot(self, snapshot_version: Optional[str]):
+        """Record that the records match this published snapshot (and publish the index to readers)"""
+        self._check_writable()
+        with self._lock:
+            self.snapshot_version = snapshot_version
+            self._write_manifest(self.generation)
+
+    # ---- Compaction ----
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._ids) - len(self._rows)
+
+    def needs_compaction(self) -> bool:
+        tombstones = self.tombstones
+        return ((tombstones >= COMPACT_MIN_TOMBSTONES and tombstones >= COMPACT_TOMBSTONE_RATIO * len(self._ids))
+                or self._log_ops >= COMPACT_LOG_OPS)
+
+    def maybe_compact(self):
+        """Start a background compaction if tombstones or the log have grown past their thresholds"""
+        with self._lock:
+            if self._compacting or not self.needs_compaction():
+                return
+            self._compacting = True
+        if self.background_compaction:
+            threading.Thread(target=self.compact, name="faq-index-compact", daemon=True).start()
+        else:
+            self.compact()
+
+    def compact(self):
+        """
+        Write the live rows as a new generation and start its log with the operations that arrived
+        while the base was being written. Searches and edits continue throughout.
+        """
+        self._check_writable()
+        try:
+            with self._lock:
+                self._compacting = True
+                live = sorted(self._rows.values())
+                snapshot = {
+                    "ids": [self._ids[row] for row in live],
+                    "texts": [self._texts[row] for row in live],
+                    "hashes": [self._hashes[row] for row in live],
+                    "embeddings": (self._embeddings[live].clone() if live else torch.empty(0))
+                }
+                snapshot_offset = self._log_offset
+                old_generation = self.generation
+            new_generation = old_generation + 1
+            tmp_file = self._base_file(new_generation) + ".tmp"
+            torch.save(snapshot, tmp_file)
+            os.replace(tmp_file, self._base_file(new_generation))
+
+            with self._lock:
+                # Operations logged since the snapshot carry over to the new log
+                with open(self._log_file(old_generation), "ab+") as file:
+                    file.seek(snapshot_offset)
+                    tail = file.read()
+                with open(self._log_file(new_generation), "wb") as file:
+                    file.write(tail)
+                    file.flush()
+                    os.fsync(file.fileno())
+                self._write_manifest(new_generation)
+
+                # Drop tombstones in memory too
+                live = sorted(self._rows.values())
+                self._ids = [self._ids[row] for row in live]
+                self._texts = [self._texts[row] for row in live]
+                self._hashes = [self._hashes[row] for row in live]
+                self._embeddings = self._embeddings[live] if live else None
+                self._rows = {record_id: row for row, record_id in enumerate(self._ids)}
+                self.generation = new_generation
+                self._log_offset = len(tail)
+                self._log_ops = tail.count(b"\n")
+            for path in (self._base_file(old_generation), self._log_file(old_generation)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            self._compacting = False
+
+    # ---- Reading ----
+
+    def search(self, query_embedding, top_k: int = 3, min_similarity: float = 0.0) -> List[Tuple[str, str, float]]:
+        """(record_id, text, similarity) of the closest live records, best first"""
+        from sentence_transformers import util
+
+        with self._lock:
+            if not self._rows:
+                return []
+            embeddings, ids, texts = self._embeddings, list(self._ids), self._texts
+        scores = util.pytorch_cos_sim(query_embedding, embeddings)[0]
+        alive = torch.tensor([record_id is not None for record_id in ids])
+        scores = scores.masked_fill(~alive, float("-inf"))
+        top = torch.topk(scores, k=min(top_k, int(alive.sum())))
+        return [(ids[row], texts[row], score.item())
+                for score, row in zip(top.values, top.indices.tolist())
+                if score.item() >= min_similarity]
+
+    def texts(self) -> Dict[str, str]:
+        with self._lock:
+            return {record_id: self._texts[row] for record_id, row in self._rows.items()}
+
+    def export(self, embeddings_file: str):
+        """Write the live rows in the {"embeddings", "texts", "ids"} format of faq_responses_embeddings.pt"""
+        with self._lock:
+            live = sorted(self._rows.values())
+            embeddings = self._embeddings[live] if live else torch.empty(0)
+            texts = [self._texts[row] for row in live]
+            ids = [self._ids[row] for row in live]
+        os.makedirs(os.path.dirname(embeddings_file) or ".", exist_ok=True)
+        tmp_file = embeddings_file + ".tmp"
+        torch.save({"embeddings": embeddings, "texts": texts, "ids": ids}, tmp_file)
+        os.replace(tmp_file, embeddings_file)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"generation": self.generation, "records": len(self._rows), "tombstones": self.tombstones,
+                    "log_ops": self._log_ops, "compacting": self._compacting,
+                    "snapshot": self.snapshot_version}
+
+def index_exists(index_dir: str = FAQ_INDEX_DIR) -> bool:
+    return os.path.exists(os.path.join(index_dir, MANIFEST_FILE))
@@ -0,0 +1,49 @@
+import json
+import os
+import uuid
+from typing import Dict, List
+
+# File paths
+FAQ_AUTOGEN_RESPONSES_FILE = "data/faq_autogen_responses.json"
+FAQ_MANUAL_RESPONSES_FILE = "data/faq_manual_responses.json"
+
+def faq_text(record: dict) -> str:
+    """The text a FAQ record is embedded and retrieved as"""
+    return f"Question: {record['question']} Answer: {record['answer']}"
+
+def new_faq_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+def ensure_faq_ids(records: List[dict]) -> bool:
+    """Give records without one a stable ID; returns True if any record changed (and must be saved)"""
+    changed = False
+    for record in records:
+        if not record.get("id"):
+            record["id"] = new_faq_id()
+            changed = True
+    return changed
+
+def faq_texts(records: List[dict]) -> Dict[str, str]:
+    return {record["id"]: faq_text(record) for record in records}
+
+def save_faq_records(records: List[dict], records_file: str):
+    os.makedirs(os.path.dirname(records_file) or ".", exist_ok=True)
+    with open(records_file, "w", encoding="utf-8") as file:
+        json.dump(records, file, indent=4)
+
+def load_faq_records(records_file: str) -> List[dict]:
+    """
+    FAQ records of a JSON file, or [] if there is none.
+    Records from files written before IDs existed get one, which is saved back so it stays stable.
+    """
+    if not os.path.exists(records_file):
+        return []
+    with open(records_file, "r", encoding="utf-8") as file:
+        records = json.load(file)
+    if ensure_faq_ids(records):
+        save_faq_records(records, records_file)
+    return records
+
+def load_all_faqs(autogen_file: str = FAQ_AUTOGEN_RESPONSES_FILE, manual_file: str = FAQ_MANUAL_RESPONSES_FILE) -> List[dict]:
+    """Auto-generated FAQs followed by additional (manual) Q&A, all with IDs"""
+    return load_faq_records(autogen_file) + load_faq_records(manual_file)
@@ -0,0 +1,462 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+JOBS_DIR = "data/jobs"
+TENANTS_DIR = "data/tenants"
+DEFAULT_TENANT = "default"  # publishes to data/, where the chat apps read from
+TENANT_PATTERN = re.compile(r"[A-Za-z0-9_-]+")  # tenant names are used as directory names
+
+WORKER_CONCURRENCY = 2         # onboarding jobs a worker runs at once (never two for one tenant)
+WORKER_POLL_SECONDS = 1.0      # how often an idle worker looks for queued jobs
+JOB_HEARTBEAT_SECONDS = 5.0    # how often a running job's record is touched
+JOB_STALE_SECONDS = 60.0       # a running job without a heartbeat for this long is taken over
+
+# Job and stage states
+QUEUED, PENDING, RUNNING, DONE, FAILED = "queued", "pending", "running", "done", "failed"
+
+STAGE_NAMES = ["ingest", "faq", "publish"]
+
+def validate_tenant(tenant: str) -> str:
+    """The tenant name, if it is a plain slug (no path separators, '..' or absolute paths)"""
+    if not TENANT_PATTERN.fullmatch(tenant or ""):
+        raise ValueError(f"Invalid tenant {tenant!r}: use letters, digits, '-' and '_' only.")
+    return tenant
+
+def tenant_data_dir(tenant: str) -> str:
+    """Directory a tenant's knowledge base is published to"""
+    validate_tenant(tenant)
+    return "data" if tenant == DEFAULT_TENANT else os.path.join(TENANTS_DIR, tenant)
+
+def write_json_atomic(path: str, data):
+    """Write JSON so readers see the old file or the new one, never a partial write"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+    os.replace(tmp_path, path)
+
+def read_jsonl(path: str) -> List[dict]:
+    """Records of a checkpoint file; a line torn by a crash mid-write is ignored"""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def append_jsonl(path: str, record: dict):
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+@dataclass
+class Job:
+    """
+    One onboarding run (ingest -> FAQ -> publish) for a tenant.
+    Stored as <jobs dir>/<job_id>/job.json next to the stage checkpoint files, so the UI
+    can poll progress from another process and a failed or interrupted job resumes where it stopped.
+    """
+    job_id: str
+    tenant: str
+    url: str
+    domain_type: str
+    data_dir: str
+    status: str = QUEUED
+    stage: Optional[str] = None
+    stages: Dict[str, dict] = field(default_factory=dict)
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    directory: str = ""
+
+    def path(self, name: str) -> str:
+        """Path of a checkpoint file in the job directory"""
+        return os.path.join(self.directory, name)
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        record.pop("directory")
+        return record
+
+class JobStore:
+    """Jobs persisted as one directory each; a lock file marks the worker running a job"""
+
+    def __init__(self, jobs_dir: str = JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def submit(self, tenant: str, url: str, domain_type: str, stage_names: List[str] = STAGE_NAMES,
+               data_dir: Optional[str] = None) -> Job:
+        """Queue an onboarding job; returns the tenant's active job instead if one is queued or running"""
+        validate_tenant(tenant)
+        active = self.active_job(tenant)
+        if active is not None:
+            return active
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{tenant}-{uuid.uuid4().hex[:6]}"
+        job = Job(
+            job_id=job_id,
+            tenant=tenant,
+            url=url,
+            domain_type=domain_type,
+            data_dir=data_dir or tenant_data_dir(tenant),
+            stages={name: {"status": PENDING, "progress": {}} for name in stage_names},
+            directory=os.path.join(self.jobs_dir, job_id)
+        )
+        os.makedirs(job.directory)
+        self.save(job)
+        return job
+
+    def save(self, job: Job, change: Optional[Callable[[], None]] = None):
+        """Apply change (if any) to the job and persist it; the job is never written mid-change"""
+        with self._lock:
+            if change is not None:
+                change()
+            job.updated_at = time.time()
+            write_json_atomic(job.path("job.json"), job.to_dict())
+
+    def load(self, job_id: str) -> Optional[Job]:
+        directory = os.path.join(self.jobs_dir, job_id)
+        try:
+            with open(os.path.join(directory, "job.json"), "r", encoding="utf-8") as file:
+                record = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return Job(**record, directory=directory)
+
+    def list_jobs(self, tenant: Optional[str] = None) -> List[Job]:
+        """Jobs newest first, optionally for one tenant"""
+        jobs = [self.load(name) for name in sorted(os.listdir(self.jobs_dir), reverse=True)
+                if os.path.isdir(os.path.join(self.jobs_dir, name))]
+        return [job for job in jobs if job is not None and (tenant is None or job.tenant == tenant)]
+
+    def active_job(self, tenant: str) -> Optional[Job]:
+        return next((job for job in self.list_jobs(tenant) if job.active), None)
+
+    def retry(self, job_id: str) -> Optional[Job]:
+        """Queue a failed job again; stages already done are skipped and the failed one resumes"""
+        job = self.load(job_id)
+        if job is None or job.status != FAILED:
+            return job
+        job.status, job.error = QUEUED, None
+        self.save(job)
+        return job
+
+    def claim(self, job: Job) -> Optional[Job]:
+        """
+        Take a queued job, or a running one whose worker stopped sending heartbeats.
+        Returns the job as stored once claimed, or None if another worker has it.
+        """
+        lock_path = job.path("claim.lock")
+        if self._stale(job):
+            # The worker running it died; take it over
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w") as file:
+            file.write(str(os.getpid()))
+        # Another worker may have run it to completion since `job` was read
+        current = self.load(job.job_id)
+        if current is None or not (current.status == QUEUED or self._stale(current)):
+            self.release(job)
+            return None
+        return current
+
+    def release(self, job: Job):
+        try:
+            os.remove(job.path("claim.lock"))
+        except FileNotFoundError:
+            pass
+
+    def claimable(self) -> List[Job]:
+        """Queued and stale running jobs, oldest first"""
+        jobs = [job for job in self.list_jobs() if job.status == QUEUED or self._stale(job)]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    @staticmethod
+    def _stale(job: Job) -> bool:
+        return job.status == RUNNING and time.time() - job.updated_at > JOB_STALE_SECONDS
+
+# A stage does its work for the job, checkpointing in the job directory as it goes, and reports
+# counts (pages fetched, chunks embedded, ...) through progress(**counts)
+Stage = Callable[[Job, Callable[..., None]], None]
+
+class JobRunner:
+    """
+    Runs queued jobs stage by stage, up to `concurrency` at once and one per tenant.
+    Stages already done are skipped, so a retried or taken-over job resumes at the stage that failed.
+    """
+
+    def __init__(self, store: JobStore, stages: Optional[List[Tuple[str, Stage]]] = None,
+                 concurrency: int = WORKER_CONCURRENCY):
+        self.store = store
+        self.stages = stages if stages is not None else pipeline_stages()
+        self.concurrency = concurrency
+        self._running: Dict[str, Job] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def run_pending(self) -> int:
+        """Start claimable jobs in background threads while there is capacity; returns how many started"""
+        started = 0
+        for job in self.store.claimable():
+            with self._lock:
+                busy_tenants = {running.tenant for running in self._running.values()}
+                if len(self._running) >= self.concurrency:
+                    break
+                if job.tenant in busy_tenants:
+                    continue
+                job = self.store.claim(job)
+                if job is None:
+                    continue
+                self._running[job.job_id] = job
+            thread = threading.Thread(target=self._run_claimed, args=(job,), name=f"job-{job.job_id}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+            started += 1
+        return started
+
+    def heartbeat(self):
+        """Touch running jobs so other workers do not take them over"""
+        with self._lock:
+            running = list(self._running.values())
+        for job in running:
+            if time.time() - job.updated_at >= JOB_HEARTBEAT_SECONDS:
+                self.store.save(job)
+
+    def wait(self):
+        """Block until the jobs started so far have finished"""
+        for thread in list(self._threads):
+            thread.join()
+
+    def run_forever(self, poll_seconds: float = WORKER_POLL_SECONDS, heartbeat_file: Optional[str] = None):
+        while True:
+            self.run_pending()
+            self.heartbeat()
+            if heartbeat_file:
+                write_json_atomic(heartbeat_file, {"pid": os.getpid(), "heartbeat": time.time()})
+            time.sleep(poll_seconds)
+
+    def run_job(self, job: Job):
+        """Run a claimed job's remaining stages"""
+        def start():
+            job.status, job.error = RUNNING, None
+            job.attempts += 1
+        self.store.save(job, start)
+        for name, stage in self.stages:
+            state = job.stages.get(name)
+            if state is not None and state["status"] == DONE:
+                continue
+            def start_stage(name=name):
+                job.stage = name
+                job.stages.setdefault(name, {"status": PENDING, "progress": {}})
+                job.stages[name].update(status=RUNNING, started_at=time.time(), error=None)
+            self.store.save(job, start_stage)
+            state = job.stages[name]
+
+            def progress(**counts):
+                self.store.save(job, lambda: state["progress"].update(counts))
+
+            try:
+                stage(job, progress)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                def fail():
+                    state.update(status=FAILED, error=error)
+                    job.status, job.error = FAILED, f"{name}: {error}"
+                self.store.save(job, fail)
+                print(f"Error: job {job.job_id} failed in stage '{name}': {e}")
+                return
+            self.store.save(job, lambda: state.update(status=DONE, finished_at=time.time()))
+        def finish():
+            job.status, job.stage = DONE, None
+        self.store.save(job, finish)
+
+    def _run_claimed(self, job: Job):
+        try:
+            self.run_job(job)
+        finally:
+            with self._lock:
+                self._running.pop(job.job_id, None)
+            self.store.release(job)
+
+# ---- Onboarding stages ----
+# Heavy dependencies (requests, torch, the embedding model) are imported when a stage runs,
+# so the UI can queue and poll jobs without loading them.
+
+def ingest_stage(job: Job, progress):
+    """
+    Scrape, chunk and embed the site with overlapped stages (src.ingestion_pipeline).
+    Each extracted page is checkpointed, so a retry fetches only the pages it does not have yet.
+    """
+    from src.ingestion_pipeline import run_ingestion
+
+    pages_file = job.path("pages.jsonl")
+    known_pages = {record["url"]: record["text"] for record in read_jsonl(pages_file)}
+    report = run_ingestion(
+        job.url,
+        raw_data_file=job.path("web_scraped_data.txt"),
+        chunks_file=job.path("web_scraped_data_chunks.txt"),
+        embeddings_file=job.path("web_scraped_data_embeddings.pt"),
+        known_pages=known_pages,
+        on_page=lambda url, text: append_jsonl(pages_file, {"url": url, "text": text}),
+        progress=progress
+    )
+    progress(throughput=report.as_dict())
+
+def faq_stage(job: Job, progress):
+    """Answer the domain FAQs from the job's embeddings; each answer is checkpointed"""
+    from src.content_manager import answer_faq, load_domain_faqs, save_autogen_responses
+    from src.llm_backend import get_default_backend
+
+    backend = get_default_backend()
+    questions = load_domain_faqs(job.domain_type)
+    answers_file = job.path("faqs.jsonl")
+    answered = {record["question"]: record for record in read_jsonl(answers_file)}
+    progress(faqs_total=len(questions), faqs_generated=len(answered))
+    for question in questions:
+        if question in answered:
+            continue
+        answered[question] = answer_faq(question, backend, embeddings_file=job.path("web_scraped_data_embeddings.pt"))
+        append_jsonl(answers_file, answered[question])
+        progress(faqs_generated=len(answered))
+    save_autogen_responses([answered[question] for question in questions], job.path("faq_autogen_responses.json"))
+
+def publish_stage(job: Job, progress):
+    """
+    Publish the job's outputs as a new knowledge-base snapshot of the tenant. Chat apps switch to it
+    between turns; nothing they are reading is overwritten. The FAQ records and business config are
+    also copied to the tenant's data directory, where the business interface edits them.
+    """
+    import torch
+    from src.content_manager import (BUSINESS_CONFIG_FILE, FAQ_AUTOGEN_RESPONSES_FILE, FAQ_MANUAL_RESPONSES_FILE,
+                                     FAQ_RESPONSES_EMBEDDINGS_FILE, model)
+    from src.faq_records import faq_text
+    from src.kb_snapshots import SnapshotStore, kb_dir_for
+    from src.webscraping_agent import CHUNKS_FILE, EMBEDDINGS_FILE, RAW_DATA_FILE
+
+    names = [os.path.basename(path) for path in (RAW_DATA_FILE, CHUNKS_FILE, EMBEDDINGS_FILE, FAQ_AUTOGEN_RESPONSES_FILE,
+                                                 BUSINESS_CONFIG_FILE, FAQ_RESPONSES_EMBEDDINGS_FILE)]
+    write_json_atomic(job.path(os.path.basename(BUSINESS_CONFIG_FILE)), {"domain_type": job.domain_type})
+
+    # FAQ embeddings for the new answers plus the tenant's manual Q&A
+    with open(job.path(os.path.basename(FAQ_AUTOGEN_RESPONSES_FILE)), "r", encoding="utf-8") as file:
+        records = json.load(file)
+    manual_file = os.path.join(job.data_dir, os.path.basename(FAQ_MANUAL_RESPONSES_FILE))
+    if os.path.exists(manual_file):
+        shutil.copyfile(manual_file, job.path(os.path.basename(manual_file)))
+        with open(job.path(os.path.basename(manual_file)), "r", encoding="utf-8") as file:
+            records += json.load(file)
+        names.append(os.path.basename(manual_file))
+    texts = [faq_text(record) for record in records]
+    torch.save({"embeddings": model.encode(texts, convert_to_tensor=True) if texts else torch.empty(0),
+                "texts": texts, "ids": [record.get("id") for record in records]},
+               job.path(os.path.basename(FAQ_RESPONSES_EMBEDDINGS_FILE)))
+
+    version = SnapshotStore(kb_dir_for(job.data_dir)).build_and_publish(
+        {name: job.path(name) for name in names}, source=f"onboarding {job.job_id}", info={"url": job.url, "faqs": len(records)}
+    )
+
+    os.makedirs(job.data_dir, exist_ok=True)
+    for name in (os.path.basename(FAQ_AUTOGEN_RESPONSES_FILE), os.path.basename(BUSINESS_CONFIG_FILE)):
+        tmp_path = os.path.join(job.data_dir, f".{name}.{job.job_id}.tmp")
+        shutil.copyfile(job.path(name), tmp_path)
+        os.replace(tmp_path, os.path.join(job.data_dir, name))
+    progress(published_to=job.data_dir, snapshot=version)
+
+def pipeline_stages() -> List[Tuple[str, Stage]]:
+    return list(zip(STAGE_NAMES, [ingest_stage, faq_stage, publish_stage]))
+
+# ---- Worker process ----
+
+def worker_heartbeat_file(jobs_dir: str = JOBS_DIR) -> str:
+    return os.path.join(jobs_dir, "worker.json")
+
+def worker_alive(jobs_dir: str = JOBS_DIR) -> bool:
+    try:
+        with open(worker_heartbeat_file(jobs_dir), "r", encoding="utf-8") as file:
+            heartbeat = json.load(file)["heartbeat"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return False
+    return time.time() - heartbeat < JOB_STALE_SECONDS
+
+def ensure_worker(jobs_dir: str = JOBS_DIR) -> bool:
+    """Start a detached worker process unless one is running; returns True if one was started"""
+    if worker_alive(jobs_dir):
+        return False
+    os.makedirs(jobs_dir, exist_ok=True)
+    # Mark it started now so a quick second call does not start another
+    write_json_atomic(worker_heartbeat_file(jobs_dir), {"pid": None, "heartbeat": time.time()})
+    with open(os.path.join(jobs_dir, "worker.log"), "a", encoding="utf-8") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "src.ingestion_jobs", "worker", "--jobs-dir", os.path.abspath(jobs_dir)],
+            cwd=project_root, stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+        )
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Onboarding job queue: ingest, FAQ and publish per tenant.")
+    parser.add_argument("--jobs-dir", default=JOBS_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Run queued jobs until stopped")
+    worker.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    submit = commands.add_parser("submit", help="Queue an onboarding job")
+    submit.add_argument("url")
+    submit.add_argument("--tenant", default=DEFAULT_TENANT)
+    submit.add_argument("--domain-type", required=True, help="e.g. dental_clinic")
+    retry = commands.add_parser("retry", help="Queue a failed job again")
+    retry.add_argument("job_id")
+    commands.add_parser("status", help="List jobs and their progress")
+    args = parser.parse_args()
+
+    store = JobStore(args.jobs_dir)
+    if args.command == "worker":
+        print(f"Worker {os.getpid()} polling {args.jobs_dir} (concurrency {args.concurrency})")
+        JobRunner(store, concurrency=args.concurrency).run_forever(
+            heartbeat_file=worker_heartbeat_file(args.jobs_dir)
+        )
+    elif args.command == "submit":
+        try:
+            print(store.submit(args.tenant, args.url, args.domain_type).job_id)
+        except ValueError as e:
+            print(f"Error: {e}")
+    elif args.command == "retry":
+        job = store.retry(args.job_id)
+        print(f"{args.job_id}: {job.status if job else 'not found'}")
+    else:
+        for job in store.list_jobs():
+            stages = ", ".join(f"{name} {state['status']}" for name, state in job.stages.items())
+            print(f"{job.job_id}  {job.tenant:<12} {job.status:<8} {stages}")
+            if job.error:
+                print(f"    {job.error}")
+
+if __name__ == "__main__":
+    main()
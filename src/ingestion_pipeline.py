@@ -0,0 +1,417 @@
+import argparse
+import hashlib
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urldefrag
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+QUEUE_SIZE = 32           # items buffered in front of each stage; a full queue blocks the stage before it
+FETCH_WORKERS = 8         # concurrent page downloads
+EXTRACT_WORKERS = 2       # HTML parsing processes
+EMBED_BATCH_SIZE = 64     # chunks per model.encode call
+EMBED_BATCH_WAIT = 0.2    # seconds a partial batch waits for more chunks before it is embedded
+POLL_SECONDS = 0.1        # how often blocked workers check whether the pipeline was aborted
+
+_END = object()  # end of the stream, one per worker of the receiving stage
+
+@dataclass
+class PipelineStage:
+    """
+    One stage of a StagedPipeline. fn maps an item to an iterable of output items (zero, one or more),
+    or a list of up to batch_size items to outputs when batch_size > 1.
+    With processes=True, fn runs in a process pool of `workers` processes; fn and the items must pickle.
+    """
+    name: str
+    fn: Callable[[Any], Iterable[Any]]
+    workers: int = 1
+    queue_size: int = QUEUE_SIZE
+    processes: bool = False
+    batch_size: int = 1
+    batch_wait: float = 0.0
+    skip_errors: bool = False  # drop an item whose fn raised instead of aborting the pipeline
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0     # summed over workers
+    starved_seconds: float = 0.0  # waiting for input
+    blocked_seconds: float = 0.0  # waiting for room in the next stage's queue (backpressure)
+    max_queue: int = 0            # deepest the stage's input queue got
+
+    def as_dict(self, elapsed: float) -> dict:
+        return {
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "items_per_second": round(self.items_in / elapsed, 1) if elapsed else 0.0,
+            "utilisation": round(self.busy_seconds / (elapsed * self.workers), 2) if elapsed else 0.0,
+            "starved_seconds": round(self.starved_seconds, 2),
+            "blocked_seconds": round(self.blocked_seconds, 2),
+            "max_queue": self.max_queue
+        }
+
+@dataclass
+class PipelineReport:
+    elapsed: float
+    stages: List[StageStats] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {"elapsed_seconds": round(self.elapsed, 2),
+                "stages": {stats.name: stats.as_dict(self.elapsed) for stats in self.stages}}
+
+    def bottleneck(self) -> Optional[str]:
+        """The stage with the highest utilisation, which bounds the pipeline's throughput"""
+        if not self.stages or not self.elapsed:
+            return None
+        return max(self.stages, key=lambda stats: stats.busy_seconds / stats.workers).name
+
+    def format(self) -> str:
+        lines = [f"{'stage':<10} {'workers':>7} {'in':>6} {'out':>6} {'errors':>6} {'items/s':>8} {'busy':>6} "
+                 f"{'starved s':>9} {'blocked s':>9} {'max queue':>9}"]
+        for stats in self.stages:
+            row = stats.as_dict(self.elapsed)
+            lines.append(f"{stats.name:<10} {row['workers']:>7} {row['items_in']:>6} {row['items_out']:>6} "
+                         f"{row['errors']:>6} {row['items_per_second']:>8.1f} {row['utilisation']:>6.0%} "
+                         f"{row['starved_seconds']:>9.2f} {row['blocked_seconds']:>9.2f} {row['max_queue']:>9}")
+        lines.append(f"total {self.elapsed:.2f}s, bottleneck: {self.bottleneck()}")
+        return "\n".join(lines)
+
+class StagedPipeline:
+    """
+    Stages connected by bounded queues, each with its own worker threads, so network, parsing and
+    model work overlap: total time approaches that of the slowest stage instead of the sum of all.
+    A full queue blocks the stage feeding it (backpressure), which bounds memory however large the
+    input. The first error in a stage without skip_errors stops every stage and is raised by run().
+    """
+
+    def __init__(self, stages: List[PipelineStage]):
+        self.stages = stages
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._stats = [StageStats(stage.name, stage.workers) for stage in stages]
+        self._stats_locks = [threading.Lock() for _ in stages]
+        self._remaining = [stage.workers for stage in stages]
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._pools: Dict[int, ProcessPoolExecutor] = {}
+
+    def run(self, source: Iterable[Any]) -> PipelineReport:
+        start = time.perf_counter()
+        for index, stage in enumerate(self.stages):
+            if stage.processes:
+                self._pools[index] = ProcessPoolExecutor(max_workers=stage.workers)
+        threads = [threading.Thread(target=self._feed, args=(source,), name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=self._work, args=(index,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+                        for n in range(stage.workers)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for pool in self._pools.values():
+                pool.shutdown(cancel_futures=True)
+        if self._error is not None:
+            raise self._error
+        return PipelineReport(time.perf_counter() - start, self._stats)
+
+    def _abort(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _put(self, index: int, item) -> float:
+        """Put into stage index's queue, waiting while it is full; returns seconds blocked"""
+        target = self._queues[index]
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        depth = target.qsize()
+        with self._stats_locks[index]:
+            self._stats[index].max_queue = max(self._stats[index].max_queue, depth)
+        return time.perf_counter() - start
+
+    def _get(self, index: int, timeout: Optional[float] = None):
+        """Next item for stage index, or None on timeout or abort"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self._stop.is_set():
+            wait = POLL_SECONDS if deadline is None else min(POLL_SECONDS, deadline - time.perf_counter())
+            try:
+                if wait <= 0:
+                    return self._queues[index].get_nowait()
+                return self._queues[index].get(timeout=wait)
+            except queue.Empty:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+        return None
+
+    def _feed(self, source: Iterable[Any]):
+        try:
+            for item in source:
+                if self._stop.is_set():
+                    return
+                self._put(0, item)
+        except Exception as e:
+            print(f"Error: pipeline source failed: {e}")
+            self._abort(e)
+            return
+        for _ in range(self.stages[0].workers):
+            self._put(0, _END)
+
+    def _work(self, index: int):
+        stage, stats, lock = self.stages[index], self._stats[index], self._stats_locks[index]
+        last = index == len(self.stages) - 1
+        ended = False
+        while not ended and not self._stop.is_set():
+            waited = time.perf_counter()
+            item = self._get(index)
+            if item is None:
+                continue
+            starved = time.perf_counter() - waited
+            if item is _END:
+                break
+            batch = [item]
+            while len(batch) < stage.batch_size:
+                # Fill the batch with what arrives within batch_wait
+                more = self._get(index, timeout=stage.batch_wait)
+                if more is None:
+                    break
+                if more is _END:
+                    ended = True
+                    break
+                batch.append(more)
+
+            busy_start = time.perf_counter()
+            try:
+                payload = batch if stage.batch_size > 1 else batch[0]
+                if index in self._pools:
+                    outputs = self._pools[index].submit(_run_to_list, stage.fn, payload).result()
+                else:
+                    outputs = list(stage.fn(payload))
+                error = None
+            except Exception as e:
+                outputs, error = [], e
+            busy = time.perf_counter() - busy_start
+
+            blocked = 0.0
+            if not last:
+                for output in outputs:
+                    blocked += self._put(index + 1, output)
+            with lock:
+                stats.items_in += len(batch)
+                stats.items_out += len(outputs)
+                stats.busy_seconds += busy
+                stats.starved_seconds += starved
+                stats.blocked_seconds += blocked
+                if error is not None:
+                    stats.errors += 1
+            if error is not None:
+                if not stage.skip_errors:
+                    print(f"Error: pipeline stage '{stage.name}' failed: {error}")
+                    self._abort(error)
+                    return
+
+        # The last worker of a stage to finish ends the stream for the next stage
+        with lock:
+            self._remaining[index] -= 1
+            finished = self._remaining[index] == 0
+        if finished and not last:
+            for _ in range(self.stages[index + 1].workers):
+                self._put(index + 1, _END)
+
+def _run_to_list(fn, payload) -> list:
+    # Runs in a pool process: generators do not pickle, lists do
+    return list(fn(payload))
+
+# ---- Website ingestion: fetch -> extract -> dedup -> chunk -> embed -> write ----
+
+def normalize_url(url: str) -> str:
+    """URL without fragment or trailing slash, so links to the same page are fetched once"""
+    return urldefrag(url)[0].rstrip("/")
+
+def fetch_page(item: dict) -> List[dict]:
+    """Download a page (pages already fetched or restored from a checkpoint pass through)"""
+    from src.webscraping_agent import fetch_html
+
+    if "html" in item or "text" in item:
+        return [item]
+    try:
+        return [{**item, "html": fetch_html(item["url"])}]
+    except Exception as e:
+        print(f"Failed to scrape {item['url']}: {e}")
+        raise
+
+def extract_page(item: dict) -> List[dict]:
+    """Visible text of a downloaded page; runs in a pool process"""
+    from bs4 import BeautifulSoup
+    from src.webscraping_agent import page_text
+
+    if "text" in item:
+        return [item]
+    text = page_text(BeautifulSoup(item["html"], "html.parser"))
+    return [{"index": item["index"], "url": item["url"], "text": text}]
+
+class _Deduplicator:
+    """
+    Drops pages whose text is identical to one already seen (the same page under another URL)
+    and keeps the rest for the raw data file.
+    """
+
+    def __init__(self, on_page: Optional[Callable[[str, str], None]] = None,
+                 progress: Optional[Callable[..., None]] = None):
+        self.on_page = on_page
+        self.progress = progress
+        self.pages: Dict[int, dict] = {}
+        self.seen = set()
+        self.duplicates = 0
+
+    def __call__(self, item: dict) -> List[dict]:
+        digest = hashlib.sha256(item["text"].strip().encode("utf-8")).hexdigest()
+        duplicate = digest in self.seen
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.seen.add(digest)
+            self.pages[item["index"]] = item
+            if self.on_page is not None and not item.get("restored"):
+                self.on_page(item["url"], item["text"])
+        if self.progress is not None:
+            self.progress(pages_fetched=len(self.pages) + self.duplicates, pages_duplicate=self.duplicates)
+        return [] if duplicate else [item]
+
+def chunk_page(item: dict) -> List[dict]:
+    """Chunks of one page, as chunk_text would split it"""
+    from src.webscraping_agent import format_page, split_text
+
+    return [{"index": item["index"], "part": part, "text": chunk}
+            for part, chunk in enumerate(split_text(format_page(item["url"], item["text"])))]
+
+def embed_chunks(batch: List[dict]) -> List[dict]:
+    from src.webscraping_agent import embed_texts
+
+    return [{"keys": [(chunk["index"], chunk["part"]) for chunk in batch],
+             "texts": [chunk["text"] for chunk in batch],
+             "embeddings": embed_texts([chunk["text"] for chunk in batch])}]
+
+class _Writer:
+    """Collects embedded batches (pages arrive in any order) and reports progress"""
+
+    def __init__(self, progress: Optional[Callable[..., None]] = None):
+        self.progress = progress
+        self.batches: List[dict] = []
+        self.chunks = 0
+
+    def __call__(self, batch: dict) -> List[dict]:
+        self.batches.append(batch)
+        self.chunks += len(batch["texts"])
+        if self.progress is not None:
+            self.progress(chunks_embedded=self.chunks)
+        return []
+
+def run_ingestion(url: str,
+                  raw_data_file: Optional[str] = None,
+                  chunks_file: Optional[str] = None,
+                  embeddings_file: Optional[str] = None,
+                  fetch_workers: int = FETCH_WORKERS,
+                  extract_workers: int = EXTRACT_WORKERS,
+                  extract_processes: bool = True,
+                  queue_size: int = QUEUE_SIZE,
+                  known_pages: Optional[Dict[str, str]] = None,
+                  on_page: Optional[Callable[[str, str], None]] = None,
+                  progress: Optional[Callable[..., None]] = None) -> PipelineReport:
+    """
+    Scrape, chunk and embed a website with all stages overlapped, writing the same three files as
+    scrape_website, chunk_text and generate_embeddings (pages in link order, main page first).
+    known_pages (url -> text) are used instead of fetching again; on_page is called with each
+    newly extracted page, e.g. to checkpoint it. progress receives page and chunk counts.
+    """
+    import torch
+    from src.webscraping_agent import (
+        CHUNKS_FILE, EMBEDDINGS_FILE, RAW_DATA_FILE, fetch_html, format_page, list_subpages,
+        save_chunks, save_embeddings, save_raw_data
+    )
+    from bs4 import BeautifulSoup
+
+    known_pages = known_pages or {}
+
+    def source():
+        main_html = fetch_html(url)
+        subpages = list_subpages(url, BeautifulSoup(main_html, "html.parser"))
+        seen = set()
+        urls = []
+        for page_url in [url] + subpages:
+            if normalize_url(page_url) not in seen:
+                seen.add(normalize_url(page_url))
+                urls.append(page_url)
+        if progress is not None:
+            progress(pages_total=len(urls), pages_skipped_as_duplicate_links=len(subpages) + 1 - len(urls))
+        for index, page_url in enumerate(urls):
+            if page_url in known_pages:
+                yield {"index": index, "url": page_url, "text": known_pages[page_url], "restored": True}
+            elif index == 0:
+                yield {"index": index, "url": page_url, "html": main_html}
+            else:
+                yield {"index": index, "url": page_url}
+
+    deduplicate = _Deduplicator(on_page, progress)
+    writer = _Writer(progress)
+    pipeline = StagedPipeline([
+        PipelineStage("fetch", fetch_page, workers=fetch_workers, queue_size=queue_size, skip_errors=True),
+        PipelineStage("extract", extract_page, workers=extract_workers, queue_size=queue_size,
+                      processes=extract_processes),
+        PipelineStage("dedup", deduplicate, queue_size=queue_size),
+        PipelineStage("chunk", chunk_page, queue_size=queue_size),
+        PipelineStage("embed", embed_chunks, queue_size=queue_size, batch_size=EMBED_BATCH_SIZE,
+                      batch_wait=EMBED_BATCH_WAIT),
+        PipelineStage("write", writer, queue_size=queue_size)
+    ])
+    report = pipeline.run(source())
+    pages = deduplicate.pages
+    if progress is not None:
+        progress(pages_failed=report.stages[0].errors)
+
+    # Restore link order: the main page first, then subpages as linked
+    raw_data = "".join(format_page(pages[index]["url"], pages[index]["text"]) for index in sorted(pages))
+    save_raw_data(raw_data, raw_data_file or RAW_DATA_FILE)
+    rows = [(key, text, batch["embeddings"][row])
+            for batch in writer.batches
+            for row, (key, text) in enumerate(zip(batch["keys"], batch["texts"]))]
+    rows.sort(key=lambda row: tuple(row[0]))
+    chunks = [text for _, text, _ in rows]
+    save_chunks(chunks, chunks_file or CHUNKS_FILE)
+    embeddings = torch.stack([embedding for _, _, embedding in rows]) if rows else torch.empty(0)
+    save_embeddings(embeddings, chunks, embeddings_file or EMBEDDINGS_FILE)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape, chunk and embed a website with overlapped stages.")
+    parser.add_argument("url")
+    parser.add_argument("--fetch-workers", type=int, default=FETCH_WORKERS)
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    args = parser.parse_args()
+
+    report = run_ingestion(args.url, fetch_workers=args.fetch_workers, extract_workers=args.extract_workers,
+                           queue_size=args.queue_size)
+    print(report.format())
+
+if __name__ == "__main__":
+    main()
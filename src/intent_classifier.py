@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import torch
+
+INTENT_CENTROIDS_FILE = "data/intent_centroids.pt"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+def flow_fingerprint(flow, model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    """Hash of everything the centroids depend on; any change to the flow produces a new fingerprint"""
+    definition = [
+        [name, intent.keywords, intent.conditions or [], getattr(intent, "examples", [])]
+        for name, intent in flow.intents.items()
+    ]
+    payload = json.dumps([model_name, definition], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _default_encode(texts: List[str]):
+    from src.content_manager import model
+    return model.encode(texts, convert_to_tensor=True)
+
+class EmbeddingIntentClassifier:
+    """
+    Classifies a turn by cosine similarity between its query embedding and one centroid per intent.
+    Centroids are the normalised mean embedding of an intent's keywords and example utterances.
+    They are computed once, cached on disk keyed by the flow fingerprint, and rebuilt when the
+    flow changes. Classification is a single matrix-vector product and never encodes the query
+    itself; it reuses the embedding the retriever computed for the turn.
+    """
+
+    def __init__(self,
+                 flow,
+                 encode: Optional[Callable[[List[str]], torch.Tensor]] = None,
+                 cache_file: Optional[str] = INTENT_CENTROIDS_FILE,
+                 threshold: float = 0.5,
+                 model_name: str = EMBEDDING_MODEL_NAME):
+        self.flow = flow
+        self.encode = encode or _default_encode
+        self.cache_file = cache_file
+        self.threshold = threshold
+        self.model_name = model_name
+        self._intent_names: List[str] = []
+        self._centroids: Optional[torch.Tensor] = None
+        self._flow_key = None
+        self._lock = threading.Lock()
+
+    def _current_flow_key(self):
+        return (id(self.flow.intents), len(self.flow.intents), getattr(self.flow, "_version", 0))
+
+    def centroids(self) -> Tuple[List[str], torch.Tensor]:
+        """Return (intent names, centroid matrix), rebuilding if the flow changed"""
+        with self._lock:
+            flow_key = self._current_flow_key()
+            if self._centroids is None or self._flow_key != flow_key:
+                self._intent_names, self._centroids = self._load_or_build()
+                self._flow_key = flow_key
+            return self._intent_names, self._centroids
+
+    def _load_or_build(self) -> Tuple[List[str], torch.Tensor]:
+        fingerprint = flow_fingerprint(self.flow, self.model_name)
+        if self.cache_file and os.path.exists(self.cache_file):
+            cached = torch.load(self.cache_file, map_location=torch.device("cpu"), weights_only=True)
+            if cached.get("fingerprint") == fingerprint:
+                return cached["intents"], cached["centroids"]
+
+        intent_names, centroids = self._build()
+        if self.cache_file:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            torch.save({"fingerprint": fingerprint, "intents": intent_names, "centroids": centroids}, self.cache_file)
+        return intent_names, centroids
+
+    def _build(self) -> Tuple[List[str], torch.Tensor]:
+        intent_names = []
+        texts = []
+        owners = []
+        for name, intent in self.flow.intents.items():
+            phrases = list(intent.keywords) + list(getattr(intent, "examples", []))
+            if not phrases:
+                continue
+            intent_names.append(name)
+            texts.extend(phrases)
+            owners.extend([len(intent_names) - 1] * len(phrases))
+
+        if not texts:
+            return [], torch.empty(0)
+
+        # One batched encode for the whole flow, then a scatter-add into per-intent sums
+        embeddings = torch.nn.functional.normalize(torch.as_tensor(self.encode(texts)).float().cpu(), dim=1)
+        index = torch.tensor(owners)
+        sums = torch.zeros(len(intent_names), embeddings.shape[1]).index_add_(0, index, embeddings)
+        return intent_names, torch.nn.functional.normalize(sums, dim=1)
+
+    def classify(self, query_embedding) -> Tuple[str, float]:
+        """Return the closest intent and its cosine similarity, or ("fallback", 0.0)"""
+        intent_names, centroids = self.centroids()
+        if not intent_names:
+            return "fallback", 0.0
+        query = torch.nn.functional.normalize(torch.as_tensor(query_embedding).float().cpu().reshape(-1), dim=0)
+        similarities = centroids @ query
+        best = int(torch.argmax(similarities))
+        return intent_names[best], float(similarities[best])
@@ -0,0 +1,178 @@
+import re
+from collections import deque
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    # Only for annotations: conversation_flows imports this module
+    from src.conversation_flows import Intent
+
+KEYWORD_WEIGHT = 1.0
+CONDITION_WEIGHT = 0.5
+LINEAR_SCAN_MAX_TERMS = 50  # below this many phrases a find() per phrase beats walking the automaton in Python
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+class IntentMatcher:
+    """
+    Aho-Corasick automaton over every keyword and condition of a set of intents.
+    All intents are scored in a single pass over the input; a phrase only counts when it
+    matches whole words, so "hi" no longer matches inside "this" or "which".
+    Scores use the same normalisation as the original keyword loop:
+    (matched keywords + 0.5 * matched conditions) / (keywords + 0.5 * conditions).
+    Small flows (like the shipped ones) are scanned phrase by phrase instead, with the same
+    whole-word rule; the automaton only pays off once there are hundreds of phrases.
+    """
+
+    def __init__(self, intents: Dict[str, "Intent"], linear_scan: Optional[bool] = None):
+        self.intent_names: List[str] = []
+        self.denominators: List[float] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (pattern length, term id, checks start boundary, checks end boundary)
+        self._outputs: List[List[Tuple[int, int, bool, bool]]] = [[]]
+        # Nearest state along the fail chain that has outputs
+        self._output_link: List[int] = [-1]
+        self._term_intent: List[int] = []
+        self._term_weight: List[float] = []
+        # For the linear scan: single-word phrases by word, and every other phrase as
+        # (phrase, term id, checks start boundary, checks end boundary)
+        self._word_terms: Dict[str, List[int]] = {}
+        self._phrases: List[Tuple[str, int, bool, bool]] = []
+        self._term_count = 0
+
+        for intent_name, intent in intents.items():
+            index = len(self.intent_names)
+            self.intent_names.append(intent_name)
+            keywords = intent.keywords
+            conditions = intent.conditions or []
+            self.denominators.append(len(keywords) * KEYWORD_WEIGHT + len(conditions) * CONDITION_WEIGHT)
+            for keyword in keywords:
+                self._add_term(keyword, index, KEYWORD_WEIGHT)
+            for condition in conditions:
+                self._add_term(condition, index, CONDITION_WEIGHT)
+
+        self._build_failure_links()
+        self.linear_scan = self._term_count < LINEAR_SCAN_MAX_TERMS if linear_scan is None else linear_scan
+
+    def _add_term(self, phrase: str, intent_index: int, weight: float):
+        term = len(self._term_intent)
+        self._term_intent.append(intent_index)
+        self._term_weight.append(weight)
+
+        phrase = phrase.lower()
+        if not phrase:
+            return
+        self._term_count += 1
+        if WORD_PATTERN.fullmatch(phrase):
+            self._word_terms.setdefault(phrase, []).append(term)
+        else:
+            self._phrases.append((phrase, term, _is_word_char(phrase[0]), _is_word_char(phrase[-1])))
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._output_link.append(-1)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._outputs[state].append(
+            (len(phrase), term, _is_word_char(phrase[0]), _is_word_char(phrase[-1]))
+        )
+
+    def _build_failure_links(self):
+        pending = deque()
+        for state in self._goto[0].values():
+            pending.append(state)
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                link = self._fail[next_state]
+                self._output_link[next_state] = link if self._outputs[link] else self._output_link[link]
+
+    def _scan_phrases(self, text: str) -> set:
+        """Terms with a whole-word occurrence in text: words are looked up, other phrases searched for"""
+        matched_terms = set()
+        word_terms = self._word_terms
+        for word in set(WORD_PATTERN.findall(text)):
+            terms = word_terms.get(word)
+            if terms:
+                matched_terms.update(terms)
+        length = len(text)
+        for phrase, term, start_boundary, end_boundary in self._phrases:
+            start = text.find(phrase)
+            while start != -1:
+                end = start + len(phrase)
+                if not ((start_boundary and start > 0 and _is_word_char(text[start - 1]))
+                        or (end_boundary and end < length and _is_word_char(text[end]))):
+                    matched_terms.add(term)
+                    break
+                start = text.find(phrase, start + 1)
+        return matched_terms
+
+    def _walk_automaton(self, text: str) -> set:
+        """Terms with a whole-word occurrence in text, in one pass over it"""
+        goto, fail, outputs, output_link = self._goto, self._fail, self._outputs, self._output_link
+        matched_terms = set()
+        length = len(text)
+        state = 0
+
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            candidate = state if outputs[state] else output_link[state]
+            while candidate > 0:
+                for pattern_length, term, start_boundary, end_boundary in outputs[candidate]:
+                    if term in matched_terms:
+                        continue
+                    start = position - pattern_length + 1
+                    if start_boundary and start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if end_boundary and position + 1 < length and _is_word_char(text[position + 1]):
+                        continue
+                    matched_terms.add(term)
+                candidate = output_link[candidate]
+        return matched_terms
+
+    def _totals(self, user_input: str) -> Dict[int, float]:
+        """Matched weight per intent index"""
+        text = user_input.lower()
+        matched_terms = self._scan_phrases(text) if self.linear_scan else self._walk_automaton(text)
+        totals: Dict[int, float] = {}
+        for term in matched_terms:
+            intent_index = self._term_intent[term]
+            totals[intent_index] = totals.get(intent_index, 0.0) + self._term_weight[term]
+        return totals
+
+    def scores(self, user_input: str) -> Dict[str, float]:
+        """Return the normalised score of every intent with at least one match"""
+        totals = self._totals(user_input)
+        return {
+            self.intent_names[index]: total / self.denominators[index]
+            for index, total in sorted(totals.items())
+        }
+
+    def best_intent(self, user_input: str) -> Tuple[str, float]:
+        """Highest scoring intent (earliest defined wins ties), or ("fallback", 0) without matches"""
+        detected_intent = "fallback"
+        max_score = 0
+        totals = self._totals(user_input)
+        for index in sorted(totals):
+            score = totals[index] / self.denominators[index]
+            if score > max_score:
+                max_score = score
+                detected_intent = self.intent_names[index]
+        return detected_intent, max_score
@@ -0,0 +1,330 @@
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+KB_DIR = "data/kb"
+CURRENT_FILE = "current.json"    # pointer to the published version, replaced atomically
+MANIFEST_FILE = "manifest.json"
+STAGING_PREFIX = ".build-"
+PUBLISH_LOCK_FILE = ".publish.lock"  # held while a version is built and published
+
+KEEP_VERSIONS = 3                # published versions kept for rollback (the current one is always kept)
+STAGING_STALE_SECONDS = 3600     # unfinished builds older than this are removed by gc()
+
+def kb_dir_for(data_dir: str) -> str:
+    """Snapshot directory of a tenant's data directory"""
+    return os.path.join(data_dir, "kb")
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_json_atomic(path: str, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+def _fsync(path: str):
+    with open(path, "rb") as file:
+        os.fsync(file.fileno())
+
+class SnapshotStore:
+    """
+    Versioned, immutable knowledge-base snapshots.
+
+    Each version is a directory holding the vectors, texts and FAQ records of one build plus a
+    manifest with their checksums. A version is assembled in a staging directory, renamed into
+    place when complete and published by replacing current.json, so readers see either the old
+    version or the new one in full. Files a build does not replace are hard-linked from the
+    current version. Nothing in a version directory is written after it is published.
+    """
+
+    def __init__(self, kb_dir: str = KB_DIR):
+        self.kb_dir = kb_dir
+        self._lock_depth = threading.local()
+
+    def path(self, version: str, name: str = "") -> str:
+        return os.path.join(self.kb_dir, version, name)
+
+    # ---- Reading ----
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.kb_dir, CURRENT_FILE), "r", encoding="utf-8") as file:
+                return json.load(file)["version"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def manifest(self, version: str) -> dict:
+        with open(self.path(version, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def versions(self) -> List[str]:
+        """Complete versions, oldest first"""
+        if not os.path.isdir(self.kb_dir):
+            return []
+        return sorted(name for name in os.listdir(self.kb_dir)
+                      if not name.startswith(STAGING_PREFIX) and os.path.exists(self.path(name, MANIFEST_FILE)))
+
+    def verify(self, version: str, names: Optional[List[str]] = None) -> List[str]:
+        """Names of files whose checksum does not match the manifest (or that are missing)"""
+        files = self.manifest(version)["files"]
+        bad = []
+        for name in names or list(files):
+            path = self.path(version, name)
+            if name not in files or not os.path.exists(path) or file_sha256(path) != files[name]["sha256"]:
+                bad.append(name)
+        return bad
+
+    # ---- Building and publishing ----
+
+    def _new_version(self) -> str:
+        now = time.time()
+        return f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(now))}-{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:4]}"
+
+    def build(self, files: Dict[str, str], source: str, info: Optional[dict] = None, carry_over: bool = True) -> str:
+        """
+        Assemble a new version from {name: source path} without publishing it. With carry_over,
+        files of the current version that are not given are linked into the new one unchanged.
+        """
+        os.makedirs(self.kb_dir, exist_ok=True)
+        version = self._new_version()
+        staging = os.path.join(self.kb_dir, STAGING_PREFIX + version)
+        os.makedirs(staging)
+        try:
+            entries = {}
+            current = self.current_version() if carry_over else None
+            if current:
+                for name, entry in self.manifest(current)["files"].items():
+                    if name in files:
+                        continue
+                    try:
+                        os.link(self.path(current, name), os.path.join(staging, name))
+                    except OSError:
+                        shutil.copyfile(self.path(current, name), os.path.join(staging, name))
+                    entries[name] = entry
+            for name, source_path in files.items():
+                target = os.path.join(staging, name)
+                shutil.copyfile(source_path, target)
+                _fsync(target)
+                entries[name] = {"sha256": file_sha256(target), "bytes": os.path.getsize(target)}
+            _write_json_atomic(os.path.join(staging, MANIFEST_FILE), {
+                "version": version,
+                "created_at": time.time(),
+                "source": source,
+                "parent": current,
+                "files": entries,
+                "info": info or {}
+            })
+            os.rename(staging, self.path(version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return version
+
+    def publish(self, version: str):
+        """Point readers at a complete version"""
+        if not os.path.exists(self.path(version, MANIFEST_FILE)):
+            raise FileNotFoundError(f"Snapshot {version} not found in {self.kb_dir}.")
+        _write_json_atomic(os.path.join(self.kb_dir, CURRENT_FILE), {
+            "version": version,
+            "previous": self.current_version(),
+            "published_at": time.time()
+        })
+
+    @contextlib.contextmanager
+    def publish_lock(self):
+        """
+        Hold the kb_dir's publish lock (across threads and processes; re-entrant in one thread).
+        A build carries over the files of the version current when it starts, so two publishers
+        running at once would each drop the files the other one added.
+        """
+        depth = getattr(self._lock_depth, "value", 0)
+        if depth:
+            self._lock_depth.value = depth + 1
+            try:
+                yield
+            finally:
+                self._lock_depth.value = depth
+            return
+        os.makedirs(self.kb_dir, exist_ok=True)
+        with open(os.path.join(self.kb_dir, PUBLISH_LOCK_FILE), "a") as lock_file:
+            # flock is released by the OS if the process dies while holding it
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth.value = 1
+            try:
+                yield
+            finally:
+                self._lock_depth.value = 0
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def build_and_publish(self, files: Dict[str, str], source: str, info: Optional[dict] = None) -> str:
+        """Build a version on top of the current one and publish it, one publisher at a time"""
+        with self.publish_lock():
+            version = self.build(files, source, info)
+            self.publish(version)
+            self.gc()
+        return version
+
+    def rollback(self, version: Optional[str] = None) -> Optional[str]:
+        """Publish the given version, or the one before the current; returns the version now current"""
+        with self.publish_lock():
+            if version is None:
+                current = self.current_version()
+                older = [name for name in self.versions() if current is None or name < current]
+                if not older:
+                    return None
+                version = older[-1]
+            self.publish(version)
+        return version
+
+    def gc(self, keep: int = KEEP_VERSIONS) -> List[str]:
+        """Remove all but the newest `keep` versions (never the current one) and abandoned builds"""
+        with self.publish_lock():
+            return self._gc(keep)
+
+    def _gc(self, keep: int) -> List[str]:
+        removed = []
+        current = self.current_version()
+        versions = self.versions()
+        for version in versions[:max(len(versions) - keep, 0)]:
+            if version != current:
+                shutil.rmtree(self.path(version), ignore_errors=True)
+                removed.append(version)
+        if os.path.isdir(self.kb_dir):
+            for name in os.listdir(self.kb_dir):
+                staging = os.path.join(self.kb_dir, name)
+                if name.startswith(STAGING_PREFIX) and time.time() - os.path.getmtime(staging) > STAGING_STALE_SECONDS:
+                    shutil.rmtree(staging, ignore_errors=True)
+        return removed
+
+class SnapshotFile:
+    """
+    One file of the current snapshot, loaded once per published version.
+
+    get() reads the pointer on every request. After a publish, one request loads and verifies the
+    new version while concurrent requests keep getting the old one; a version that fails its
+    checksum or cannot be loaded is skipped and the old one stays in service.
+    """
+
+    def __init__(self, store: SnapshotStore, name: str, loader: Callable[[str], Any]):
+        self.store = store
+        self.name = name
+        self.loader = loader
+        self.version: Optional[str] = None
+        self._value = None
+        self._skipped = set()  # versions without this file or that failed to load
+        self._reload_lock = threading.Lock()
+        self._shadow_checked = None  # (version, mtime) of the last warn_if_shadowed check
+
+    def available(self) -> bool:
+        return self.store.current_version() is not None
+
+    def get(self):
+        version = self.store.current_version()
+        if version is None or version == self.version or version in self._skipped:
+            return self._value
+        if not self._reload_lock.acquire(blocking=self._value is None):
+            return self._value  # another request is loading the new version
+        try:
+            if version != self.version and version not in self._skipped:
+                self._reload(version)
+        finally:
+            self._reload_lock.release()
+        return self._value
+
+    def warn_if_shadowed(self, path: str) -> bool:
+        """
+        Warn when a file written outside the snapshots (the flat file at path) is newer than the current
+        version, which keeps being served instead of it. Checked again only when either one changes.
+        """
+        version = self.store.current_version()
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        if version is None or (version, mtime) == self._shadow_checked:
+            return False
+        self._shadow_checked = (version, mtime)
+        try:
+            created_at = self.store.manifest(version)["created_at"]
+        except (OSError, ValueError, KeyError):
+            return False
+        if mtime <= created_at:
+            return False
+        print(f"Warning: {path} is newer than knowledge-base snapshot {version} and is ignored; "
+              f"publish a snapshot to serve it.")
+        return True
+
+    def _reload(self, version: str):
+        try:
+            if self.name not in self.store.manifest(version)["files"]:
+                self._skipped.add(version)
+                return
+            if self.store.verify(version, [self.name]):
+                raise ValueError(f"checksum mismatch for {self.name}")
+            value = self.loader(self.store.path(version, self.name))
+        except FileNotFoundError:
+            return  # removed while loading; the pointer has moved on
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: Could not load {self.name} from snapshot {version}, keeping {self.version}: {e}")
+            self._skipped.add(version)
+            return
+        self._value, self.version = value, version
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, verify, roll back and clean up knowledge-base snapshots.")
+    parser.add_argument("--kb-dir", default=KB_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List versions, marking the current one")
+    verify = commands.add_parser("verify", help="Check a version's files against its manifest")
+    verify.add_argument("version", nargs="?")
+    rollback = commands.add_parser("rollback", help="Publish the previous (or a given) version")
+    rollback.add_argument("version", nargs="?")
+    gc = commands.add_parser("gc", help="Remove old versions")
+    gc.add_argument("--keep", type=int, default=KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.kb_dir)
+    current = store.current_version()
+    if args.command == "list":
+        for version in store.versions():
+            manifest = store.manifest(version)
+            size = sum(entry["bytes"] for entry in manifest["files"].values())
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(manifest["created_at"]))
+            print(f"{'*' if version == current else ' '} {version}  {created}  {manifest['source']:<16} "
+                  f"{len(manifest['files'])} files, {size / 1024:.0f} KB")
+    elif args.command == "verify":
+        version = args.version or current
+        if version is None:
+            print("Error: No published snapshot.")
+            return
+        bad = store.verify(version)
+        print(f"{version}: {'ok' if not bad else 'corrupt: ' + ', '.join(bad)}")
+    elif args.command == "rollback":
+        print(f"current: {store.rollback(args.version) or current}")
+    else:
+        removed = store.gc(args.keep)
+        print(f"removed {len(removed)} version(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import abc
+import os
+from typing import Iterator, List, Optional
+
+# Environment variables used to point the services at another OpenAI-compatible endpoint,
+# e.g. the local stand-in server in src/local_llm_server.py
+LLM_BASE_URL_ENV = "LLM_BASE_URL"
+LLM_API_KEY_ENV = "LLM_API_KEY"
+
+class LLMBackend(abc.ABC):
+    """Interface for the chat-completion provider used by the services"""
+
+    @abc.abstractmethod
+    def chat(self, messages: List[dict], model: str, temperature: float = 0.7) -> str:
+        """Return the full assistant reply for a list of chat messages"""
+        raise NotImplementedError
+
+    def stream_chat(self, messages: List[dict], model: str, temperature: float = 0.7) -> Iterator[str]:
+        """Yield the assistant reply in pieces as it is generated"""
+        yield self.chat(messages, model, temperature)
+
+class OpenAIBackend(LLMBackend):
+    """
+    Backend for the OpenAI API or any OpenAI-compatible server.
+    The client is created on first use, so importing the services no longer needs an API key.
+    """
+
+    def __init__(self,
+                 client=None,
+                 base_url: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None):
+        self._client = client
+        self.base_url = base_url or os.getenv(LLM_BASE_URL_ENV)
+        self.api_key = api_key or os.getenv(LLM_API_KEY_ENV)
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            kwargs = {}
+            if self.base_url:
+                kwargs["base_url"] = self.base_url
+                # Local stand-ins accept any key; the SDK still insists on one being set
+                kwargs["api_key"] = self.api_key or os.getenv("OPENAI_API_KEY") or "local-stand-in"
+            elif self.api_key:
+                kwargs["api_key"] = self.api_key
+            if self.timeout is not None:
+                kwargs["timeout"] = self.timeout
+            if self.max_retries is not None:
+                kwargs["max_retries"] = self.max_retries
+            self._client = OpenAI(**kwargs)
+        return self._client
+
+    def chat(self, messages: List[dict], model: str, temperature: float = 0.7) -> str:
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature
+        )
+        return response.choices[0].message.content.strip()
+
+    def stream_chat(self, messages: List[dict], model: str, temperature: float = 0.7) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
+
+_default_backend: Optional[LLMBackend] = None
+
+def get_default_backend() -> LLMBackend:
+    """Return the process-wide backend, creating an OpenAIBackend on first use"""
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = OpenAIBackend()
+    return _default_backend
+
+def set_default_backend(backend: Optional[LLMBackend]):
+    """Replace the process-wide backend (None restores the OpenAI default on next use)"""
+    global _default_backend
+    _default_backend = backend
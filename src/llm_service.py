@@ -1,21 +1,50 @@
-import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
 import pytz
-from openai import OpenAI
+import atexit
 import sys
 import os
+import threading
+import time
 
 # Add the root directory to Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(project_root)
 
 from src.conversation_flows import ConversationManager
+from src.conversation_summary import SUMMARY_BATCH_TURNS, ConversationSummarizer, build_history_context
+from src.dialogue_state import DialogueState
+from src.llm_backend import LLMBackend, get_default_backend
+from src.session_log import FSYNC_INTERVAL
+from src.session_cache import get_shared_session_store
+from src.session_ids import new_session_id
+from src.session_store import SessionStore
+from src.singleflight import SingleFlight, make_key
+from src.speculation import EXACT, NEAR, Speculator, normalize_transcript
+from src.turn_trace import TurnTrace, traced
+from src.upstream_scheduler import (
+    HOLD_MESSAGE, PRIORITY_LIVE_CHAT, SchedulerOverloaded, estimate_tokens, get_scheduler
+)
 
-CHAT_HISTORY_DIR = "data/chat_sessions"
+CHAT_MODEL = "gpt-4"
+PROMPT_HISTORY_TURNS = 5  # previous turns kept verbatim; older ones are folded into the session summary
+LLM_COALESCE_TIMEOUT = 60  # seconds a turn waits on an identical in-flight LLM call
+PROMPT_TIME_FORMAT = "%Y-%m-%d %H:%M %Z"  # to the minute, so turns in the same minute can share an LLM call
+EMBEDDING_RETRIEVAL_ENV = "EMBEDDING_RETRIEVAL"  # "1" (default) or "0" to run without FAQ retrieval and the embedding intent fallback
 
-# Initialize OpenAI client
-client = OpenAI()
+# Shared across LLMService instances so identical prompts from concurrent turns hit the API once
+llm_inflight = SingleFlight(default_timeout=LLM_COALESCE_TIMEOUT)
+
+# Speculative turn preparation per session, shared across LLMService instances like llm_inflight
+# (a voice turn may start in one Streamlit run and finish in the next)
+_speculators: Dict[str, Speculator] = {}
+_speculators_lock = threading.Lock()
+speculation_stats = {"turns": 0, "submitted": 0, "started": 0, "superseded": 0, "failed": 0,
+                     EXACT: 0, NEAR: 0, "missed": 0}
+
+# Traced turns waiting for trace.finish() (first audio) to be saved, per session
+_unfinished_traces: Dict[str, TurnTrace] = {}
+_unfinished_traces_lock = threading.Lock()
 
 def get_system_message():
     """Define core system message with constraints"""
@@ -30,46 +59,61 @@ def get_system_message():
     Remember to be helpful, clear, and concise while keeping the interaction professional and friendly."""
 
 class LLMService:
-    def __init__(self):
-        self.conversation_manager = ConversationManager()
-        os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
-    
-    def load_session_history(self, session_id: str) -> List[dict]:
-        """Load chat history for a session"""
-        session_file = os.path.join(CHAT_HISTORY_DIR, f"{session_id}.json")
-        if os.path.exists(session_file):
-            with open(session_file, "r", encoding="utf-8") as file:
-                return json.load(file)
-        return []
+    def __init__(self,
+                 backend: Optional[LLMBackend] = None,
+                 retriever=None,
+                 intent_classifier=None,
+                 session_store: Optional[SessionStore] = None,
+                 fsync_policy: str = FSYNC_INTERVAL):
+        self.conversation_manager = ConversationManager(intent_classifier=intent_classifier)
+        self.backend = backend or get_default_backend()
+        # Optional EmbeddingRetriever; its query embedding is shared with the intent classifier
+        self.retriever = retriever
+        # Process-wide cached store over JSONL files by default; SESSION_STORE=sqlite selects SQLite
+        self.session_store = session_store or get_shared_session_store(fsync_policy)
+        self.summarizer = ConversationSummarizer(self.session_store, self.backend, window_turns=PROMPT_HISTORY_TURNS)
+        # Registered after the session store, so pending traced turns are saved before it is closed
+        atexit.register(self.save_unfinished_turns)
+    
+    def load_session_history(self, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        """Load chat history for a session (only the last_n turns if given)"""
+        return self.session_store.load(session_id, last_n)
     
     def save_session_history(self, session_id: str, history: List[dict]):
-        """Save chat history for a session"""
-        session_file = os.path.join(CHAT_HISTORY_DIR, f"{session_id}.json")
-        with open(session_file, "w", encoding="utf-8") as file:
-            json.dump(history, file, indent=4)
+        """Save chat history for a session, replacing what is stored"""
+        self.session_store.save(session_id, history)
     
-    def generate_llm_response(self, 
-                              user_input: str, 
-                              conversation_result: dict,
-                              session_history: List[dict],
-                              current_time: Optional[datetime] = None) -> str:
-        """Generate response using LLM with conversation context"""
+    def append_session_turn(self, session_id: str, turn: dict):
+        """Append a single turn to a session's history"""
+        self.session_store.append(session_id, turn)
+    
+    def build_llm_messages(self,
+                           user_input: str,
+                           conversation_result: dict,
+                           session_history: List[dict],
+                           current_time: Optional[datetime] = None,
+                           relevant_information: Optional[List[str]] = None,
+                           session_meta: Optional[dict] = None) -> List[dict]:
+        """Build the chat messages for one turn"""
         if current_time is None:
             current_time = datetime.now(pytz.UTC)
+        
+        knowledge = ""
+        if relevant_information:
+            knowledge = "Relevant Business Information:\n" + "\n".join(relevant_information)
             
-        # Prepare conversation history
-        history = "\n".join([
-            f"User: {msg['user']}\nAssistant: {msg['assistant']}"
-            for msg in session_history[-5:]  # Keep last 5 messages for context
-        ])
+        # Running summary plus recent turns, within a fixed token budget however long the session
+        history = build_history_context(session_history, session_meta or {})
         
         prompt = f"""
         {get_system_message()}
 
-        Current Time: {current_time.strftime('%Y-%m-%d %H:%M:%S %Z')}
+        Current Time: {current_time.strftime(PROMPT_TIME_FORMAT)}
         Detected Intent: {conversation_result['intent']}
         Confidence: {conversation_result['confidence']}
         
+        {knowledge}
+        
         Previous Conversation:
         {history}
 
@@ -81,50 +125,314 @@ class LLMService:
         If the rule-based response is appropriate, you can enhance it. If it needs modification, please adjust it while maintaining the same intent.
         """
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+        return [{"role": "user", "content": prompt}]
+    
+    def coalesce_key(self,
+                     user_input: str,
+                     conversation_result: dict,
+                     session_history: List[dict],
+                     current_time: datetime,
+                     relevant_information: Optional[List[str]] = None,
+                     session_meta: Optional[dict] = None) -> str:
+        """
+        Key of the LLM call for a turn: the normalized question, intent, retrieved context, minute
+        and conversation so far. The randomly picked rule-based template is left out, so identical
+        questions asked at the same time share one call even though their prompts differ.
+        """
+        history = build_history_context(session_history, session_meta or {})
+        return make_key(
+            id(self.backend), CHAT_MODEL, 0.7,
+            normalize_transcript(user_input),
+            conversation_result["intent"],
+            make_key(relevant_information or []),
+            current_time.strftime(PROMPT_TIME_FORMAT),
+            make_key(history)
         )
-        
-        return response.choices[0].message.content.strip()
     
-    def handle_chat(self, user_input: str, session_id: str) -> str:
-        """Main chat handling function"""
-        # Load session history
-        session_history = self.load_session_history(session_id)
-        
-        # Process through conversation manager
-        conversation_result = self.conversation_manager.process_message(user_input)
-        
-        # Generate enhanced response using LLM
-        final_response = self.generate_llm_response(
-            user_input,
-            conversation_result,
-            session_history
+    def generate_llm_response(self, 
+                              user_input: str, 
+                              conversation_result: dict,
+                              session_history: List[dict],
+                              current_time: Optional[datetime] = None,
+                              priority: int = PRIORITY_LIVE_CHAT,
+                              relevant_information: Optional[List[str]] = None,
+                              session_meta: Optional[dict] = None) -> str:
+        """Generate response using LLM with conversation context"""
+        if current_time is None:
+            current_time = datetime.now(pytz.UTC)
+        messages = self.build_llm_messages(
+            user_input, conversation_result, session_history, current_time, relevant_information, session_meta
+        )
+        key = self.coalesce_key(user_input, conversation_result, session_history, current_time,
+                                relevant_information, session_meta)
+        return llm_inflight.do(
+            key,
+            lambda: get_scheduler().call(
+                "llm",
+                lambda: self.backend.chat(messages, model=CHAT_MODEL, temperature=0.7),
+                priority=priority,
+                tokens=estimate_tokens(messages[0]["content"])
+            )
+        )
+    
+    def stream_llm_response(self,
+                            user_input: str,
+                            conversation_result: dict,
+                            session_history: List[dict],
+                            current_time: Optional[datetime] = None,
+                            priority: int = PRIORITY_LIVE_CHAT,
+                            relevant_information: Optional[List[str]] = None,
+                            session_meta: Optional[dict] = None) -> Iterator[str]:
+        """
+        Like generate_llm_response, but yields the reply in pieces as it is generated.
+        The LLM slot is held until the stream is exhausted or closed; streams are not coalesced.
+        """
+        messages = self.build_llm_messages(
+            user_input, conversation_result, session_history, current_time, relevant_information, session_meta
         )
+        with get_scheduler().slot("llm", priority=priority, tokens=estimate_tokens(messages[0]["content"])):
+            yield from self.backend.stream_chat(messages, model=CHAT_MODEL, temperature=0.7)
+    
+    def speculate(self, session_id: str, interim_transcript: str):
+        """
+        Start preparing the turn (history, retrieval, intent) from an interim transcript while the
+        caller is still talking. The final transcript reuses the result if it matches.
+        """
+        with _speculators_lock:
+            speculator = _speculators.get(session_id)
+            if speculator is None:
+                speculator = Speculator(lambda text: self._prepare_context(text, session_id))
+                _speculators[session_id] = speculator
+        speculator.submit(interim_transcript)
+    
+    def cancel_speculation(self, session_id: str):
+        """Discard speculation for a turn that will not be answered"""
+        speculator = self._pop_speculator(session_id)
+        if speculator is not None:
+            speculator.cancel()
+    
+    def _pop_speculator(self, session_id: str) -> Optional[Speculator]:
+        with _speculators_lock:
+            speculator = _speculators.pop(session_id, None)
+            if speculator is not None:
+                speculation_stats["turns"] += 1
+                for name in ("submitted", "started", "superseded", "failed"):
+                    speculation_stats[name] += speculator.stats[name]
+        return speculator
+    
+    def _take_speculation(self, user_input: str, session_id: str, trace: Optional[TurnTrace] = None):
+        """(EXACT or NEAR, prepared context) from speculation on this turn's interims, or None"""
+        speculator = self._pop_speculator(session_id)
+        if speculator is None:
+            return None
+        with traced(trace, "speculation"):
+            match = speculator.take(user_input)
+        with _speculators_lock:
+            speculation_stats[match[0] if match else "missed"] += 1
+        return match
+    
+    def _prepare_context(self, user_input: str, session_id: str, trace: Optional[TurnTrace] = None,
+                         reuse: Optional[dict] = None) -> dict:
+        """
+        Load history, retrieve context and run the conversation manager for user_input.
+        With reuse (a context prepared for nearly the same words), history and retrieval are
+        taken from it and only the conversation manager runs again.
+        """
+        if reuse is not None:
+            session_history, session_meta = reuse["session_history"], reuse["session_meta"]
+            relevant_information, query_embedding = reuse["relevant_information"], reuse["query_embedding"]
+        else:
+            # Load only the turns the prompt and dialogue state need; older turns live in the summary
+            session_history = self.load_session_history(session_id, last_n=PROMPT_HISTORY_TURNS + SUMMARY_BATCH_TURNS)
+            session_meta = self.session_store.load_meta(session_id)
+            
+            # Retrieve business context; the query embedding is reused for intent classification
+            relevant_information, query_embedding = None, None
+            if self.retriever is not None:
+                with traced(trace, "retrieval"):
+                    results, query_embedding = self.retriever.retrieve(user_input)
+                relevant_information = [text for text, _ in results]
         
-        # Update session history
-        session_history.append({
+        # Process through conversation manager, starting from the state saved with the last turn
+        dialogue_state = DialogueState.from_history(session_history)
+        if session_meta.get("summarized_through", 0) > dialogue_state.turns:
+            # Summary left over from before the session was reset
+            session_meta = {}
+        with traced(trace, "intent"):
+            conversation_result = self.conversation_manager.process_message(
+                user_input, query_embedding, state=dialogue_state
+            )
+        return {
+            "session_history": session_history,
+            "session_meta": session_meta,
+            "relevant_information": relevant_information,
+            "query_embedding": query_embedding,
+            "conversation_result": conversation_result
+        }
+    
+    def _prepare_turn(self, user_input: str, session_id: str, trace: Optional[TurnTrace] = None) -> dict:
+        """Context for one turn, reusing speculation on the interim transcripts where it matches"""
+        # The previous turn must be in the history before this one reads it
+        self.save_unfinished_turns(session_id)
+        match = self._take_speculation(user_input, session_id, trace)
+        if match is None:
+            return self._prepare_context(user_input, session_id, trace)
+        kind, context = match
+        if kind == EXACT:
+            return context
+        return self._prepare_context(user_input, session_id, trace, reuse=context)
+    
+    def _record_turn(self, session_id: str, user_input: str, final_response: str, turn: dict,
+                     trace: Optional[TurnTrace] = None):
+        """
+        Append the turn to the session history and fold old turns into the summary.
+        A traced turn is saved when its trace finishes (the reply starts playing), with the stage timings,
+        or when it is abandoned.
+        """
+        conversation_result = turn["conversation_result"]
+        record = {
             "user": user_input,
             "assistant": final_response,
             "intent": conversation_result["intent"],
-            "timestamp": datetime.now(pytz.UTC).isoformat()
-        })
+            "timestamp": datetime.now(pytz.UTC).isoformat(),
+            "dialogue_state": conversation_result["dialogue_state"].to_dict()
+        }
+
+        def save():
+            if trace is not None:
+                record.update(trace.to_turn_fields())
+            self.append_session_turn(session_id, record)
+            # Speculation on the next turn that started before this save prepared it from stale history
+            self.cancel_speculation(session_id)
+            self.summarizer.maybe_summarize(session_id, conversation_result["dialogue_state"].turns, turn["session_meta"])
+
+        if trace is None:
+            save()
+            return
+        # A trace the caller never finishes is abandoned by the session's next turn, a reset or exit,
+        # so the turn is still saved (without latency_ms)
+        with _unfinished_traces_lock:
+            _unfinished_traces[session_id] = trace
+
+        def saved():
+            with _unfinished_traces_lock:
+                if _unfinished_traces.get(session_id) is trace:
+                    del _unfinished_traces[session_id]
+
+        trace.on_finish(save)
+        trace.on_finish(saved)
+    
+    def save_unfinished_turns(self, session_id: Optional[str] = None):
+        """Save traced turns whose trace was never finished (all sessions, or just session_id)"""
+        with _unfinished_traces_lock:
+            if session_id is None:
+                traces = list(_unfinished_traces.values())
+                _unfinished_traces.clear()
+            else:
+                trace = _unfinished_traces.pop(session_id, None)
+                traces = [trace] if trace is not None else []
+        for trace in traces:
+            trace.abandon()
+    
+    def handle_chat(self, user_input: str, session_id: str, priority: int = PRIORITY_LIVE_CHAT,
+                    trace: Optional[TurnTrace] = None) -> str:
+        """
+        Main chat handling function.
+        With a trace, stage timings are recorded and the turn is saved once trace.finish() is called,
+        or without latency_ms by the session's next turn, a reset or process exit if it never is.
+        """
+        turn = self._prepare_turn(user_input, session_id, trace)
+        conversation_result = turn["conversation_result"]
         
-        # Save updated history
-        self.save_session_history(session_id, session_history)
+        if conversation_result["resolved_by_state"]:
+            # Slot follow-ups ("tomorrow at 3") are answered from the template without an LLM call
+            final_response = conversation_result["response"]
+        else:
+            # Generate enhanced response using LLM
+            try:
+                with traced(trace, "llm"):
+                    final_response = self.generate_llm_response(
+                        user_input,
+                        conversation_result,
+                        turn["session_history"],
+                        priority=priority,
+                        relevant_information=turn["relevant_information"],
+                        session_meta=turn["session_meta"]
+                    )
+            except SchedulerOverloaded:
+                # Shed under load: answer immediately and leave the history untouched
+                return HOLD_MESSAGE
         
+        self._record_turn(session_id, user_input, final_response, turn, trace)
         return final_response
     
+    def handle_chat_stream(self, user_input: str, session_id: str, priority: int = PRIORITY_LIVE_CHAT,
+                           trace: Optional[TurnTrace] = None) -> Iterator[str]:
+        """
+        Streaming handle_chat: yields the response in pieces as the LLM generates it, so speech
+        can start before the reply is complete. The turn is saved once the stream is exhausted, or
+        with the partial reply if the stream is closed early (barge-in).
+        """
+        turn = self._prepare_turn(user_input, session_id, trace)
+        conversation_result = turn["conversation_result"]
+        
+        pieces = []
+        llm_start = time.monotonic()
+        try:
+            if conversation_result["resolved_by_state"]:
+                pieces.append(conversation_result["response"])
+                yield conversation_result["response"]
+            else:
+                for piece in self.stream_llm_response(
+                    user_input,
+                    conversation_result,
+                    turn["session_history"],
+                    priority=priority,
+                    relevant_information=turn["relevant_information"],
+                    session_meta=turn["session_meta"]
+                ):
+                    if trace is not None and not pieces:
+                        trace.add("llm_first_token", (time.monotonic() - llm_start) * 1000)
+                    pieces.append(piece)
+                    yield piece
+                if trace is not None:
+                    trace.add("llm", (time.monotonic() - llm_start) * 1000)
+        except SchedulerOverloaded:
+            yield HOLD_MESSAGE
+            return
+        except GeneratorExit:
+            # The caller interrupted; keep the part of the reply that was generated
+            if pieces:
+                self._record_turn(session_id, user_input, "".join(pieces).strip(), turn, trace)
+            raise
+        
+        self._record_turn(session_id, user_input, "".join(pieces).strip(), turn, trace)
+    
     def reset_session(self, session_id: str) -> str:
         """Reset a conversation session"""
-        session_file = os.path.join(CHAT_HISTORY_DIR, f"{session_id}.json")
-        if os.path.exists(session_file):
-            with open(session_file, "w", encoding="utf-8") as file:
-                json.dump([], file, indent=4)
+        self.save_unfinished_turns(session_id)
+        self.cancel_speculation(session_id)
+        if self.session_store.exists(session_id):
+            self.session_store.reset(session_id)
         return "Session reset. How can I assist you today?"
 
     def generate_session_id(self) -> str:
         """Generate a unique session ID"""
-        return f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return generate_session_id()
+
+def create_llm_service(**kwargs) -> LLMService:
+    """
+    The service the chat apps run: FAQ retrieval through EmbeddingRetriever (FAQ index, published
+    snapshots) and the embedding intent fallback, unless EMBEDDING_RETRIEVAL=0.
+    """
+    if os.getenv(EMBEDDING_RETRIEVAL_ENV, "1") != "0":
+        from src.conversation_flows import default_flow
+        from src.intent_classifier import EmbeddingIntentClassifier
+        from src.retriever import EmbeddingRetriever
+        kwargs.setdefault("retriever", EmbeddingRetriever())
+        kwargs.setdefault("intent_classifier", EmbeddingIntentClassifier(default_flow))
+    return LLMService(**kwargs)
+
+def generate_session_id() -> str:
+    """Generate a unique, time-sortable session ID"""
+    return new_session_id()
@@ -3,7 +3,8 @@ import json
 import torch
 from datetime import datetime, timedelta
 from sentence_transformers import SentenceTransformer, util
-from openai import OpenAI
+from src.llm_backend import get_default_backend
+from src.session_ids import new_session_id
 import random
 import pytz
 
@@ -11,8 +12,7 @@ import pytz
 EMBEDDINGS_FILE = "data/faq_responses_embeddings.pt"
 CHAT_HISTORY_DIR = "data/chat_sessions"
 
-# Initialize OpenAI client and embedding model
-client = OpenAI()
+# Initialize embedding model
 model = SentenceTransformer("all-MiniLM-L6-v2")
 
 TIMEZONE = 'America/New_York'  # Change to your business timezone
@@ -141,8 +141,9 @@ def search_embeddings(query, top_k=3, min_similarity=0.45):
     
     return filtered_results[:top_k] if filtered_results else []
 
-def generate_response(user_input, session_history, relevant_chunks, current_time, max_history=5):
+def generate_response(user_input, session_history, relevant_chunks, current_time, max_history=5, backend=None):
     """Generate a more natural conversational response with time awareness"""
+    backend = backend or get_default_backend()
     truncated_history = session_history[-max_history:]
     history = "\n".join([f"User: {msg['user']}\nAssistant: {msg['assistant']}" for msg in truncated_history])
     
@@ -186,14 +187,13 @@ def generate_response(user_input, session_history, relevant_chunks, current_time
     Please provide a natural, conversational response:
     """
 
-    response = client.chat.completions.create(
+    return backend.chat(
+        [{"role": "user", "content": prompt}],
         model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
         temperature=0.7
     )
-    return response.choices[0].message.content.strip()
 
-def handle_chat(user_input, session_id, current_time=None):
+def handle_chat(user_input, session_id, current_time=None, backend=None):
     """Enhanced chat handler with improved intent detection"""
     if current_time is None:
         current_time = datetime.now(pytz.UTC)
@@ -215,7 +215,7 @@ def handle_chat(user_input, session_id, current_time=None):
         response = ConversationalEnhancement.get_farewell_response()
     else:
         relevant_chunks = search_embeddings(user_input)
-        response = generate_response(user_input, session_history, relevant_chunks, current_time)
+        response = generate_response(user_input, session_history, relevant_chunks, current_time, backend=backend)
 
     session_history.append({
         "user": user_input,
@@ -266,4 +266,4 @@ def reset_session(session_id):
 
 def generate_new_session_id():
     """Generate a unique session ID"""
-    return f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
\ No newline at end of file
+    return new_session_id()
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+Deterministic OpenAI-compatible stand-in server for offline throughput and tail-latency tests.
+
+Run it with:
+    python -m src.local_llm_server --port 8001 --latency-ms 300 --distribution lognormal
+
+and point the services at it with LLM_BASE_URL=http://127.0.0.1:8001/v1.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+# Words used to build deterministic replies
+REPLY_VOCABULARY = [
+    "thank", "you", "for", "calling", "our", "office", "we", "are", "happy", "to", "help",
+    "with", "your", "appointment", "the", "clinic", "is", "open", "monday", "through",
+    "friday", "please", "let", "us", "know", "if", "there", "anything", "else", "today"
+]
+SENTENCE_LENGTH = 10
+
+@dataclass
+class StandInConfig:
+    latency_ms: float = 200.0           # median time before the first token
+    distribution: str = "fixed"         # one of LATENCY_DISTRIBUTIONS
+    spread: float = 0.5                 # uniform: +/- fraction, normal: stddev fraction, lognormal: sigma
+    tokens_per_second: float = 50.0     # 0 disables the per-token delay
+    response_tokens: int = 40
+    error_rate: float = 0.0             # fraction of requests answered with error_status
+    error_status: int = 500
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{self.distribution}'.")
+
+class StandInModel:
+    """
+    Decides latency, errors and reply text for each request.
+    Every decision is derived from the seed, the request body and how often that body was seen,
+    so the same workload always produces the same timings regardless of thread scheduling.
+    """
+
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _rng_for(self, body: dict) -> random.Random:
+        digest = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock:
+            occurrence = self._seen.get(digest, 0)
+            self._seen[digest] = occurrence + 1
+        return random.Random(f"{self.config.seed}:{digest}:{occurrence}")
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        base = self.config.latency_ms / 1000.0
+        spread = self.config.spread
+        if self.config.distribution == "uniform":
+            return max(0.0, rng.uniform(base * (1 - spread), base * (1 + spread)))
+        if self.config.distribution == "normal":
+            return max(0.0, rng.gauss(base, base * spread))
+        if self.config.distribution == "lognormal":
+            # Median equals latency_ms, sigma controls the tail
+            return base * math.exp(rng.gauss(0.0, spread))
+        return base
+
+    def plan(self, body: dict) -> Tuple[float, bool, List[str]]:
+        """Return (first-token latency in seconds, whether to fail, reply tokens)"""
+        rng = self._rng_for(body)
+        latency = self._sample_latency(rng)
+        fail = rng.random() < self.config.error_rate
+        tokens = [rng.choice(REPLY_VOCABULARY) for _ in range(self.config.response_tokens)]
+        # End a sentence every SENTENCE_LENGTH words so streaming consumers see realistic boundaries
+        for i in range(len(tokens)):
+            if (i + 1) % SENTENCE_LENGTH == 0 or i == len(tokens) - 1:
+                tokens[i] += "."
+        return latency, fail, tokens
+
+    def token_delay(self) -> float:
+        if self.config.tokens_per_second <= 0:
+            return 0.0
+        return 1.0 / self.config.tokens_per_second
+
+def _make_handler(model: StandInModel):
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers: Dict[str, str] = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "stand-in", "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            latency, fail, tokens = model.plan(body)
+            time.sleep(latency)
+
+            if fail:
+                status = model.config.error_status
+                headers = {"Retry-After": "1"} if status == 429 else None
+                self._send_json(status, {"error": {"message": "Injected failure", "type": "server_error"}}, headers)
+                return
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            model_name = body.get("model", "stand-in")
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+
+            if body.get("stream"):
+                self._stream(completion_id, created, model_name, tokens)
+                return
+
+            time.sleep(model.token_delay() * len(tokens))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model_name,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(tokens)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens)
+                }
+            })
+
+        def _stream(self, completion_id: str, created: int, model_name: str, tokens: List[str]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def send_chunk(delta: dict, finish_reason=None):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model_name,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            send_chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(tokens):
+                send_chunk({"content": token if i == 0 else f" {token}"})
+                time.sleep(model.token_delay())
+            send_chunk({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return StandInHandler
+
+def start_stand_in_server(config: StandInConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """
+    Start the stand-in server on a background thread.
+    Returns the server; its base URL for OpenAI clients is f"http://{host}:{server.server_port}/v1".
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(StandInModel(config or StandInConfig())))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        latency_ms=args.latency_ms,
+        distribution=args.distribution,
+        spread=args.spread,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed
+    )
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(StandInModel(config)))
+    print(f"Stand-in LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
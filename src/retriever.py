@@ -0,0 +1,93 @@
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import torch
+from sentence_transformers import util
+
+from src.content_manager import FAQ_RESPONSES_EMBEDDINGS_FILE, encode_query, load_embeddings_data
+from src.faq_index import FAQ_INDEX_DIR, FAQIndex, index_exists
+from src.kb_snapshots import KB_DIR, SnapshotFile, SnapshotStore
+
+class EmbeddingRetriever:
+    """
+    Retrieves the most relevant FAQ entries for a chat turn.
+    Searches the incremental FAQ index once it exists, picking up single-record edits before each
+    search. Otherwise, and while a newly published knowledge-base snapshot is ahead of the index, the
+    snapshot's FAQ embeddings are used and swapped for the next version between requests; trees
+    without snapshots read the embeddings file.
+    The query embedding is computed once per turn and can be reused by other stages (e.g. intent classification).
+    """
+
+    def __init__(self, embeddings_file: str = FAQ_RESPONSES_EMBEDDINGS_FILE, top_k: int = 3, min_similarity: float = 0.35,
+                 index_dir: Optional[str] = FAQ_INDEX_DIR, kb_dir: Optional[str] = KB_DIR):
+        self.embeddings_file = embeddings_file
+        self._snapshot = SnapshotFile(SnapshotStore(kb_dir), os.path.basename(embeddings_file), load_embeddings_data) if kb_dir else None
+        self.index_dir = index_dir
+        self._index: Optional[FAQIndex] = None
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self._embeddings = None
+        self._texts: List[str] = []
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Load (or reload after a rebuild) the snapshot's or the flat embeddings file"""
+        if self._snapshot is not None and self._snapshot.available():
+            self._snapshot.warn_if_shadowed(self.embeddings_file)
+            data = self._snapshot.get()
+            return (data["embeddings"], data["texts"]) if data else (None, [])
+        if not os.path.exists(self.embeddings_file):
+            return None, []
+        mtime = os.path.getmtime(self.embeddings_file)
+        with self._lock:
+            if self._loaded_mtime != mtime:
+                data = load_embeddings_data(self.embeddings_file)
+                self._embeddings, self._texts = data["embeddings"], data["texts"]
+                self._loaded_mtime = mtime
+            return self._embeddings, self._texts
+
+    def _get_index(self) -> Optional[FAQIndex]:
+        """Open the FAQ index read-only once the business interface has built it"""
+        if self._index is None and self.index_dir and index_exists(self.index_dir):
+            with self._lock:
+                if self._index is None:
+                    self._index = FAQIndex(self.index_dir, read_only=True)
+        return self._index
+
+    def _index_current(self, index: FAQIndex) -> bool:
+        """
+        The index serves while it matches the published snapshot. A snapshot published since (a new
+        onboarding or a rollback) serves until the business interface has synced the index to it.
+        """
+        if self._snapshot is None or index.snapshot_version is None:
+            return True
+        return index.snapshot_version == self._snapshot.store.current_version()
+
+    def encode(self, query: str):
+        return encode_query(query)
+
+    def search(self, query_embedding, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Return (text, similarity) pairs above min_similarity, best first"""
+        index = self._get_index()
+        if index is not None:
+            index.refresh()
+        if index is not None and self._index_current(index):
+            return [(text, score) for _, text, score in index.search(query_embedding, top_k or self.top_k, self.min_similarity)]
+        embeddings, texts = self._load()
+        if embeddings is None or not texts:
+            return []
+        top_k = min(top_k or self.top_k, len(texts))
+        cos_scores = util.pytorch_cos_sim(query_embedding, embeddings)[0]
+        top_results = torch.topk(cos_scores, k=top_k)
+        return [
+            (texts[idx], score.item())
+            for score, idx in zip(top_results.values, top_results.indices)
+            if score.item() >= self.min_similarity
+        ]
+
+    def retrieve(self, query: str, top_k: Optional[int] = None):
+        """Encode the query and search; returns (results, query_embedding)"""
+        query_embedding = self.encode(query)
+        return self.search(query_embedding, top_k), query_embedding
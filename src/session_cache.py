@@ -0,0 +1,249 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.session_log import FSYNC_INTERVAL
+from src.session_store import SessionStore, create_session_store
+
+SESSION_CACHE_ENV = "SESSION_CACHE"  # set to "0" to read and write the store directly
+
+class _CachedSession:
+    def __init__(self, turns: List[dict], complete: bool):
+        self.turns = turns
+        self.complete = complete  # False when older turns were trimmed from memory
+        self.meta: Optional[dict] = None  # None until loaded from the store
+        self.last_access = time.monotonic()
+
+class CachedSessionStore(SessionStore):
+    """
+    In-process LRU cache with write-behind in front of another SessionStore.
+    History is served from memory; appended turns are queued and written to the underlying
+    store in batches by a background thread, at most flush_delay seconds after they were added.
+    Sessions are evicted when the cache exceeds max_sessions or sit idle for max_idle_seconds.
+    Pending turns are flushed on close() and at interpreter exit. A session is expected to be
+    served by one process at a time, which is how a call or chat stays on one worker.
+    """
+
+    def __init__(self,
+                 store: SessionStore,
+                 max_sessions: int = 1000,
+                 max_idle_seconds: float = 1800,
+                 max_turns_per_session: int = 50,
+                 flush_delay: float = 0.5,
+                 max_batch: int = 500):
+        self.store = store
+        self.max_sessions = max_sessions
+        self.max_idle_seconds = max_idle_seconds
+        self.max_turns_per_session = max_turns_per_session
+        self.flush_delay = flush_delay
+        self.max_batch = max_batch
+
+        self._sessions: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._pending: List[Tuple[str, dict]] = []
+        self._oldest_pending: Optional[float] = None
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self.stats = {"hits": 0, "misses": 0, "flushes": 0, "flushed_turns": 0, "evictions": 0, "flush_errors": 0}
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-write-behind", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # Cache bookkeeping
+
+    def _touch(self, session_id: str, entry: _CachedSession):
+        entry.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.max_idle_seconds
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry.last_access >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.stats["evictions"] += 1
+
+    def _trim(self, entry: _CachedSession):
+        if len(entry.turns) > self.max_turns_per_session:
+            del entry.turns[:-self.max_turns_per_session]
+            entry.complete = False
+
+    # Write-behind
+
+    def _flush_loop(self):
+        with self._lock:
+            while not self._closed:
+                if not self._pending:
+                    self._wakeup.wait(timeout=min(self.max_idle_seconds, 60))
+                    self._evict_idle()
+                    continue
+                due = self._oldest_pending + self.flush_delay
+                now = time.monotonic()
+                if now < due and len(self._pending) < self.max_batch:
+                    self._wakeup.wait(timeout=due - now)
+                    continue
+                self._lock.release()
+                try:
+                    self.flush()
+                finally:
+                    self._lock.acquire()
+
+    def flush(self):
+        """Write all pending turns to the underlying store"""
+        with self._flush_lock:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        # Caller holds _flush_lock, so batches reach the store in the order they were queued
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._oldest_pending = None
+        if not batch:
+            return
+        try:
+            self.store.append_many(batch)
+        except Exception as e:
+            print(f"Failed to flush {len(batch)} session turns, will retry: {e}")
+            with self._lock:
+                self._pending = batch + self._pending
+                self._oldest_pending = time.monotonic()
+                self.stats["flush_errors"] += 1
+            return
+        with self._lock:
+            self.stats["flushes"] += 1
+            self.stats["flushed_turns"] += len(batch)
+
+    def _has_pending(self, session_id: str) -> bool:
+        return any(pending_id == session_id for pending_id, _ in self._pending)
+
+    # SessionStore interface
+
+    def load(self, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and (entry.complete or (last_n is not None and last_n <= len(entry.turns))):
+                self.stats["hits"] += 1
+                self._touch(session_id, entry)
+                turns = entry.turns if last_n is None else entry.turns[-last_n:] if last_n > 0 else []
+                return list(turns)
+            self.stats["misses"] += 1
+            pending = self._has_pending(session_id)
+
+        fetch = None if last_n is None else max(last_n, self.max_turns_per_session)
+        with self._flush_lock:
+            # The store must see queued turns before it is read, and no batch may be mid-write
+            if pending:
+                self._flush_pending()
+            turns = self.store.load(session_id, fetch)
+            with self._lock:
+                complete = fetch is None or len(turns) < fetch
+                # Turns appended while the store was being read are still queued
+                turns = list(turns) + [turn for pending_id, turn in self._pending if pending_id == session_id]
+                entry = _CachedSession(list(turns), complete=complete)
+                self._trim(entry)
+                self._sessions[session_id] = entry
+                self._touch(session_id, entry)
+        if last_n is None:
+            return turns
+        return turns[-last_n:] if last_n > 0 else []
+
+    def append(self, session_id: str, turn: dict):
+        self.append_many([(session_id, turn)])
+
+    def append_many(self, turns: Iterable[Tuple[str, dict]]):
+        with self._lock:
+            for session_id, turn in turns:
+                entry = self._sessions.get(session_id)
+                if entry is not None:
+                    entry.turns.append(turn)
+                    self._trim(entry)
+                    self._touch(session_id, entry)
+                self._pending.append((session_id, turn))
+            if self._oldest_pending is None and self._pending:
+                self._oldest_pending = time.monotonic()
+            self._wakeup.notify()
+
+    def save(self, session_id: str, history: List[dict]):
+        self.flush()
+        self.store.save(session_id, history)
+        with self._lock:
+            entry = _CachedSession(list(history), complete=True)
+            self._trim(entry)
+            self._sessions[session_id] = entry
+            self._touch(session_id, entry)
+
+    def reset(self, session_id: str):
+        self.flush()
+        self.store.reset(session_id)
+        with self._lock:
+            entry = _CachedSession([], complete=True)
+            entry.meta = {}
+            self._sessions[session_id] = entry
+            self._touch(session_id, entry)
+
+    def load_meta(self, session_id: str) -> dict:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry.meta is not None:
+                return dict(entry.meta)
+        meta = self.store.load_meta(session_id)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry.meta is None:
+                entry.meta = meta
+        return dict(meta)
+
+    def save_meta(self, session_id: str, meta: dict):
+        # Written through: metadata changes rarely and must survive a crash
+        self.store.save_meta(session_id, meta)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.meta = dict(meta)
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id in self._sessions or self._has_pending(session_id):
+                return True
+        return self.store.exists(session_id)
+
+    def list_sessions(self) -> List[str]:
+        self.flush()
+        return self.store.list_sessions()
+
+    def close(self):
+        """Stop the background writer and flush everything still pending"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify_all()
+        self._flusher.join(timeout=5)
+        self.flush()
+        self.store.close()
+
+_shared_stores: Dict[str, SessionStore] = {}
+_shared_stores_lock = threading.Lock()
+
+def get_shared_session_store(fsync_policy: str = FSYNC_INTERVAL) -> SessionStore:
+    """
+    Process-wide session store used by LLMService instances (Streamlit builds a new service
+    on every rerun, so the cache has to outlive them). Cached unless SESSION_CACHE=0.
+    """
+    with _shared_stores_lock:
+        store = _shared_stores.get(fsync_policy)
+        if store is None:
+            store = create_session_store(fsync_policy=fsync_policy)
+            if os.getenv(SESSION_CACHE_ENV, "1") != "0":
+                store = CachedSessionStore(store)
+            _shared_stores[fsync_policy] = store
+        return store
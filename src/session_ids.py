@@ -0,0 +1,71 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+SESSION_PREFIX = "session_"
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+LEGACY_SESSION_PATTERN = re.compile(r"^session_(\d{8})_(\d{6})$")
+ULID_SESSION_PATTERN = re.compile(rf"^{SESSION_PREFIX}([{CROCKFORD_ALPHABET}]{{26}})$")
+
+_lock = threading.Lock()
+_last_millis = -1
+_last_random = 0
+_pid = None
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[index])
+    return "".join(reversed(chars))
+
+def new_ulid() -> str:
+    """
+    26-character ULID: 48-bit millisecond timestamp followed by 80 random bits.
+    IDs sort by creation time; within one millisecond a process increments the random part,
+    so its IDs stay unique and ordered. Other processes draw independent random bits.
+    """
+    global _last_millis, _last_random, _pid
+    with _lock:
+        millis = int(time.time() * 1000)
+        pid = os.getpid()
+        if pid != _pid:
+            # A forked child must not continue its parent's sequence
+            _pid, _last_millis = pid, -1
+        if millis <= _last_millis:
+            millis = _last_millis
+            _last_random += 1
+            if _last_random >> RANDOM_BITS:
+                # Sequence exhausted within this millisecond: move to the next one
+                millis += 1
+                _last_random = int.from_bytes(os.urandom(10), "big")
+        else:
+            _last_random = int.from_bytes(os.urandom(10), "big")
+        _last_millis = millis
+        return _encode(millis, 10) + _encode(_last_random, 16)
+
+def new_session_id() -> str:
+    """Generate a unique, time-sortable session ID"""
+    return f"{SESSION_PREFIX}{new_ulid()}"
+
+def session_created_at(session_id: str) -> Optional[datetime]:
+    """Creation time encoded in a ULID or legacy session_YYYYmmdd_HHMMSS ID"""
+    match = ULID_SESSION_PATTERN.match(session_id)
+    if match:
+        millis = 0
+        for char in match.group(1)[:10]:
+            millis = millis * 32 + CROCKFORD_ALPHABET.index(char)
+        return datetime.fromtimestamp(millis / 1000, tz=timezone.utc)
+    match = LEGACY_SESSION_PATTERN.match(session_id)
+    if match:
+        return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+    return None
+
+def session_shard(session_id: str) -> str:
+    """Shard directory for a session: two hex characters of its hash (256 shards)"""
+    return hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:2]
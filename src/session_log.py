@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+from src.session_ids import session_shard
+
+CHAT_HISTORY_DIR = "data/chat_sessions"
+SESSION_LOG_EXTENSION = ".jsonl"
+LEGACY_SESSION_EXTENSION = ".json"
+SESSION_META_EXTENSION = ".meta"  # small JSON document kept beside the log (e.g. the running summary)
+
+# fsync policies for appended turns
+FSYNC_ALWAYS = "always"      # fsync after every turn
+FSYNC_INTERVAL = "interval"  # fsync at most once per fsync_interval seconds per session
+FSYNC_NEVER = "never"        # leave flushing to the OS
+
+READ_BLOCK_SIZE = 8192
+
+class SessionLog:
+    """
+    Append-only JSONL chat history: one JSON record per line, one file per session.
+    A turn costs one small append instead of rewriting the whole history, and recent turns
+    are read by seeking back from the end of the file. A line cut short by a crash is skipped
+    on read and never corrupts the turns before it. Files are spread over 256 hash shard
+    directories; flat and legacy <session_id>.json files are moved into place the first time
+    the session is touched (or all at once with migrate_layout()).
+    """
+
+    def __init__(self,
+                 directory: str = CHAT_HISTORY_DIR,
+                 fsync_policy: str = FSYNC_INTERVAL,
+                 fsync_interval: float = 1.0,
+                 sharded: bool = True):
+        if fsync_policy not in (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER):
+            raise ValueError(f"Unknown fsync policy '{fsync_policy}'.")
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.sharded = sharded
+        self._last_fsync: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._migrated = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        """Location of the session log: <directory>/<shard>/<session_id>.jsonl when sharded"""
+        if self.sharded:
+            return os.path.join(self.directory, session_shard(session_id), f"{session_id}{SESSION_LOG_EXTENSION}")
+        return self.flat_path(session_id)
+
+    def flat_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}{SESSION_LOG_EXTENSION}")
+
+    def legacy_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}{LEGACY_SESSION_EXTENSION}")
+
+    def meta_path(self, session_id: str) -> str:
+        return os.path.join(os.path.dirname(self.path(session_id)), f"{session_id}{SESSION_META_EXTENSION}")
+
+    def _lock(self, session_id: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.Lock()
+            return lock
+
+    def _migrate(self, session_id: str):
+        """Move a session written by an older layout (flat JSONL or legacy JSON array) into place"""
+        if session_id in self._migrated:
+            return
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            flat = self.flat_path(session_id)
+            legacy = self.legacy_path(session_id)
+            if flat != path and os.path.exists(flat):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(flat, path)
+            elif os.path.exists(legacy):
+                with open(legacy, "r", encoding="utf-8") as file:
+                    history = json.load(file)
+                self._write_all(session_id, history)
+                os.remove(legacy)
+        self._migrated.add(session_id)
+
+    def migrate_layout(self) -> int:
+        """Move every flat or legacy session file into the current layout; returns the count moved"""
+        moved = 0
+        for name in os.listdir(self.directory):
+            for extension in (SESSION_LOG_EXTENSION, LEGACY_SESSION_EXTENSION):
+                if name.endswith(extension) and os.path.isfile(os.path.join(self.directory, name)):
+                    session_id = name[:-len(extension)]
+                    if self.path(session_id) != os.path.join(self.directory, name):
+                        with self._lock(session_id):
+                            self._migrated.discard(session_id)
+                            self._migrate(session_id)
+                        moved += 1
+        return moved
+
+    def list_session_ids(self) -> List[str]:
+        session_ids = set()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                for extension in (SESSION_LOG_EXTENSION, LEGACY_SESSION_EXTENSION):
+                    if name.endswith(extension):
+                        session_ids.add(name[:-len(extension)])
+        return sorted(session_ids)
+
+    def _write_all(self, session_id: str, records: List[dict]):
+        """Atomically replace the session file with the given records"""
+        path = self.path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            if self.fsync_policy != FSYNC_NEVER:
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+    def append(self, session_id: str, record: dict):
+        """Append one turn to the session"""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock(session_id):
+            self._migrate(session_id)
+            path = self.path(session_id)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a+b") as file:
+                # Start on a fresh line if a previous writer crashed mid-record
+                if file.tell() > 0:
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b"\n":
+                        line = b"\n" + line
+                file.write(line)
+                file.flush()
+                self._maybe_fsync(session_id, file)
+
+    def _maybe_fsync(self, session_id: str, file):
+        if self.fsync_policy == FSYNC_ALWAYS:
+            os.fsync(file.fileno())
+        elif self.fsync_policy == FSYNC_INTERVAL:
+            now = time.monotonic()
+            if now - self._last_fsync.get(session_id, 0.0) >= self.fsync_interval:
+                os.fsync(file.fileno())
+                self._last_fsync[session_id] = now
+
+    @staticmethod
+    def _parse(lines: List[bytes]) -> List[dict]:
+        records = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Partial record left by a crash
+                continue
+        return records
+
+    def read_all(self, session_id: str) -> List[dict]:
+        with self._lock(session_id):
+            self._migrate(session_id)
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as file:
+            return self._parse(file.read().split(b"\n"))
+
+    def read_last(self, session_id: str, n: int) -> List[dict]:
+        """Read the last n turns by scanning backwards from the end of the file"""
+        if n <= 0:
+            return []
+        with self._lock(session_id):
+            self._migrate(session_id)
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            return []
+
+        with open(path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            buffer = b""
+            # n records need n + 1 newlines to be complete (the file ends with one)
+            while position > 0 and buffer.count(b"\n") <= n:
+                step = min(READ_BLOCK_SIZE, position)
+                position -= step
+                file.seek(position)
+                buffer = file.read(step) + buffer
+
+        lines = buffer.split(b"\n")
+        if position > 0:
+            # The first line is only a fragment of an older record
+            lines = lines[1:]
+        return self._parse(lines)[-n:]
+
+    def rewrite(self, session_id: str, records: List[dict]):
+        """Replace the whole session history"""
+        with self._lock(session_id):
+            self._write_all(session_id, records)
+            for stale in (self.flat_path(session_id), self.legacy_path(session_id)):
+                if stale != self.path(session_id) and os.path.exists(stale):
+                    os.remove(stale)
+            self._migrated.add(session_id)
+
+    def read_meta(self, session_id: str) -> dict:
+        try:
+            with open(self.meta_path(session_id), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def write_meta(self, session_id: str, meta: dict):
+        """Atomically replace the session's metadata document"""
+        path = self.meta_path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def reset(self, session_id: str):
+        self.rewrite(session_id, [])
+        if os.path.exists(self.meta_path(session_id)):
+            os.remove(self.meta_path(session_id))
+
+    def exists(self, session_id: str) -> bool:
+        return any(os.path.exists(path) for path in
+                   (self.path(session_id), self.flat_path(session_id), self.legacy_path(session_id)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the chat session logs.")
+    parser.add_argument("--directory", default=CHAT_HISTORY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Move flat and legacy .json session files into their shard directories")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        moved = SessionLog(args.directory, fsync_policy=FSYNC_ALWAYS).migrate_layout()
+        print(f"Migrated {moved} session files in {args.directory}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.session_log import CHAT_HISTORY_DIR, FSYNC_INTERVAL, SessionLog
+
+SESSION_DB_FILE = "data/chat_sessions.db"
+SESSION_STORE_ENV = "SESSION_STORE"  # "file" (default) or "sqlite"
+
+class SessionStore(abc.ABC):
+    """Interface for chat session persistence used by LLMService"""
+
+    @abc.abstractmethod
+    def load(self, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        """Return the session's turns, oldest first (only the last_n if given)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def append(self, session_id: str, turn: dict):
+        raise NotImplementedError
+
+    def append_many(self, turns: Iterable[Tuple[str, dict]]):
+        """Append (session_id, turn) pairs; stores may write them in one batch"""
+        for session_id, turn in turns:
+            self.append(session_id, turn)
+
+    @abc.abstractmethod
+    def save(self, session_id: str, history: List[dict]):
+        """Replace the session's history"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def reset(self, session_id: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def exists(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_meta(self, session_id: str) -> dict:
+        """Session-level data kept outside the turns (such as the running summary); {} if none"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save_meta(self, session_id: str, meta: dict):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list_sessions(self) -> List[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class FileSessionStore(SessionStore):
+    """One append-only JSONL file per session (the default store)"""
+
+    def __init__(self, directory: str = CHAT_HISTORY_DIR, fsync_policy: str = FSYNC_INTERVAL):
+        self.log = SessionLog(directory, fsync_policy=fsync_policy)
+
+    def load(self, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        if last_n is not None:
+            return self.log.read_last(session_id, last_n)
+        return self.log.read_all(session_id)
+
+    def append(self, session_id: str, turn: dict):
+        self.log.append(session_id, turn)
+
+    def save(self, session_id: str, history: List[dict]):
+        self.log.rewrite(session_id, history)
+
+    def reset(self, session_id: str):
+        self.log.reset(session_id)
+
+    def exists(self, session_id: str) -> bool:
+        return self.log.exists(session_id)
+
+    def load_meta(self, session_id: str) -> dict:
+        return self.log.read_meta(session_id)
+
+    def save_meta(self, session_id: str, meta: dict):
+        self.log.write_meta(session_id, meta)
+
+    def list_sessions(self) -> List[str]:
+        return self.log.list_session_ids()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    timestamp TEXT,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_meta (
+    session_id TEXT PRIMARY KEY,
+    meta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_turns_session ON turns (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_turns_timestamp ON turns (timestamp);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+"""
+
+# Statements are constant strings so sqlite3's per-connection statement cache reuses them prepared
+INSERT_TURN = "INSERT INTO turns (session_id, timestamp, record) VALUES (?, ?, ?)"
+UPSERT_SESSION = """
+INSERT INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?)
+ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at
+"""
+SELECT_ALL_TURNS = "SELECT record FROM turns WHERE session_id = ? ORDER BY id"
+SELECT_LAST_TURNS = "SELECT record FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?"
+DELETE_TURNS = "DELETE FROM turns WHERE session_id = ?"
+SELECT_SESSION = "SELECT 1 FROM sessions WHERE session_id = ?"
+SELECT_SESSION_IDS = "SELECT session_id FROM sessions ORDER BY session_id"
+SELECT_META = "SELECT meta FROM session_meta WHERE session_id = ?"
+UPSERT_META = """
+INSERT INTO session_meta (session_id, meta) VALUES (?, ?)
+ON CONFLICT (session_id) DO UPDATE SET meta = excluded.meta
+"""
+DELETE_META = "DELETE FROM session_meta WHERE session_id = ?"
+SELECT_TURNS_SINCE = "SELECT id, session_id, record FROM turns WHERE id > ? ORDER BY id"
+SELECT_EXISTING_TURN_IDS = "SELECT id FROM turns WHERE id IN (SELECT value FROM json_each(?))"
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite session store in WAL mode.
+    Each thread (and each process after a fork) gets its own pooled connection; WAL lets readers
+    run alongside the single writer, and busy_timeout serialises writers from other processes.
+    """
+
+    def __init__(self, db_file: str = SESSION_DB_FILE, synchronous: str = "NORMAL", busy_timeout_ms: int = 5000):
+        self.db_file = db_file
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            # isolation_level=None: transactions are managed explicitly below
+            connection = sqlite3.connect(self.db_file, timeout=self.busy_timeout_ms / 1000,
+                                         isolation_level=None, check_same_thread=False,
+                                         cached_statements=64)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"PRAGMA synchronous={self.synchronous}")
+            connection.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _write(self, statements):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, parameters, many in statements:
+                if many:
+                    connection.executemany(sql, parameters)
+                else:
+                    connection.execute(sql, parameters)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def load(self, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        connection = self._connection()
+        if last_n is not None:
+            rows = connection.execute(SELECT_LAST_TURNS, (session_id, last_n)).fetchall()
+            rows.reverse()
+        else:
+            rows = connection.execute(SELECT_ALL_TURNS, (session_id,)).fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+    def append(self, session_id: str, turn: dict):
+        self.append_many([(session_id, turn)])
+
+    def append_many(self, turns: Iterable[Tuple[str, dict]]):
+        now = self._now()
+        turn_rows = []
+        session_rows = {}
+        for session_id, turn in turns:
+            turn_rows.append((session_id, turn.get("timestamp"), json.dumps(turn, ensure_ascii=False)))
+            session_rows[session_id] = (session_id, now, now)
+        if not turn_rows:
+            return
+        self._write([
+            (INSERT_TURN, turn_rows, True),
+            (UPSERT_SESSION, list(session_rows.values()), True)
+        ])
+
+    def save(self, session_id: str, history: List[dict]):
+        now = self._now()
+        self._write([
+            (DELETE_TURNS, (session_id,), False),
+            (INSERT_TURN, [(session_id, turn.get("timestamp"), json.dumps(turn, ensure_ascii=False)) for turn in history], True),
+            (UPSERT_SESSION, (session_id, now, now), False)
+        ])
+
+    def reset(self, session_id: str):
+        now = self._now()
+        self._write([
+            (DELETE_TURNS, (session_id,), False),
+            (DELETE_META, (session_id,), False),
+            (UPSERT_SESSION, (session_id, now, now), False)
+        ])
+
+    def exists(self, session_id: str) -> bool:
+        return self._connection().execute(SELECT_SESSION, (session_id,)).fetchone() is not None
+
+    def load_meta(self, session_id: str) -> dict:
+        row = self._connection().execute(SELECT_META, (session_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_meta(self, session_id: str, meta: dict):
+        self._write([(UPSERT_META, (session_id, json.dumps(meta, ensure_ascii=False)), False)])
+
+    def list_sessions(self) -> List[str]:
+        return [session_id for (session_id,) in self._connection().execute(SELECT_SESSION_IDS)]
+
+    def iter_turns_since(self, last_id: int = 0, batch_size: int = 10_000) -> Iterator[Tuple[int, str, dict]]:
+        """Yield (row id, session_id, turn) for every turn stored after row last_id, oldest first"""
+        cursor = self._connection().execute(SELECT_TURNS_SINCE, (last_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row_id, session_id, record in rows:
+                yield row_id, session_id, json.loads(record)
+
+    def existing_turn_ids(self, row_ids: Iterable[int]) -> Set[int]:
+        """The subset of row_ids still stored (save() and reset() delete a session's rows)"""
+        rows = self._connection().execute(SELECT_EXISTING_TURN_IDS, (json.dumps(list(row_ids)),))
+        return {row_id for (row_id,) in rows}
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                try:
+                    connection.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+def create_session_store(kind: Optional[str] = None, fsync_policy: str = FSYNC_INTERVAL) -> SessionStore:
+    """Build the store named by `kind` or the SESSION_STORE environment variable"""
+    kind = (kind or os.getenv(SESSION_STORE_ENV) or "file").lower()
+    if kind == "file":
+        return FileSessionStore(CHAT_HISTORY_DIR, fsync_policy=fsync_policy)
+    if kind == "sqlite":
+        return SQLiteSessionStore(SESSION_DB_FILE)
+    raise ValueError(f"Unknown session store '{kind}'.")
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key onto one in-flight execution.
+    The first caller for a key runs the function; callers arriving while it runs wait for
+    and share its result (or exception). Shared results must be treated as read-only.
+    """
+
+    def __init__(self, default_timeout: Optional[float] = None):
+        self.default_timeout = default_timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0, "timeouts": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn for key, or wait for the identical call already in flight.
+        A waiter gives up with TimeoutError after `timeout` seconds (the in-flight call keeps running
+        for the others). If the running call is cancelled (KeyboardInterrupt, SystemExit, ...) the
+        waiters do not inherit the cancellation; one of them takes over and runs fn itself.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self.stats["calls"] += 1
+
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                    self.stats["executions"] += 1
+                else:
+                    call.waiters += 1
+                    self.stats["coalesced"] += 1
+
+            if leader:
+                return self._run(key, call, fn)
+
+            try:
+                finished = call.done.wait(timeout)
+            finally:
+                # waiters counts the callers currently blocked on the call
+                with self._lock:
+                    call.waiters -= 1
+            if not finished:
+                with self._lock:
+                    self.stats["timeouts"] += 1
+                raise TimeoutError(f"Timed out after {timeout}s waiting for in-flight call {key!r}.")
+            if call.cancelled:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.cancelled = True
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, key: Hashable):
+        """Detach the in-flight call for key so the next caller starts a fresh one"""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+def make_key(*parts) -> str:
+    """Build a compact coalescing key from JSON-serialisable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
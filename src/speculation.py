@@ -0,0 +1,137 @@
+import re
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Callable, Optional, Tuple
+
+SPECULATION_MIN_WORDS = 2         # interim transcripts shorter than this are not worth preparing
+SPECULATION_REUSE_SIMILARITY = 0.85  # word-level similarity at which retrieval on an interim is reused
+SPECULATION_WAIT_TIMEOUT = 2.0    # seconds the final transcript waits for a matching speculation still running
+SPECULATION_KEEP = 4              # completed speculations kept per turn
+
+# How a speculation matched the final transcript
+EXACT = "exact"  # same words: the whole prepared turn is reused
+NEAR = "near"    # nearly the same words: retrieval is reused, intent analysis reruns on the final text
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase words without punctuation, so "Are you open?" matches the interim "are you open" """
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+def transcript_similarity(a: str, b: str) -> float:
+    """Word-level similarity of two normalized transcripts (1.0 = identical)"""
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a.split(), b.split()).ratio()
+
+class _Speculation:
+    def __init__(self, text: str, key: str):
+        self.text = text
+        self.key = key
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class Speculator:
+    """
+    Prepares a voice turn from interim transcripts while the caller is still talking.
+    prepare(text) runs on one background thread for the latest interim only: an interim that
+    arrives while another is being prepared replaces any interim still waiting, so the work never
+    queues up behind a fast talker. take() matches the final transcript against the speculations
+    and ends the turn; speculation still pending or running for other text is discarded.
+    """
+
+    def __init__(self, prepare: Callable[[str], Any],
+                 min_words: int = SPECULATION_MIN_WORDS,
+                 reuse_similarity: float = SPECULATION_REUSE_SIMILARITY,
+                 keep: int = SPECULATION_KEEP):
+        self.prepare = prepare
+        self.min_words = min_words
+        self.reuse_similarity = reuse_similarity
+        self.keep = keep
+        self.stats = {"submitted": 0, "started": 0, "superseded": 0, "failed": 0,
+                      EXACT: 0, NEAR: 0, "missed": 0}
+        self._pending: Optional[_Speculation] = None
+        self._running: Optional[_Speculation] = None
+        self._completed: "OrderedDict[str, _Speculation]" = OrderedDict()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, transcript: str):
+        """Speculate on an interim transcript (ignored if too short or already prepared)"""
+        key = normalize_transcript(transcript)
+        if len(key.split()) < self.min_words:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            known = [self._pending, self._running, self._completed.get(key)]
+            if any(speculation is not None and speculation.key == key for speculation in known):
+                return
+            self.stats["submitted"] += 1
+            if self._pending is not None:
+                self.stats["superseded"] += 1
+            self._pending = _Speculation(transcript, key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="speculation", daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                speculation, self._pending = self._pending, None
+                if speculation is None or self._closed:
+                    self._thread = None
+                    return
+                self._running = speculation
+                self.stats["started"] += 1
+            try:
+                speculation.result = self.prepare(speculation.text)
+            except Exception as e:
+                speculation.error = e
+                print(f"Error: speculative preparation failed: {e}")
+            with self._lock:
+                self._running = None
+                if speculation.error is not None:
+                    self.stats["failed"] += 1
+                elif not self._closed:
+                    self._completed[speculation.key] = speculation
+                    while len(self._completed) > self.keep:
+                        self._completed.popitem(last=False)
+            speculation.done.set()
+
+    def take(self, final_transcript: str, timeout: float = SPECULATION_WAIT_TIMEOUT) -> Optional[Tuple[str, Any]]:
+        """
+        End the turn and return (EXACT or NEAR, prepared result) for the speculation closest to the
+        final transcript, or None. A close match that is still running is waited for, since it
+        started earlier than a fresh preparation would.
+        """
+        key = normalize_transcript(final_transcript)
+        with self._lock:
+            self._closed = True
+            self._pending = None
+            candidates = list(self._completed.values())
+            if self._running is not None:
+                candidates.append(self._running)
+            self._completed.clear()
+
+        scored = [(transcript_similarity(key, speculation.key), speculation.done.is_set(), speculation)
+                  for speculation in candidates]
+        scored = [row for row in scored if row[0] >= self.reuse_similarity]
+        if not scored:
+            self.stats["missed"] += 1
+            return None
+        _, _, best = max(scored, key=lambda row: (row[0], row[1]))
+        if not best.done.wait(timeout) or best.error is not None:
+            self.stats["missed"] += 1
+            return None
+        kind = EXACT if best.key == key else NEAR
+        self.stats[kind] += 1
+        return kind, best.result
+
+    def cancel(self):
+        """Drop all speculation for the turn (e.g. the recording had no speech)"""
+        with self._lock:
+            self._closed = True
+            self._pending = None
+            self._completed.clear()
@@ -0,0 +1,169 @@
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+MIN_SENTENCE_CHARS = 20  # shorter sentences ("Hi!") are spoken together with the next one
+TTS_WORKERS = 2          # sentences synthesized ahead of playback in parallel
+
+# Sentence end: terminal punctuation (plus closing quotes/brackets) followed by whitespace
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+# Words ending in a period that do not end a sentence
+ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "ave", "vs", "etc", "e.g", "i.e", "a.m", "p.m"}
+
+_END_OF_STREAM = None
+
+def _ends_with_abbreviation(text: str) -> bool:
+    words = text.rstrip(".").split()
+    return bool(words) and words[-1].lower() in ABBREVIATIONS
+
+def split_sentences(pieces: Iterable[str], min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[str]:
+    """Regroup a token stream into sentences, yielding each as soon as it is complete"""
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        for match in _SENTENCE_END.finditer(buffer):
+            candidate = buffer[start:match.start()] + match.group().strip()
+            if _ends_with_abbreviation(buffer[start:match.start() + 1]) or len(candidate.strip()) < min_chars:
+                continue
+            yield candidate.strip()
+            start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
+@dataclass
+class StageTimings:
+    """Milliseconds from the start of the response to each pipeline milestone"""
+    first_token_ms: Optional[float] = None
+    first_sentence_ms: Optional[float] = None
+    first_audio_ready_ms: Optional[float] = None
+    first_playback_ms: Optional[float] = None   # time to first audio heard by the caller
+    llm_done_ms: Optional[float] = None
+    playback_done_ms: Optional[float] = None
+    sentences: int = 0
+    tts_ms: List[float] = field(default_factory=list)  # synthesis time per sentence
+    playback_gaps_ms: List[float] = field(default_factory=list)  # silence between sentences
+    cancelled_ms: Optional[float] = None        # when the caller barged in, if they did
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "first_token_ms": self.first_token_ms,
+            "first_sentence_ms": self.first_sentence_ms,
+            "first_audio_ready_ms": self.first_audio_ready_ms,
+            "first_playback_ms": self.first_playback_ms,
+            "llm_done_ms": self.llm_done_ms,
+            "playback_done_ms": self.playback_done_ms,
+            "sentences": self.sentences,
+            "tts_ms_max": max(self.tts_ms) if self.tts_ms else None,
+            "playback_gap_ms_max": max(self.playback_gaps_ms) if self.playback_gaps_ms else None,
+            "cancelled_ms": self.cancelled_ms
+        }
+
+class SpeechPipeline:
+    """
+    Speak a streamed response sentence by sentence.
+    The token stream is split into sentences in the calling thread; each sentence is synthesized
+    as soon as it completes (up to tts_workers at a time) and a playback thread plays the audio
+    in order, so the caller hears the first sentence while the rest is still being generated.
+    synthesize maps a sentence to an audio file (or None to skip it); play blocks while it plays.
+    """
+
+    def __init__(self,
+                 synthesize: Callable[[str], Optional[str]],
+                 play: Callable[[str], None],
+                 tts_workers: int = TTS_WORKERS,
+                 min_sentence_chars: int = MIN_SENTENCE_CHARS):
+        self.synthesize = synthesize
+        self.play = play
+        self.tts_workers = tts_workers
+        self.min_sentence_chars = min_sentence_chars
+        self.cancelled = threading.Event()
+        self._timings: Optional[StageTimings] = None
+        self._start = 0.0
+
+    def cancel(self):
+        """
+        Stop speaking: sentences not yet synthesized are dropped, nothing further is played and the
+        token stream is closed. Cutting the current sentence short is up to the play callback.
+        """
+        if self._timings is not None and self._timings.cancelled_ms is None:
+            self._timings.cancelled_ms = (time.perf_counter() - self._start) * 1000
+        self.cancelled.set()
+
+    def run(self, pieces: Iterable[str], on_text: Optional[Callable[[str], None]] = None) -> "tuple[str, StageTimings]":
+        """
+        Speak the streamed response and block until playback finishes.
+        on_text is called in this thread with each piece as it arrives. Returns (text generated, timings).
+        """
+        self.cancelled.clear()
+        timings = self._timings = StageTimings()
+        start = self._start = time.perf_counter()
+        elapsed = lambda: (time.perf_counter() - start) * 1000
+        audio: "queue.Queue[Optional[Future]]" = queue.Queue()
+        text: List[str] = []
+
+        def timed_pieces():
+            for piece in pieces:
+                if timings.first_token_ms is None:
+                    timings.first_token_ms = elapsed()
+                text.append(piece)
+                if on_text is not None:
+                    on_text(piece)
+                yield piece
+            timings.llm_done_ms = elapsed()
+
+        def synthesize(sentence):
+            if self.cancelled.is_set():
+                return None
+            tts_start = time.perf_counter()
+            audio_file = self.synthesize(sentence)
+            timings.tts_ms.append((time.perf_counter() - tts_start) * 1000)
+            if audio_file and timings.first_audio_ready_ms is None:
+                timings.first_audio_ready_ms = elapsed()
+            return audio_file
+
+        def playback():
+            last_end = None
+            while True:
+                future = audio.get()
+                if future is _END_OF_STREAM:
+                    return
+                try:
+                    audio_file = future.result()
+                except Exception as e:
+                    print(f"Error: speech synthesis failed: {e}")
+                    continue
+                if not audio_file or self.cancelled.is_set():
+                    continue
+                now = elapsed()
+                if timings.first_playback_ms is None:
+                    timings.first_playback_ms = now
+                elif last_end is not None:
+                    timings.playback_gaps_ms.append(now - last_end)
+                self.play(audio_file)
+                last_end = elapsed()
+
+        player = threading.Thread(target=playback, name="speech-playback", daemon=True)
+        player.start()
+        with ThreadPoolExecutor(max_workers=self.tts_workers, thread_name_prefix="speech-tts") as executor:
+            try:
+                for sentence in split_sentences(timed_pieces(), self.min_sentence_chars):
+                    if self.cancelled.is_set():
+                        break
+                    if timings.first_sentence_ms is None:
+                        timings.first_sentence_ms = elapsed()
+                    timings.sentences += 1
+                    audio.put(executor.submit(synthesize, sentence))
+            finally:
+                audio.put(_END_OF_STREAM)
+                if self.cancelled.is_set() and hasattr(pieces, "close"):
+                    # Stop generating the rest of the reply
+                    pieces.close()
+                player.join()
+        timings.playback_done_ms = elapsed()
+        return "".join(text).strip(), timings
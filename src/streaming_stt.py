@@ -0,0 +1,161 @@
+import abc
+import os
+import queue
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+from src.upstream_scheduler import PRIORITY_LIVE_VOICE, SchedulerOverloaded, get_scheduler
+
+FINAL_TIMEOUT = 5.0  # seconds finish() waits for the final transcript after the audio ends
+
+_END_OF_AUDIO = None
+
+@dataclass
+class TranscriptResult:
+    text: str
+    is_final: bool
+    audio_seconds: float = 0.0  # audio received by the recognizer when the result was emitted
+
+class StreamingRecognizer(abc.ABC):
+    """
+    Streaming speech-to-text session for one utterance.
+    Audio frames are sent while they are captured; interim and final results are passed to
+    on_result from the recognizer's thread. finish() marks the end of the audio and returns the
+    final transcript, which the service can produce shortly after the last frame arrives.
+    """
+
+    def __init__(self, sample_rate: int = 16000, sample_width: int = 2, language_code: str = "en-US",
+                 priority: int = PRIORITY_LIVE_VOICE):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.language_code = language_code
+        self.priority = priority
+        self.audio_seconds = 0.0
+        self.overloaded = False  # set when the STT scheduler shed the stream
+        self._frames: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._finals: List[str] = []
+        self._done = threading.Event()
+        self._on_result: Optional[Callable[[TranscriptResult], None]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, on_result: Optional[Callable[[TranscriptResult], None]] = None):
+        self._on_result = on_result
+        self._thread = threading.Thread(target=self._session, name="streaming-stt", daemon=True)
+        self._thread.start()
+
+    def send(self, frame: bytes):
+        self._frames.put(frame)
+
+    def finish(self, timeout: float = FINAL_TIMEOUT) -> str:
+        """End the audio stream and wait for the final transcript"""
+        self._frames.put(_END_OF_AUDIO)
+        if not self._done.wait(timeout):
+            print(f"Error: no final transcript within {timeout}s")
+        return " ".join(self._finals).strip()
+
+    def _audio(self) -> Iterator[bytes]:
+        """Frames as they are sent, until finish() is called"""
+        while True:
+            frame = self._frames.get()
+            if frame is _END_OF_AUDIO:
+                return
+            self.audio_seconds += len(frame) / (self.sample_rate * self.sample_width)
+            yield frame
+
+    def _emit(self, text: str, is_final: bool):
+        if is_final:
+            self._finals.append(text)
+        if self._on_result is not None:
+            self._on_result(TranscriptResult(text, is_final, self.audio_seconds))
+
+    def _session(self):
+        try:
+            # One STT slot is held for the length of the stream
+            get_scheduler().call("stt", self._recognize, priority=self.priority)
+        except SchedulerOverloaded as e:
+            print(f"Error: {e}")
+            self.overloaded = True
+        except Exception as e:
+            print(f"Error: streaming recognition failed: {e}")
+        finally:
+            self._done.set()
+
+    @abc.abstractmethod
+    def _recognize(self):
+        """Run the recognition stream: read frames from _audio() and pass results to _emit()"""
+        raise NotImplementedError
+
+class GoogleStreamingRecognizer(StreamingRecognizer):
+    """Google Cloud Speech-to-Text streaming recognition with interim results"""
+
+    def __init__(self, api_key: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+
+    def _recognize(self):
+        from google.cloud import speech_v1
+
+        client = speech_v1.SpeechClient(client_options={"api_key": self.api_key})
+        config = speech_v1.StreamingRecognitionConfig(
+            config=speech_v1.RecognitionConfig(
+                encoding=speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code=self.language_code
+            ),
+            interim_results=True
+        )
+        requests = (speech_v1.StreamingRecognizeRequest(audio_content=frame) for frame in self._audio())
+        for response in client.streaming_recognize(config=config, requests=requests):
+            for result in response.results:
+                if result.alternatives:
+                    self._emit(result.alternatives[0].transcript, result.is_final)
+
+class StandInRecognizer(StreamingRecognizer):
+    """
+    Local stand-in for a streaming recognizer, used to test the streaming path offline.
+    Reveals the known transcript word by word as audio arrives (words_per_second of audio) and
+    emits the final result final_latency_ms after the end of the audio.
+    """
+
+    def __init__(self, transcript: str, words_per_second: float = 2.5, interim_interval_ms: float = 200,
+                 final_latency_ms: float = 150, **kwargs):
+        super().__init__(**kwargs)
+        self.transcript = transcript
+        self.words_per_second = words_per_second
+        self.interim_interval_ms = interim_interval_ms
+        self.final_latency_ms = final_latency_ms
+
+    def _recognize(self):
+        words = self.transcript.split()
+        last_interim = 0.0
+        shown = 0
+        for _ in self._audio():
+            if (self.audio_seconds - last_interim) * 1000 < self.interim_interval_ms:
+                continue
+            last_interim = self.audio_seconds
+            count = min(len(words), int(self.audio_seconds * self.words_per_second))
+            if count > shown:
+                shown = count
+                self._emit(" ".join(words[:count]), is_final=False)
+        time.sleep(self.final_latency_ms / 1000)
+        self._emit(self.transcript, is_final=True)
+
+def wav_frames(path: str, chunk: int = 1024, speed: float = 1.0) -> Iterator[bytes]:
+    """Replay a WAV file as capture frames of `chunk` samples, paced like a live microphone (speed=0: unpaced)"""
+    with wave.open(path, "rb") as wav:
+        seconds_per_frame = chunk / wav.getframerate()
+        start = time.monotonic()
+        sent = 0
+        while True:
+            data = wav.readframes(chunk)
+            if not data:
+                return
+            if speed > 0:
+                delay = start + sent * seconds_per_frame / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            sent += 1
+            yield data
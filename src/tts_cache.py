@@ -0,0 +1,155 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+from src.singleflight import SingleFlight, make_key
+
+TTS_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "tts_cache")
+TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+TTS_PREWARM_ENV = "TTS_PREWARM"  # set to "0" to skip synthesizing canned responses at startup
+TTS_SYNTHESIS_TIMEOUT = 30  # seconds a request waits on an identical in-flight synthesis
+
+# File extension for each synthesis encoding
+AUDIO_EXTENSIONS = {"LINEAR16": ".wav", "MP3": ".mp3", "OGG_OPUS": ".ogg", "MULAW": ".wav", "ALAW": ".wav"}
+
+def tts_cache_key(text: str, voice: str, language_code: str, speaking_rate: float, pitch: float,
+                  encoding: str) -> str:
+    """Content hash of everything that changes the synthesized audio"""
+    return make_key(text, voice, language_code, float(speaking_rate), float(pitch), encoding)
+
+class TTSCache:
+    """
+    Disk cache of synthesized speech, one file per content hash.
+    Files are evicted least recently used first once the directory exceeds max_bytes. Recency is
+    kept in file modification times, so it survives restarts. Concurrent misses for the same audio
+    share one synthesis call.
+    """
+
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = SingleFlight(default_timeout=TTS_SYNTHESIS_TIMEOUT)
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._scan()
+
+    def _scan(self):
+        """Index the files already on disk, least recently used first"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            for _, name, size in sorted(files):
+                self._entries[name] = size
+                self._bytes += size
+        self._evict()
+
+    @staticmethod
+    def _file_name(key: str, encoding: str) -> str:
+        return key + AUDIO_EXTENSIONS.get(encoding, ".bin")
+
+    def path(self, key: str, encoding: str = "LINEAR16") -> str:
+        return os.path.join(self.cache_dir, self._file_name(key, encoding))
+
+    def get(self, key: str, encoding: str = "LINEAR16") -> Optional[str]:
+        """Path of the cached audio, or None"""
+        name = self._file_name(key, encoding)
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if name not in self._entries:
+                self.stats["misses"] += 1
+                return None
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Removed behind our back
+                self._bytes -= self._entries.pop(name)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(name)
+            self.stats["hits"] += 1
+            return path
+
+    def put(self, key: str, audio: bytes, encoding: str = "LINEAR16") -> str:
+        """Store synthesized audio and return its path"""
+        name = self._file_name(key, encoding)
+        path = os.path.join(self.cache_dir, name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(audio)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._bytes -= self._entries.pop(name, 0)
+            self._entries[name] = len(audio)
+            self._bytes += len(audio)
+        self._evict()
+        return path
+
+    def fetch(self, key: str, synthesize: Callable[[], Optional[bytes]], encoding: str = "LINEAR16") -> Optional[str]:
+        """Path of the cached audio, synthesizing and storing it on a miss (None if synthesis failed)"""
+        path = self.get(key, encoding)
+        if path is not None:
+            return path
+
+        def synthesize_and_store():
+            audio = synthesize()
+            return self.put(key, audio, encoding) if audio else None
+
+        return self._inflight.do(key, synthesize_and_store)
+
+    def _evict(self):
+        with self._lock:
+            # The newest file always stays, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                name, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.stats["evictions"] += 1
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def canned_responses(flow=None) -> List[str]:
+    """Fixed strings the assistant speaks without an LLM call: rule-based responses and the hold message"""
+    from src.conversation_flows import default_flow
+    from src.upstream_scheduler import HOLD_MESSAGE
+
+    flow = flow or default_flow
+    texts = [HOLD_MESSAGE, *flow.fallback_responses]
+    for intent in flow.intents.values():
+        # Templates with slots are filled per caller, so only slot-free responses repeat verbatim
+        texts.extend(response for response in intent.responses if "{" not in response)
+    return texts
+
+def faq_answers() -> List[str]:
+    """Curated and auto-generated FAQ answers"""
+    import json
+    from src.content_manager import FAQ_MANUAL_RESPONSES_FILE, load_autogen_responses
+
+    try:
+        faqs = load_autogen_responses()
+    except FileNotFoundError:
+        faqs = []
+    if os.path.exists(FAQ_MANUAL_RESPONSES_FILE):
+        with open(FAQ_MANUAL_RESPONSES_FILE, "r", encoding="utf-8") as file:
+            faqs += json.load(file)
+    return [faq["answer"] for faq in faqs if faq.get("answer")]
+
+def prewarm_texts(flow=None, include_faqs: bool = True) -> List[str]:
+    """Distinct texts worth synthesizing ahead of time"""
+    texts: Iterable[str] = canned_responses(flow)
+    if include_faqs:
+        texts = [*texts, *faq_answers()]
+    return list(dict.fromkeys(text.strip() for text in texts if text.strip()))
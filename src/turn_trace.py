@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+TURN_LATENCY_BUDGET_MS = 2500  # end of the caller's speech to the first audio of the reply
+
+# Stages of a voice turn in pipeline order (reports list them in this order)
+STAGES = [
+    "capture",          # caller speaking, first to last speech frame (not part of the latency)
+    "endpoint",         # silence after the last speech until recording stopped (hangover or the stop click)
+    "encode",           # encoding the recording for upload
+    "stt",              # speech-to-text request, or waiting for the streaming final transcript
+    "speculation",      # matching the final transcript to speculation on the interims (and waiting for it)
+    "retrieval",        # FAQ embedding search
+    "intent",           # conversation manager: intent and dialogue state
+    "llm_first_token",  # LLM call to its first streamed token
+    "llm",              # LLM call to the complete reply
+    "tts",              # first synthesis: cache lookup, API call and file write
+    "tts_request",      # synthesis API call alone (absent on a cache hit)
+    "playback_start"    # decoding and opening the output until the first audio block is written
+]
+
+class TurnTrace:
+    """
+    Monotonic timings for the stages of one voice turn.
+    The clock starts when the caller stops speaking (the last speech frame) and the trace finishes
+    when the first audio of the reply plays, so latency_ms is the turn-taking delay the caller hears.
+    Only the first occurrence of a stage is kept (for a pipelined reply, the first sentence to finish
+    synthesis, which is normally the one on the critical path).
+    Callbacks registered with on_finish run once, e.g. to save the turn with the complete trace;
+    abandon() runs them without a latency for a reply that never played.
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = time.monotonic() if start is None else start
+        self.stages: Dict[str, float] = {}
+        self.latency_ms: Optional[float] = None
+        self.finished = False
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, ms: float):
+        with self._lock:
+            self.stages.setdefault(stage, round(ms, 1))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, (time.monotonic() - start) * 1000)
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.start) * 1000
+
+    def on_finish(self, callback: Callable[[], None]):
+        """Run callback when the trace finishes (immediately if it already has)"""
+        with self._lock:
+            if not self.finished:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def finish(self):
+        """Stop the clock (first audio is playing) and run the finish callbacks; later calls do nothing"""
+        self._complete(played=True)
+
+    def abandon(self):
+        """Run the finish callbacks without stopping the clock; the turn is kept with latency_ms None"""
+        self._complete(played=False)
+
+    def _complete(self, played: bool):
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            if played:
+                self.latency_ms = round(self.elapsed_ms(), 1)
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error: turn trace callback failed: {e}")
+
+    def to_turn_fields(self) -> dict:
+        """Fields stored with the session turn"""
+        return {"latency_ms": self.latency_ms, "stages": dict(self.stages)}
+
+def traced(trace: Optional[TurnTrace], stage: str):
+    """trace.stage(stage), or a no-op when the turn is not traced"""
+    return trace.stage(stage) if trace is not None else nullcontext()
+
+def percentile(ordered: List[float], pct: float) -> float:
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def stage_percentiles(turns: Iterable[dict]) -> Dict[str, dict]:
+    """p50/p95/p99/max per stage and end to end, over turns that were traced"""
+    samples: Dict[str, List[float]] = {}
+    for turn in turns:
+        for stage, ms in (turn.get("stages") or {}).items():
+            samples.setdefault(stage, []).append(ms)
+        if turn.get("latency_ms") is not None:
+            samples.setdefault("end_to_end", []).append(turn["latency_ms"])
+    order = {name: i for i, name in enumerate(STAGES + ["end_to_end"])}
+    report = {}
+    for stage in sorted(samples, key=lambda name: (order.get(name, len(order)), name)):
+        ordered = sorted(samples[stage])
+        report[stage] = {
+            "count": len(ordered),
+            "p50_ms": percentile(ordered, 50),
+            "p95_ms": percentile(ordered, 95),
+            "p99_ms": percentile(ordered, 99),
+            "max_ms": ordered[-1]
+        }
+    return report
+
+def histogram(values: List[float], buckets_ms: Iterable[float] = (100, 250, 500, 1000, 2000, 4000)) -> List[tuple]:
+    """(bucket label, count) pairs for a latency histogram"""
+    bounds = list(buckets_ms)
+    counts = [0] * (len(bounds) + 1)
+    for value in values:
+        counts[next((i for i, bound in enumerate(bounds) if value < bound), len(bounds))] += 1
+    labels = [f"<{bound:g}" for bound in bounds] + [f">={bounds[-1]:g}"]
+    return list(zip(labels, counts))
+
+def over_budget(sessions: Dict[str, List[dict]], budget_ms: float = TURN_LATENCY_BUDGET_MS) -> List[dict]:
+    """Traced turns slower than the budget, slowest first, with the stage that took longest"""
+    slow = []
+    for session_id, turns in sessions.items():
+        for number, turn in enumerate(turns, start=1):
+            latency = turn.get("latency_ms")
+            if latency is None or latency <= budget_ms:
+                continue
+            # capture is the caller talking, not waiting
+            stages = {name: ms for name, ms in (turn.get("stages") or {}).items() if name != "capture"}
+            slowest = max(stages, key=stages.get) if stages else None
+            slow.append({
+                "session_id": session_id,
+                "turn": number,
+                "timestamp": turn.get("timestamp"),
+                "latency_ms": latency,
+                "slowest_stage": slowest,
+                "slowest_stage_ms": stages.get(slowest)
+            })
+    return sorted(slow, key=lambda row: row["latency_ms"], reverse=True)
+
+def load_traced_sessions(store) -> Dict[str, List[dict]]:
+    return {session_id: store.load(session_id) for session_id in store.list_sessions()}
+
+def main():
+    from src.session_store import create_session_store
+
+    parser = argparse.ArgumentParser(description="Per-stage voice turn latency from the session store.")
+    parser.add_argument("--budget-ms", type=float, default=TURN_LATENCY_BUDGET_MS,
+                        help="End-to-end budget; slower turns are listed")
+    parser.add_argument("--store", help="Session store kind (file or sqlite; default from SESSION_STORE)")
+    parser.add_argument("--limit", type=int, default=20, help="Turns over budget to list")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    store = create_session_store(args.store)
+    sessions = load_traced_sessions(store)
+    turns = [turn for history in sessions.values() for turn in history]
+    percentiles = stage_percentiles(turns)
+    slow = over_budget(sessions, args.budget_ms)
+    store.close()
+
+    if args.json:
+        print(json.dumps({"stages": percentiles, "over_budget": slow[:args.limit],
+                          "over_budget_count": len(slow)}, indent=2, default=str))
+        return
+
+    traced_turns = percentiles.get("end_to_end", {}).get("count", 0)
+    print(f"{traced_turns} traced turns of {len(turns)}\n")
+    print(f"{'stage':<16} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for stage, row in percentiles.items():
+        print(f"{stage:<16} {row['count']:>6} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f} {row['max_ms']:>8.0f}")
+
+    latencies = [turn["latency_ms"] for turn in turns if turn.get("latency_ms") is not None]
+    if latencies:
+        print("\nEnd-to-end histogram")
+        for label, count in histogram(latencies):
+            print(f"  {label:>7} ms {count:>6} {'#' * round(40 * count / len(latencies))}")
+
+    print(f"\n{len(slow)} turns over the {args.budget_ms:.0f} ms budget")
+    for row in slow[:args.limit]:
+        print(f"  {row['session_id']} turn {row['turn']}: {row['latency_ms']:.0f} ms "
+              f"(slowest: {row['slowest_stage']} {row['slowest_stage_ms'] or 0:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+# Priorities: lower value is served first
+PRIORITY_LIVE_VOICE = 0
+PRIORITY_LIVE_CHAT = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {
+    PRIORITY_LIVE_VOICE: "live_voice",
+    PRIORITY_LIVE_CHAT: "live_chat",
+    PRIORITY_BACKGROUND: "background"
+}
+
+# How long a request may wait for admission before it is shed (None waits indefinitely)
+DEFAULT_DEADLINES = {
+    PRIORITY_LIVE_VOICE: 3.0,
+    PRIORITY_LIVE_CHAT: 8.0,
+    PRIORITY_BACKGROUND: None
+}
+
+HOLD_MESSAGE = "Thanks for your patience. We're helping a lot of callers right now, please hold for just a moment and ask again."
+
+WAIT_SAMPLES = 500  # recent admission waits kept per provider for percentiles
+
+_DEFAULT_DEADLINE = object()
+
+class SchedulerOverloaded(Exception):
+    """Raised when a request cannot be admitted before its deadline or the queue is full"""
+
+@dataclass
+class ProviderLimits:
+    max_concurrency: int
+    tokens_per_minute: Optional[int] = None  # None disables the token budget
+    max_queue: int = 100
+
+DEFAULT_LIMITS = {
+    "llm": ProviderLimits(max_concurrency=8, tokens_per_minute=80000),
+    "stt": ProviderLimits(max_concurrency=8),
+    "tts": ProviderLimits(max_concurrency=8)
+}
+
+def estimate_tokens(text: str, completion_tokens: int = 300) -> int:
+    """Rough token estimate (about four characters per token) plus the expected completion"""
+    return len(text) // 4 + completion_tokens
+
+class _TokenBucket:
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, tokens: float, now: float) -> float:
+        self._refill(now)
+        tokens = min(tokens, self.capacity)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def take(self, tokens: float):
+        self.tokens -= min(tokens, self.capacity)
+
+class _Provider:
+    def __init__(self, limits: ProviderLimits):
+        self.limits = limits
+        self.condition = threading.Condition()
+        self.active = 0
+        self.queue = []  # heap of (priority, sequence)
+        self.bucket = _TokenBucket(limits.tokens_per_minute) if limits.tokens_per_minute else None
+        self.waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_NAMES}
+        self.admitted = 0
+        self.shed = 0
+
+class UpstreamScheduler:
+    """
+    Admission control for calls to external APIs.
+    Each provider has a concurrency limit, an optional tokens-per-minute budget and a priority
+    queue, so live voice turns are admitted before live chat, and both before background ingestion.
+    Requests that cannot be admitted before their deadline are shed with SchedulerOverloaded.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, ProviderLimits]] = None):
+        self._providers = {name: _Provider(l) for name, l in (limits or DEFAULT_LIMITS).items()}
+        self._sequence = itertools.count()
+
+    def call(self,
+             provider: str,
+             fn: Callable[[], Any],
+             priority: int = PRIORITY_LIVE_CHAT,
+             tokens: int = 0,
+             deadline=_DEFAULT_DEADLINE) -> Any:
+        """
+        Run fn once the provider admits it.
+        deadline is the maximum admission wait in seconds; the default comes from DEFAULT_DEADLINES.
+        """
+        with self.slot(provider, priority, tokens, deadline):
+            return fn()
+
+    @contextmanager
+    def slot(self,
+             provider: str,
+             priority: int = PRIORITY_LIVE_CHAT,
+             tokens: int = 0,
+             deadline=_DEFAULT_DEADLINE):
+        """Hold one admitted slot for the body of a with block, e.g. while consuming a streamed response"""
+        self._acquire(provider, priority, tokens, deadline)
+        try:
+            yield
+        finally:
+            self._release(provider)
+
+    def _acquire(self, provider_name: str, priority: int, tokens: int, deadline):
+        provider = self._providers[provider_name]
+        if deadline is _DEFAULT_DEADLINE:
+            deadline = DEFAULT_DEADLINES.get(priority)
+        start = time.monotonic()
+        expires = None if deadline is None else start + deadline
+
+        with provider.condition:
+            if len(provider.queue) >= provider.limits.max_queue:
+                provider.shed += 1
+                raise SchedulerOverloaded(f"{provider_name} queue is full ({len(provider.queue)} waiting).")
+
+            entry = (priority, next(self._sequence))
+            heapq.heappush(provider.queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if provider.queue[0] == entry and provider.active < provider.limits.max_concurrency:
+                        token_wait = provider.bucket.wait_time(tokens, now) if provider.bucket else 0.0
+                        if token_wait == 0.0:
+                            break
+                        wait = token_wait
+                    if expires is not None:
+                        if now >= expires:
+                            provider.shed += 1
+                            raise SchedulerOverloaded(
+                                f"{provider_name} could not admit {PRIORITY_NAMES.get(priority, priority)} "
+                                f"request within {deadline}s."
+                            )
+                        wait = expires - now if wait is None else min(wait, expires - now)
+                    provider.condition.wait(wait)
+            except BaseException:
+                provider.queue.remove(entry)
+                heapq.heapify(provider.queue)
+                provider.condition.notify_all()
+                raise
+
+            heapq.heappop(provider.queue)
+            if provider.bucket:
+                provider.bucket.take(tokens)
+            provider.active += 1
+            provider.admitted += 1
+            provider.waits[priority].append(time.monotonic() - start)
+            # The next waiter may be admissible too
+            provider.condition.notify_all()
+
+    def _release(self, provider_name: str):
+        provider = self._providers[provider_name]
+        with provider.condition:
+            provider.active -= 1
+            provider.condition.notify_all()
+
+    def stats(self) -> Dict[str, dict]:
+        """Queue depth, in-flight calls, shed count and admission wait percentiles per provider"""
+        report = {}
+        for name, provider in self._providers.items():
+            with provider.condition:
+                queued = {PRIORITY_NAMES[p]: 0 for p in PRIORITY_NAMES}
+                for priority, _ in provider.queue:
+                    label = PRIORITY_NAMES.get(priority, str(priority))
+                    queued[label] = queued.get(label, 0) + 1
+                waits = {}
+                for priority, samples in provider.waits.items():
+                    ordered = sorted(samples)
+                    if ordered:
+                        waits[PRIORITY_NAMES[priority]] = {
+                            "p50_ms": ordered[len(ordered) // 2] * 1000,
+                            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                            "max_ms": ordered[-1] * 1000
+                        }
+                report[name] = {
+                    "active": provider.active,
+                    "queue_depth": len(provider.queue),
+                    "queued": queued,
+                    "admitted": provider.admitted,
+                    "shed": provider.shed,
+                    "wait": waits,
+                    "tokens_available": int(provider.bucket.tokens) if provider.bucket else None
+                }
+        return report
+
+_scheduler: Optional[UpstreamScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> UpstreamScheduler:
+    """Return the process-wide scheduler shared by the LLM, STT and TTS callers"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = UpstreamScheduler()
+        return _scheduler
+
+def set_scheduler(scheduler: Optional[UpstreamScheduler]):
+    """Replace the process-wide scheduler, e.g. with different limits"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
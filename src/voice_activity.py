@@ -0,0 +1,134 @@
+import math
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+# Events returned by VoiceActivityDetector.process
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+NO_SPEECH = "no_speech"
+
+@dataclass
+class VADConfig:
+    """Energy-based voice activity detection settings"""
+    speech_ratio: float = 3.0         # frame RMS over the noise floor that counts as speech
+    min_rms: float = 300.0            # absolute RMS floor for speech (16-bit samples)
+    min_speech_ms: float = 120        # speech needed before an utterance starts
+    hangover_ms: float = 1000         # silence after speech that ends the utterance
+    pre_roll_ms: float = 200          # audio kept from before the detected start
+    tail_ms: float = 150              # silence kept after the last speech frame
+    no_speech_timeout_ms: float = 8000  # give up when nobody speaks this long
+    noise_adaptation: float = 0.05    # how quickly the noise floor follows background level
+    echo_gain: float = 0.5            # during playback, speech must exceed this fraction of the playback level
+
+def frame_rms(frame: bytes) -> float:
+    """Root mean square of a frame of 16-bit little-endian samples"""
+    samples = array("h")
+    samples.frombytes(bytes(frame[:len(frame) - len(frame) % 2]))
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+class VoiceActivityDetector:
+    """
+    Streaming endpointer for one utterance.
+    Feed captured frames to process(); it reports when speech starts, when it has been followed by
+    hangover_ms of silence (end of the utterance; reported again if speech resumes and pauses),
+    or when no speech arrived before the timeout.
+    Frames from before the start (beyond the pre-roll) and the silence after the tail are not part
+    of the utterance, so they never need to be uploaded.
+    """
+
+    def __init__(self, sample_rate: int = 16000, sample_width: int = 2, config: Optional[VADConfig] = None):
+        if sample_width != 2:
+            raise ValueError("VoiceActivityDetector expects 16-bit audio.")
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.config = config or VADConfig()
+        self.reset()
+
+    def reset(self):
+        self.noise_floor: Optional[float] = None
+        self.in_speech = False
+        self._end_reported = False
+        self._timeout_reported = False
+        self.elapsed_ms = 0.0
+        self._speech_run_ms = 0.0
+        self._silence_run_ms = 0.0
+        self._pre_roll: Deque[bytes] = deque()
+        self._pre_roll_ms = 0.0
+
+    def _frame_ms(self, frame: bytes) -> float:
+        return len(frame) / (self.sample_rate * self.sample_width) * 1000
+
+    def is_speech(self, rms: float) -> bool:
+        floor = self.noise_floor if self.noise_floor is not None else 0.0
+        return rms >= max(self.config.min_rms, floor * self.config.speech_ratio)
+
+    def restart_timeout(self):
+        """Start the no-speech timeout again, e.g. when the assistant stops talking"""
+        self.elapsed_ms = 0.0
+        self._timeout_reported = False
+
+    def process(self, frame: bytes, min_rms: float = 0.0) -> Optional[str]:
+        """
+        Classify one frame; returns SPEECH_START, SPEECH_END, NO_SPEECH or None.
+        min_rms raises the speech threshold for this frame only, e.g. above the echo of audio being played.
+        """
+        duration = self._frame_ms(frame)
+        self.elapsed_ms += duration
+        rms = frame_rms(frame)
+        above_background = self.is_speech(rms)
+        speech = above_background and rms >= min_rms
+        if not above_background:
+            # Track the background level only while nobody is speaking (echo does not count as background)
+            if self.noise_floor is None:
+                self.noise_floor = rms
+            else:
+                self.noise_floor += (rms - self.noise_floor) * self.config.noise_adaptation
+
+        if not self.in_speech:
+            self._pre_roll.append(frame)
+            self._pre_roll_ms += duration
+            self._speech_run_ms = self._speech_run_ms + duration if speech else 0.0
+            if self._speech_run_ms >= self.config.min_speech_ms:
+                self.in_speech = True
+                self._silence_run_ms = 0.0
+                return SPEECH_START
+            # Keep the pre-roll plus the speech run that may be starting
+            while self._pre_roll and self._pre_roll_ms - self._frame_ms(self._pre_roll[0]) >= \
+                    self.config.pre_roll_ms + self._speech_run_ms:
+                self._pre_roll_ms -= self._frame_ms(self._pre_roll.popleft())
+            if not self._timeout_reported and self.elapsed_ms >= self.config.no_speech_timeout_ms:
+                self._timeout_reported = True
+                return NO_SPEECH
+            return None
+
+        if speech:
+            # Speaking again after a pause re-arms the end-of-utterance report
+            self._silence_run_ms = 0.0
+            self._end_reported = False
+            return None
+        self._silence_run_ms += duration
+        if not self._end_reported and self._silence_run_ms >= self.config.hangover_ms:
+            self._end_reported = True
+            return SPEECH_END
+        return None
+
+    @property
+    def trailing_silence_ms(self) -> float:
+        """Silence since the last speech frame of the current utterance"""
+        return self._silence_run_ms if self.in_speech else 0.0
+
+    def take_pre_roll(self) -> List[bytes]:
+        """Frames buffered before SPEECH_START (pre-roll and the onset itself), oldest first"""
+        frames = list(self._pre_roll)
+        self._pre_roll.clear()
+        self._pre_roll_ms = 0.0
+        return frames
+
+    def trailing_bytes(self) -> int:
+        """Bytes of the current trailing silence beyond tail_ms, to trim when the utterance ends"""
+        trim_ms = max(0.0, self.trailing_silence_ms - self.config.tail_ms)
+        return int(trim_ms / 1000 * self.sample_rate) * self.sample_width
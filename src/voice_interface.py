@@ -3,18 +3,26 @@ from google.cloud import texttospeech
 import os
 import base64
 import pyaudio
-import wave
+import shutil
 import threading
-import queue
 import time
-from datetime import datetime
 from dotenv import load_dotenv
+from src.audio_buffer import MAX_RECORDING_SECONDS, AudioRingBuffer
+from src.audio_codecs import SYNTHESIS_ENCODINGS, UPLOAD_ENCODERS, encode_upload, open_decoder
+from src.speech_pipeline import SpeechPipeline
+from src.tts_cache import TTSCache, prewarm_texts, tts_cache_key
+from src.turn_trace import TurnTrace, traced
+from src.streaming_stt import GoogleStreamingRecognizer, TranscriptResult
+from src.voice_activity import NO_SPEECH, SPEECH_END, SPEECH_START, VoiceActivityDetector, frame_rms
+from src.upstream_scheduler import HOLD_MESSAGE, PRIORITY_BACKGROUND, PRIORITY_LIVE_VOICE, SchedulerOverloaded, get_scheduler
 
 # Load environment variables
 load_dotenv()
 
 class VoiceInterface:
-    def __init__(self):
+    def __init__(self, streaming=False, recognizer_factory=None, upload_encoding="LINEAR16",
+                 endpointing=False, vad_config=None, tts_cache=None, tts_encoding="LINEAR16",
+                 full_duplex=False):
         # Set Google API key from environment variable
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
@@ -25,24 +33,85 @@ class VoiceInterface:
         self.FORMAT = pyaudio.paInt16
         self.CHANNELS = 1
         self.RATE = 16000
+        self.SAMPLE_WIDTH = pyaudio.get_sample_size(self.FORMAT)
         self.is_recording = False
-        self.audio_queue = queue.Queue()
 
-        # Create audio output directory if it doesn't exist
-        self.audio_output_dir = os.path.join(os.path.dirname(__file__), "..", "data", "audio_output")
-        os.makedirs(self.audio_output_dir, exist_ok=True)
+        # Fixed-size capture buffer, reset at the start of every utterance
+        self.audio_buffer = AudioRingBuffer(MAX_RECORDING_SECONDS, self.RATE, self.SAMPLE_WIDTH, self.CHANNELS)
+        if upload_encoding not in UPLOAD_ENCODERS:
+            raise ValueError(f"Unsupported upload encoding '{upload_encoding}'; use one of {list(UPLOAD_ENCODERS)}.")
+        self.upload_encoding = upload_encoding  # "LINEAR16" (WAV), "FLAC" or "OGG_OPUS"
 
-    def start_recording(self):
+        # Voice activity detection trims silence; with endpointing it also ends the utterance
+        self.vad = VoiceActivityDetector(self.RATE, self.SAMPLE_WIDTH, vad_config)
+        self.endpointing = endpointing
+        self.utterance_ended = threading.Event()
+        self.speech_detected = False
+
+        # Full duplex keeps listening while a reply plays; caller speech stops playback (barge-in)
+        self.full_duplex = full_duplex
+        self.barge_in = threading.Event()
+        self.speaking = False
+        self._playback_rms = 0.0
+
+        # Stage timings of the current turn, from the end of the caller's speech to the first audio of the reply
+        self.turn_trace = None
+        self._speech_started_at = None
+        self._recording_ended_at = None
+
+        # One PyAudio handle and its streams are opened on first use and reused for every turn
+        self.audio = None
+        self.input_stream = None
+        self._output_streams = {}
+
+        # Streaming mode sends frames to the recognizer while recording instead of uploading after stop
+        self.streaming = streaming
+        self.recognizer_factory = recognizer_factory or (
+            lambda: GoogleStreamingRecognizer(api_key=self.api_key, sample_rate=self.RATE)
+        )
+        self.recognizer = None
+        self.interim_transcript = ""
+        self._on_transcript_callback = None
+
+        # Synthesis settings; all of them are part of the TTS cache key
+        self.tts_language_code = "en-US"
+        self.tts_voice = "en-US-Neural2-F"
+        self.tts_gender = "FEMALE"
+        self.tts_speaking_rate = 0.9
+        self.tts_pitch = 0.0
+        if tts_encoding not in SYNTHESIS_ENCODINGS:
+            raise ValueError(f"Unsupported synthesis encoding '{tts_encoding}'; use one of {list(SYNTHESIS_ENCODINGS)}.")
+        self.tts_encoding = tts_encoding  # "LINEAR16", "OGG_OPUS" or "MP3"
+
+        # Synthesized responses are cached by content, so repeated answers need no API call
+        self.tts_cache = tts_cache if tts_cache is not None else TTSCache()
+        self.speech_pipeline = None  # pipeline speaking the current streamed response
+
+    def _get_audio(self):
+        if self.audio is None:
+            self.audio = pyaudio.PyAudio()
+        return self.audio
+
+    def start_recording(self, on_transcript=None):
         """Start recording audio from microphone"""
+        self.audio_buffer.reset()
+        self.vad.reset()
+        self.utterance_ended.clear()
+        self.speech_detected = False
+        self._speech_started_at = None
+        self.interim_transcript = ""
+        self._on_transcript_callback = on_transcript
         self.is_recording = True
-        self.audio = pyaudio.PyAudio()
-        self.stream = self.audio.open(
-            format=self.FORMAT,
-            channels=self.CHANNELS,
-            rate=self.RATE,
-            input=True,
-            frames_per_buffer=self.CHUNK
-        )
+        if self.input_stream is None:
+            self.input_stream = self._get_audio().open(
+                format=self.FORMAT,
+                channels=self.CHANNELS,
+                rate=self.RATE,
+                input=True,
+                frames_per_buffer=self.CHUNK,
+                start=False
+            )
+        self.input_stream.start_stream()
         print("Recording started...")
         self.recording_thread = threading.Thread(target=self._record_audio)
         self.recording_thread.start()
@@ -52,49 +121,140 @@ class VoiceInterface:
         self.is_recording = False
         if hasattr(self, 'recording_thread'):
             self.recording_thread.join()
-        if hasattr(self, 'stream'):
-            self.stream.stop_stream()
-            self.stream.close()
-        if hasattr(self, 'audio'):
-            self.audio.terminate()
+        if self.input_stream is not None and self.input_stream.is_active():
+            self.input_stream.stop_stream()
+        # The turn starts when the caller stopped speaking, not when recording stopped
+        ended = self._recording_ended_at or time.monotonic()
+        silence_ms = self.vad.trailing_silence_ms if self.speech_detected else 0.0
+        self.turn_trace = TurnTrace(start=ended - silence_ms / 1000)
+        self.turn_trace.add("endpoint", silence_ms)
+        if self._speech_started_at is not None:
+            self.turn_trace.add("capture", (self.turn_trace.start - self._speech_started_at) * 1000)
+        if self.speech_detected:
+            # Upload only up to a short tail after the last speech
+            self.audio_buffer.truncate(self.vad.trailing_bytes())
+        if self.audio_buffer.overflowed:
+            print(f"Recording exceeded {MAX_RECORDING_SECONDS}s; only the last {MAX_RECORDING_SECONDS}s are kept.")
         print("Recording stopped.")
 
+    def close(self):
+        """Release the audio device"""
+        for stream in [self.input_stream, *self._output_streams.values()]:
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
+        self.input_stream = None
+        self._output_streams = {}
+        if self.audio is not None:
+            self.audio.terminate()
+            self.audio = None
+
     def _record_audio(self):
         """Record audio in a separate thread"""
         while self.is_recording:
-            data = self.stream.read(self.CHUNK, exception_on_overflow=False)
-            self.audio_queue.put(data)
+            data = self.input_stream.read(self.CHUNK, exception_on_overflow=False)
+            # While a reply plays, its echo in the microphone must not count as the caller speaking
+            echo_floor = self.vad.config.echo_gain * self._playback_rms if self.speaking else 0.0
+            event = self.vad.process(data, min_rms=echo_floor)
+            if event == SPEECH_START:
+                # Nothing is kept or streamed until someone speaks
+                if not self.speech_detected:
+                    self._speech_started_at = time.monotonic() - self.vad.config.min_speech_ms / 1000
+                self.speech_detected = True
+                if self.speaking:
+                    self.interrupt()
+                for frame in self.vad.take_pre_roll():
+                    self._capture(frame)
+            elif self.vad.in_speech:
+                self._capture(data)
+
+            if event == NO_SPEECH and self.speaking:
+                # The caller is listening to the reply, not silent
+                continue
+            if self.endpointing and event in (SPEECH_END, NO_SPEECH):
+                self.is_recording = False
+                self.utterance_ended.set()
+        self._recording_ended_at = time.monotonic()
+
+    def interrupt(self):
+        """Barge-in: stop the reply at the next audio chunk and cancel synthesis of the rest"""
+        self.barge_in.set()
+        pipeline = self.speech_pipeline
+        if pipeline is not None:
+            pipeline.cancel()
 
-    def transcribe_audio(self):
+    def _capture(self, frame):
+        self.audio_buffer.write(frame)
+        if self.streaming:
+            if self.recognizer is None:
+                self.recognizer = self.recognizer_factory()
+                self.recognizer.start(lambda result: self._on_transcript(result, self._on_transcript_callback))
+            self.recognizer.send(frame)
+
+    def wait_for_utterance(self, timeout=None):
+        """
+        With endpointing, block until the caller stops speaking (or never starts), then stop recording.
+        Returns True if speech was captured.
+        """
+        self.utterance_ended.wait(timeout)
+        self.stop_recording()
+        return self.speech_detected
+
+    def _on_transcript(self, result: TranscriptResult, callback=None):
+        self.interim_transcript = result.text
+        if callback is not None:
+            callback(result)
+
+    def finish_transcription(self, priority=PRIORITY_LIVE_VOICE):
+        """
+        Final transcript of the utterance just recorded. In streaming mode it is ready shortly after
+        stop_recording(); if the stream produced nothing the recording is transcribed in one request.
+        """
+        recognizer, self.recognizer = self.recognizer, None
+        if recognizer is not None:
+            start = time.monotonic()
+            transcript = recognizer.finish()
+            if recognizer.overloaded:
+                # The recognizer was shed; a second STT request now would be shed too
+                self.play_hold_message()
+                return ""
+            if transcript:
+                if self.turn_trace is not None:
+                    self.turn_trace.add("stt", (time.monotonic() - start) * 1000)
+                return transcript
+        return self.transcribe_audio(priority=priority)
+
+    def transcribe_audio(self, priority=PRIORITY_LIVE_VOICE):
         """Transcribe recorded audio using Google Speech-to-Text with API key"""
         import requests
         import base64
 
         url = f"https://speech.googleapis.com/v1/speech:recognize?key={self.api_key}"
 
-        # Collect audio from the queue and save it to a temporary file
-        audio_data = b"".join(list(self.audio_queue.queue))
-        temp_audio_file = os.path.join(self.audio_output_dir, "temp_audio.wav")
-        with wave.open(temp_audio_file, "wb") as wf:
-            wf.setnchannels(self.CHANNELS)
-            wf.setsampwidth(pyaudio.PyAudio().get_sample_size(self.FORMAT))
-            wf.setframerate(self.RATE)
-            wf.writeframes(audio_data)
+        if len(self.audio_buffer) == 0:
+            return ""
 
-        # Convert audio to base64
-        with open(temp_audio_file, "rb") as audio_file:
-            audio_content = base64.b64encode(audio_file.read()).decode("utf-8")
+        # Encode the captured utterance in memory
+        with traced(self.turn_trace, "encode"):
+            audio_bytes = encode_upload(self.audio_buffer, self.upload_encoding)
+        audio_content = base64.b64encode(audio_bytes).decode("utf-8")
 
         payload = {
             "config": {
-                "encoding": "LINEAR16",
-                "sampleRateHertz": 16000,
+                "encoding": self.upload_encoding,
+                "sampleRateHertz": self.RATE,
                 "languageCode": "en-US",
             },
             "audio": {"content": audio_content},
         }
 
-        response = requests.post(url, json=payload)
+        try:
+            with traced(self.turn_trace, "stt"):
+                response = get_scheduler().call("stt", lambda: requests.post(url, json=payload), priority=priority)
+        except SchedulerOverloaded as e:
+            print(f"Error: {e}")
+            self.play_hold_message()
+            return ""
         if response.status_code == 200:
             result = response.json()
             return result.get("results", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
@@ -102,8 +262,49 @@ class VoiceInterface:
             print(f"Error: {response.status_code} - {response.text}")
             return ""
 
-    def text_to_speech(self, text, output_file=None):
-        """Convert text to speech using Google Text-to-Speech with API key"""
+    def text_to_speech(self, text, output_file=None, priority=PRIORITY_LIVE_VOICE):
+        """
+        Convert text to speech using Google Text-to-Speech with API key.
+        Returns the path of the cached audio file (copied to output_file if given), or None on failure.
+        If TTS is overloaded the cached hold message is returned in place of the reply.
+        """
+        try:
+            audio_file = self._fetch_speech(text, priority)
+        except SchedulerOverloaded as e:
+            print(f"Error: {e}")
+            audio_file = self.hold_message_audio()
+        if audio_file and output_file:
+            shutil.copyfile(audio_file, output_file)
+            return output_file
+        return audio_file
+
+    def _fetch_speech(self, text, priority=PRIORITY_LIVE_VOICE):
+        """Cached audio for text, synthesized on a miss; raises SchedulerOverloaded if TTS is shed"""
+        text = text.strip()
+        with traced(self.turn_trace, "tts"):
+            return self.tts_cache.fetch(self._tts_key(text), lambda: self._synthesize(text, priority), self.tts_encoding)
+
+    def hold_message_audio(self):
+        """
+        Path of the cached hold message, or None. Only the cache is read: this is played
+        when STT or TTS is overloaded, so it must not need a synthesis request itself.
+        """
+        audio_file = self.tts_cache.get(self._tts_key(HOLD_MESSAGE), self.tts_encoding)
+        if audio_file is None:
+            print("Error: hold message is not cached; run prewarm_tts() at start-up")
+        return audio_file
+
+    def play_hold_message(self):
+        """Ask the caller to hold (see HOLD_MESSAGE); returns True if it was played"""
+        audio_file = self.hold_message_audio()
+        return bool(audio_file) and self.speak(audio_file)
+
+    def _tts_key(self, text):
+        return tts_cache_key(text, self.tts_voice, self.tts_language_code, self.tts_speaking_rate,
+                             self.tts_pitch, self.tts_encoding)
+
+    def _synthesize(self, text, priority=PRIORITY_LIVE_VOICE):
+        """Call the synthesis API; returns the audio bytes or None. SchedulerOverloaded is raised to the caller."""
         import requests
 
         url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={self.api_key}"
@@ -111,52 +312,128 @@ class VoiceInterface:
         payload = {
             "input": {"text": text},
             "voice": {
-                "languageCode": "en-US",
-                "name": "en-US-Neural2-F",
-                "ssmlGender": "FEMALE",
+                "languageCode": self.tts_language_code,
+                "name": self.tts_voice,
+                "ssmlGender": self.tts_gender,
             },
             "audioConfig": {
-                "audioEncoding": "LINEAR16",
-                "speakingRate": 0.9,
-                "pitch": 0.0,
+                "audioEncoding": self.tts_encoding,
+                "speakingRate": self.tts_speaking_rate,
+                "pitch": self.tts_pitch,
             },
         }
 
-        response = requests.post(url, json=payload)
+        with traced(self.turn_trace, "tts_request"):
+            response = get_scheduler().call("tts", lambda: requests.post(url, json=payload), priority=priority)
         if response.status_code == 200:
-            audio_content = response.json()["audioContent"]
-
-            if not output_file:
-                output_file = os.path.join(
-                    self.audio_output_dir,
-                    f"response_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-                )
-
-            with open(output_file, "wb") as out:
-                out.write(base64.b64decode(audio_content))
-
-            return output_file
+            return base64.b64decode(response.json()["audioContent"])
         else:
             print(f"Error: {response.status_code} - {response.text}")
             return None
 
+    def prewarm_tts(self, texts=None, priority=PRIORITY_BACKGROUND):
+        """
+        Synthesize canned responses and FAQ answers (or the given texts) into the cache ahead of time.
+        Runs at background priority so live turns are admitted first. Returns the number synthesized.
+        """
+        if texts is None:
+            texts = prewarm_texts()
+        synthesized = 0
+        for text in texts:
+            if self.tts_cache.get(self._tts_key(text.strip()), self.tts_encoding) is None:
+                try:
+                    if self._fetch_speech(text, priority=priority):
+                        synthesized += 1
+                except SchedulerOverloaded as e:
+                    # Live turns have the capacity; try again later
+                    print(f"Error: prewarming stopped: {e}")
+                    break
+        return synthesized
+
+    def _output_stream(self, sample_format, channels, rate):
+        """Playback stream for the given format, opened once and reused"""
+        key = (sample_format, channels, rate)
+        if key not in self._output_streams:
+            self._output_streams[key] = self._get_audio().open(
+                format=sample_format,
+                channels=channels,
+                rate=rate,
+                output=True
+            )
+        return self._output_streams[key]
+
     def play_audio_response(self, audio_file):
-        """Play the generated audio response"""
-        wf = wave.open(audio_file, 'rb')
-        p = pyaudio.PyAudio()
-
-        stream = p.open(
-            format=p.get_format_from_width(wf.getsampwidth()),
-            channels=wf.getnchannels(),
-            rate=wf.getframerate(),
-            output=True
-        )
+        """
+        Play the generated audio response (WAV, Ogg Opus or MP3), decoding it as it plays.
+        Returns False if playback was stopped early by a barge-in.
+        """
+        start = time.monotonic()
+        decoded = open_decoder(audio_file, self.CHUNK)
+        stream = self._output_stream(pyaudio.paInt16, decoded.channels, decoded.sample_rate)
+        trace = self.turn_trace
+        try:
+            for block in decoded.blocks:
+                if self.barge_in.is_set():
+                    return False
+                if self.full_duplex:
+                    self._playback_rms = frame_rms(block)
+                stream.write(block)
+                if trace is not None and not trace.finished:
+                    # The caller hears the reply: the turn's latency ends here
+                    trace.add("playback_start", (time.monotonic() - start) * 1000)
+                    trace.finish()
+        finally:
+            self._playback_rms = 0.0
+        return True
+
+    def _start_speaking(self):
+        self.barge_in.clear()
+        self.speaking = True
+        if self.full_duplex and not self.is_recording:
+            # Listen for the caller's next turn while the reply plays
+            self.start_recording(self._on_transcript_callback)
+
+    def _stop_speaking(self):
+        self.speaking = False
+        if self.is_recording:
+            # The caller's silence only counts from the end of the reply
+            self.vad.restart_timeout()
+
+    def speak(self, audio_file):
+        """
+        Play a complete reply. In full-duplex mode the microphone stays open and the caller can
+        interrupt; recording then carries on as the next turn. Returns True if played to the end.
+        """
+        self._start_speaking()
+        try:
+            return self.play_audio_response(audio_file)
+        finally:
+            self._stop_speaking()
+
+    def speak_stream(self, pieces, on_text=None, priority=PRIORITY_LIVE_VOICE):
+        """
+        Speak a streamed response sentence by sentence while it is still being generated.
+        Sentences are synthesized as they complete and played back to back on the shared output
+        stream; a barge-in stops playback and cancels the remaining sentences. If TTS is overloaded
+        the hold message is played once in place of the rest of the reply.
+        Returns (text generated, StageTimings).
+        """
+        held = threading.Lock()
 
-        data = wf.readframes(self.CHUNK)
-        while data:
-            stream.write(data)
-            data = wf.readframes(self.CHUNK)
+        def synthesize(sentence):
+            if held.locked():
+                return None
+            try:
+                return self._fetch_speech(sentence, priority=priority)
+            except SchedulerOverloaded as e:
+                print(f"Error: {e}")
+                # Only the first shed sentence is replaced by the hold message
+                return self.hold_message_audio() if held.acquire(blocking=False) else None
 
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
+        self.speech_pipeline = SpeechPipeline(synthesize=synthesize, play=self.play_audio_response)
+        self._start_speaking()
+        try:
+            return self.speech_pipeline.run(pieces, on_text)
+        finally:
+            self._stop_speaking()
+            self.speech_pipeline = None
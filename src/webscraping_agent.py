@@ -1,4 +1,5 @@
 import os
+import threading
 import requests
 from bs4 import BeautifulSoup
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -16,31 +17,65 @@ RAW_DATA_FILE = "data/web_scraped_data.txt"
 CHUNKS_FILE = "data/web_scraped_data_chunks.txt"
 EMBEDDINGS_FILE = "data/web_scraped_data_embeddings.pt"
 
-# Initialize model
-model = SentenceTransformer(MODEL_NAME)
-
-def scrape_website(url):
-    """
-    Scrapes text content from the specified website URL, prefixes each text body with its URL,
-    and saves all raw data in a single file.
-    """
-    # Define headers with User-Agent
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-
-    # Make the main request with headers
-    response = requests.get(url, headers=headers, timeout=10)
+# Embedding model, loaded on first use so processes that only scrape or parse never load it
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = SentenceTransformer(MODEL_NAME)
+        return _model
+
+# Sent with every request; some sites refuse the default requests User-Agent
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+REQUEST_TIMEOUT = 10
+
+def fetch_html(url):
+    """Raw page content"""
+    response = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
+    return response.content
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+def fetch_soup(url):
+    """Fetch a page and parse it"""
+    return BeautifulSoup(fetch_html(url), 'html.parser')
 
-    # Extract all links
+def page_text(soup):
+    """Visible text of the content tags on a page, one tag per line"""
+    return "\n".join(
+        tag.get_text(strip=True)
+        for tag in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
+        if not (tag.get("style") and ("display: none" in tag["style"] or "visibility: hidden" in tag["style"]))
+    )
+
+def list_subpages(url, soup):
+    """Absolute URLs of the links on the main page, without excluded pages"""
     links = [a['href'] for a in soup.find_all('a', href=True) if not any(excluded in a['href'] for excluded in EXCLUDED_PAGES)]
 
     # Normalize relative URLs to absolute URLs
     base_url = url.rstrip("/")
-    subpages = [link if link.startswith("http") else f"{base_url}/{link.lstrip('/')}" for link in links]
+    return [link if link.startswith("http") else f"{base_url}/{link.lstrip('/')}" for link in links]
+
+def format_page(url, text):
+    """Page text prefixed with its URL, as stored in the raw data file"""
+    return f"URL: {url}\n{text}\n\n"
+
+def save_raw_data(raw_data, raw_data_file=RAW_DATA_FILE):
+    os.makedirs(os.path.dirname(raw_data_file), exist_ok=True)
+    with open(raw_data_file, "w", encoding="utf-8") as file:
+        file.write(raw_data)
+
+def scrape_website(url, raw_data_file=RAW_DATA_FILE):
+    """
+    Scrapes text content from the specified website URL, prefixes each text body with its URL,
+    and saves all raw data in a single file.
+    """
+    soup = fetch_soup(url)
+    subpages = list_subpages(url, soup)
 
     print("Subpages to be scraped:")
     for subpage in subpages:
@@ -52,72 +87,63 @@ def scrape_website(url):
     # Scrape each subpage
     for subpage in subpages:
         try:
-            # Make subpage requests with headers
-            sub_response = requests.get(subpage, headers=headers, timeout=10)
-            sub_response.raise_for_status()
-            sub_soup = BeautifulSoup(sub_response.content, 'html.parser')
-
-            # Extract text from subpage
-            sub_text = "\n".join(
-                tag.get_text(strip=True)
-                for tag in sub_soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
-                if not (tag.get("style") and ("display: none" in tag["style"] or "visibility: hidden" in tag["style"]))
-            )
-
             # Append URL-prefixed text to raw_data
-            raw_data += f"URL: {subpage}\n{sub_text}\n\n"
+            raw_data += format_page(subpage, page_text(fetch_soup(subpage)))
             print(f"Scraped: {subpage}")
         except Exception as e:
             print(f"Failed to scrape {subpage}: {e}")
 
     # Also scrape the main page
-    main_text = "\n".join(
-        tag.get_text(strip=True)
-        for tag in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
-        if not (tag.get("style") and ("display: none" in tag["style"] or "visibility: hidden" in tag["style"]))
-    )
-    raw_data = f"URL: {url}\n{main_text}\n\n" + raw_data
+    raw_data = format_page(url, page_text(soup)) + raw_data
 
     # Save the combined raw data to a file
-    os.makedirs(os.path.dirname(RAW_DATA_FILE), exist_ok=True)
-    with open(RAW_DATA_FILE, "w", encoding="utf-8") as file:
-        file.write(raw_data)
+    save_raw_data(raw_data, raw_data_file)
 
-    print(f"Raw data saved to {RAW_DATA_FILE}")
+    print(f"Raw data saved to {raw_data_file}")
     return raw_data
 
 
-def chunk_text(raw_text, chunk_size=500, overlap=100):
+def chunk_text(raw_text, chunk_size=500, overlap=100, chunks_file=CHUNKS_FILE):
     """
     Splits raw text into chunks using LangChain's RecursiveCharacterTextSplitter
     and saves the chunks with IDs.
     """
+    chunks = split_text(raw_text, chunk_size, overlap)
+    save_chunks(chunks, chunks_file)
+    print(f"Text chunks saved to {chunks_file}")
+    return chunks
+
+def split_text(raw_text, chunk_size=500, overlap=100):
+    """Split text into overlapping chunks, preferring paragraph, then line, then word boundaries"""
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=overlap,
         separators=["\n\n", "\n", " ", ""]
     )
-    chunks = text_splitter.split_text(raw_text)
+    return text_splitter.split_text(raw_text)
 
-    # Add chunk IDs
+def save_chunks(chunks, chunks_file=CHUNKS_FILE):
+    """Save chunks with IDs to the chunks file"""
     chunks_with_ids = [f"Chunk {i+1}:\n{chunk}" for i, chunk in enumerate(chunks)]
-
-    # Save chunks with IDs to the file
-    os.makedirs(os.path.dirname(CHUNKS_FILE), exist_ok=True)
-    with open(CHUNKS_FILE, "w", encoding="utf-8") as file:
+    os.makedirs(os.path.dirname(chunks_file), exist_ok=True)
+    with open(chunks_file, "w", encoding="utf-8") as file:
         file.write("\n\n".join(chunks_with_ids))
 
-    print(f"Text chunks saved to {CHUNKS_FILE}")
-    return chunks
 
+def embed_texts(texts):
+    """Embedding tensor for a list of texts"""
+    return get_model().encode(texts, convert_to_tensor=True)
+
+def save_embeddings(embeddings, texts, embeddings_file=EMBEDDINGS_FILE):
+    os.makedirs(os.path.dirname(embeddings_file), exist_ok=True)
+    torch.save({"embeddings": embeddings, "texts": texts}, embeddings_file)
 
-def generate_embeddings(chunks):
+def generate_embeddings(chunks, embeddings_file=EMBEDDINGS_FILE):
     """
     Generates embeddings for text chunks and saves them to a file.
     """
-    embeddings = model.encode(chunks, convert_to_tensor=True)
+    embeddings = embed_texts(chunks)
 
     # Save embeddings and chunks
-    os.makedirs(os.path.dirname(EMBEDDINGS_FILE), exist_ok=True)
-    torch.save({"embeddings": embeddings, "texts": chunks}, EMBEDDINGS_FILE)
-    print(f"Embeddings saved to {EMBEDDINGS_FILE}")
+    save_embeddings(embeddings, chunks, embeddings_file)
+    print(f"Embeddings saved to {embeddings_file}")
@@ -0,0 +1,140 @@
+import sys
+import os
+import json
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.analytics_export import SessionExporter, turn_row
+from src.analytics_query import REPORTS, load_turns
+from src.session_store import FileSessionStore, SQLiteSessionStore
+
+LEGACY_SESSIONS_DIR = os.path.join(project_root, "data", "chat_sessions")
+
+# Pass --full for 5M turns
+SESSIONS = 100_000 if "--full" in sys.argv else 20_000
+TURNS_PER_SESSION = 50
+DAYS = 30
+INTENTS = ["greeting", "business_hours", "appointment", "confirm_appointment", "location", "services", "farewell", "fallback"]
+
+def make_turns(rng, start):
+    turns = []
+    timestamp = start
+    for number in range(1, TURNS_PER_SESSION + 1):
+        timestamp += timedelta(seconds=rng.randint(5, 60))
+        turns.append({
+            "user": "Can I book an appointment for tomorrow afternoon?",
+            "assistant": "Of course! We have openings at 2 PM and 4 PM tomorrow.",
+            "intent": rng.choice(INTENTS),
+            "timestamp": timestamp.isoformat(),
+            "dialogue_state": {"turns": number},
+            "latency_ms": rng.lognormvariate(6.5, 0.4)
+        })
+    return turns
+
+def turns_by_session(analytics_dir):
+    counts = {}
+    for session_id in load_turns(["session_id"], analytics_dir=analytics_dir)["session_id"].to_pylist():
+        counts[session_id] = counts.get(session_id, 0) + 1
+    return counts
+
+def check_replaced_histories(workdir):
+    """Legacy JSON sessions are exported, and a replaced history never leaves duplicate rows"""
+    sessions_dir = os.path.join(workdir, "legacy_sessions")
+    shutil.copytree(LEGACY_SESSIONS_DIR, sessions_dir)
+    expected = {}
+    for name in os.listdir(sessions_dir):
+        with open(os.path.join(sessions_dir, name), "r", encoding="utf-8") as file:
+            turns = json.load(file)
+        timestamped = sum(turn_row(name, None, turn) is not None for turn in turns)
+        if timestamped:
+            expected[name[:-len(".json")]] = timestamped
+    assert expected, "the shipped sessions include timestamped turns"
+
+    store = FileSessionStore(sessions_dir, fsync_policy="never")
+    analytics_dir = os.path.join(workdir, "legacy_analytics")
+    rows = SessionExporter(analytics_dir).export(store)
+    assert rows == sum(expected.values()) and turns_by_session(analytics_dir) == expected
+    assert SessionExporter(analytics_dir).export(store) == 0, "unchanged legacy files are not read again"
+
+    # Rewriting a history (which also migrates it to JSONL) replaces its rows instead of adding to them
+    session_id = max(expected, key=expected.get)
+    history = store.load(session_id)
+    store.save(session_id, history)
+    store.log.migrate_layout()
+    SessionExporter(analytics_dir).export(store)
+    assert turns_by_session(analytics_dir) == expected
+    store.reset(session_id)
+    SessionExporter(analytics_dir).export(store)
+    assert session_id not in turns_by_session(analytics_dir)
+    print(f"{len(expected)} legacy sessions exported ({rows} turns); rewritten histories not duplicated")
+
+    # The same holds for SQLite, whose save() deletes and re-inserts the session's rows
+    sqlite_store = SQLiteSessionStore(os.path.join(workdir, "sessions.db"))
+    sqlite_store.save(session_id, history)
+    sqlite_store.append("session_other", history[0])
+    analytics_dir = os.path.join(workdir, "sqlite_analytics")
+    SessionExporter(analytics_dir).export(sqlite_store)
+    sqlite_store.save(session_id, history)
+    SessionExporter(analytics_dir).export(sqlite_store)
+    assert turns_by_session(analytics_dir) == {session_id: expected[session_id], "session_other": 1}
+    sqlite_store.close()
+    print("SQLite save() re-exports the session without duplicates")
+
+def main():
+    rng = random.Random(7)
+    workdir = tempfile.mkdtemp()
+    try:
+        check_replaced_histories(workdir)
+
+        store = FileSessionStore(os.path.join(workdir, "sessions"), fsync_policy="never")
+        first_day = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        start = time.perf_counter()
+        session_ids = []
+        for i in range(SESSIONS):
+            session_id = f"session_{i:07d}"
+            session_start = first_day + timedelta(days=rng.randrange(DAYS), seconds=rng.randrange(86_400))
+            store.save(session_id, make_turns(rng, session_start))
+            session_ids.append(session_id)
+        print(f"Wrote {SESSIONS * TURNS_PER_SESSION} turns in {SESSIONS} sessions in {time.perf_counter() - start:.1f}s")
+
+        analytics_dir = os.path.join(workdir, "analytics")
+        exporter = SessionExporter(analytics_dir)
+        start = time.perf_counter()
+        rows = exporter.export(store)
+        print(f"Full export: {rows} turns in {time.perf_counter() - start:.1f}s")
+        assert rows == SESSIONS * TURNS_PER_SESSION
+
+        # Only turns added since the last run are read
+        for session_id in rng.sample(session_ids, 100):
+            store.append(session_id, make_turns(rng, first_day)[0])
+        start = time.perf_counter()
+        rows = SessionExporter(analytics_dir).export(store)
+        print(f"Incremental export: {rows} turns in {time.perf_counter() - start:.2f}s")
+        assert rows == 100
+
+        start = time.perf_counter()
+        days = exporter.compact()
+        print(f"Compacted {days} day partitions in {time.perf_counter() - start:.1f}s")
+
+        for name, report in REPORTS.items():
+            start = time.perf_counter()
+            result = report(analytics_dir=analytics_dir)
+            elapsed = time.perf_counter() - start
+            preview = result[:3] if isinstance(result, list) else result
+            print(f"{name:>10}: {elapsed * 1000:7.0f} ms  {preview}")
+
+        start = time.perf_counter()
+        REPORTS["intents"](start_date="2025-01-10", end_date="2025-01-12", analytics_dir=analytics_dir)
+        print(f"Intents over 3 days (partition pruned): {(time.perf_counter() - start) * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
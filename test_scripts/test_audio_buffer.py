@@ -0,0 +1,65 @@
+import sys
+import os
+import io
+import random
+import wave
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.audio_buffer import AudioRingBuffer, encode_wav
+
+SAMPLE_RATE = 100
+MAX_SECONDS = 5  # 1000 bytes of 16-bit mono, small enough to wrap many times
+WRITES = 2000
+
+def contents(buffer):
+    return b"".join(bytes(view) for view in buffer.views())
+
+def main():
+    rng = random.Random(7)
+    buffer = AudioRingBuffer(max_seconds=MAX_SECONDS, sample_rate=SAMPLE_RATE)
+    storage = buffer._buffer
+    assert buffer.capacity == MAX_SECONDS * SAMPLE_RATE * 2
+
+    # Against a reference that keeps everything: the buffer holds exactly the newest capacity bytes
+    written = bytearray()
+    for i in range(WRITES):
+        size = 2 * rng.choice([1, 16, 160, rng.randrange(1, 400), buffer.capacity // 2 + 1, buffer.capacity + 6])
+        data = bytes(rng.randrange(256) for _ in range(size))
+        buffer.write(data)
+        written += data
+        expected = bytes(written[-buffer.capacity:])
+        assert len(buffer) == len(expected) and contents(buffer) == expected, f"write {i} ({size} bytes)"
+        assert buffer.overflowed == (len(written) > buffer.capacity)
+        views = buffer.views()
+        assert len(views) <= 2 and all(view.obj is storage for view in views), "zero-copy slices of one buffer"
+    assert buffer._buffer is storage, "never reallocated"
+    print(f"{len(written)} bytes written through a {buffer.capacity}-byte buffer; the newest audio always intact")
+
+    # Frames across the wrap point: all audio, in order, only the last frame short
+    frame_bytes = 2 * 33
+    frames = list(buffer.frames(frame_bytes))
+    assert b"".join(bytes(frame) for frame in frames) == contents(buffer)
+    assert all(len(frame) == frame_bytes for frame in frames[:-1]) and 0 < len(frames[-1]) <= frame_bytes
+
+    # Trailing silence is dropped from the newest end, whole samples only
+    before = contents(buffer)
+    buffer.truncate(101)
+    assert contents(buffer) == before[:-100]
+
+    # The WAV upload is the same audio behind a valid header
+    with wave.open(io.BytesIO(encode_wav(buffer)), "rb") as wav:
+        assert wav.getframerate() == SAMPLE_RATE and wav.getsampwidth() == 2 and wav.getnchannels() == 1
+        assert wav.readframes(wav.getnframes()) == contents(buffer)
+
+    # The next utterance starts empty in the same memory
+    buffer.reset()
+    assert len(buffer) == 0 and contents(buffer) == b"" and not buffer.overflowed
+    buffer.write(b"\x01\x00\x02\x00")
+    assert contents(buffer) == b"\x01\x00\x02\x00" and buffer._buffer is storage
+    print("frames, truncation, WAV encoding and reset consistent after wraparound")
+
+if __name__ == "__main__":
+    main()
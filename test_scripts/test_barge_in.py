@@ -0,0 +1,107 @@
+import sys
+import os
+import argparse
+import glob
+import random
+import statistics
+import struct
+import wave
+from array import array
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.voice_activity import SPEECH_START, VADConfig, VoiceActivityDetector, frame_rms
+
+AUDIO_FIXTURES = os.path.join(project_root, "data", "audio_output", "*.wav")
+CHUNK = 1024
+NOISE_LEVEL = 60      # microphone background noise standard deviation (16-bit samples)
+BARGE_IN_AT = 2.0     # seconds into the reply when the caller starts talking
+
+def load(path):
+    with wave.open(path, "rb") as wav:
+        return wav.getframerate(), wav.readframes(wav.getnframes())
+
+def trim_leading_silence(audio, min_rms):
+    frame_bytes = CHUNK * 2
+    for offset in range(0, len(audio), frame_bytes):
+        if frame_rms(audio[offset:offset + frame_bytes]) >= min_rms:
+            return audio[offset:]
+    return b""
+
+def microphone(reply, caller, rate, echo_level, rng):
+    """What the microphone hears: background noise, the reply's echo and (optionally) the caller"""
+    samples = array("h")
+    samples.frombytes(reply)
+    mixed = [int(sample * echo_level + rng.gauss(0, NOISE_LEVEL)) for sample in samples]
+    if caller:
+        voice = array("h")
+        voice.frombytes(caller)
+        start = int(BARGE_IN_AT * rate)
+        for i, sample in enumerate(voice[:max(0, len(mixed) - start)]):
+            mixed[start + i] += sample
+    return struct.pack(f"<{len(mixed)}h", *(max(-32768, min(32767, sample)) for sample in mixed))
+
+def play_reply(reply, mic, rate, config):
+    """
+    Mirror VoiceInterface in full-duplex mode: each reply chunk is written while the capture thread
+    classifies the matching microphone chunk with the echo floor; a SPEECH_START stops playback
+    before the next chunk. Returns the time playback stopped (None if it played to the end).
+    """
+    vad = VoiceActivityDetector(rate, 2, config)
+    frame_bytes = CHUNK * 2
+    for offset in range(0, len(reply), frame_bytes):
+        playback_rms = frame_rms(reply[offset:offset + frame_bytes])
+        event = vad.process(mic[offset:offset + frame_bytes], min_rms=config.echo_gain * playback_rms)
+        if event == SPEECH_START:
+            # The block after this one is never written
+            return (offset + 2 * frame_bytes) / (rate * 2)
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Barge-in reaction time and false interruptions from echo")
+    parser.add_argument("--echo-levels", type=float, nargs="*", default=[0.0, 0.1, 0.3],
+                        help="Echo of the reply in the microphone, relative to the played signal")
+    parser.add_argument("--files", type=int, default=8, help="Number of fixtures (0 = all)")
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    paths = sorted(glob.glob(AUDIO_FIXTURES))
+    if args.files:
+        paths = paths[:args.files]
+    if len(paths) < 2:
+        print(f"Need at least two WAV fixtures in {AUDIO_FIXTURES}")
+        return
+    fixtures = [load(path) for path in paths]
+    rate = fixtures[0][0]
+    chunk_ms = CHUNK / rate * 1000
+
+    print(f"{len(fixtures)} replies; the caller interrupts {BARGE_IN_AT:.0f}s in. One chunk = {chunk_ms:.0f} ms\n")
+    print(f"{'echo':>5} {'echo gate':>10} {'false barge-ins':>16} {'stop after onset':>17} {'max':>8} {'caller would wait':>18}")
+    for echo_level in args.echo_levels:
+        for gated in (True, False):
+            config = VADConfig() if gated else VADConfig(echo_gain=0.0)
+            false_barge_ins, reactions, waits = 0, [], []
+            for i, (_, reply) in enumerate(fixtures):
+                # Echo only: the reply must play to the end
+                if play_reply(reply, microphone(reply, b"", rate, echo_level, rng), rate, config) is not None:
+                    false_barge_ins += 1
+                # Another recording stands in for the caller talking over the reply
+                caller = trim_leading_silence(fixtures[(i + 1) % len(fixtures)][1], config.min_rms)
+                stopped = play_reply(reply, microphone(reply, caller, rate, echo_level, rng), rate, config)
+                if stopped is not None and stopped >= BARGE_IN_AT:
+                    reactions.append((stopped - BARGE_IN_AT) * 1000)
+                    waits.append((len(reply) / (rate * 2) - BARGE_IN_AT) * 1000)
+            reaction = (f"{statistics.median(reactions):>14.0f} ms {max(reactions):>5.0f} ms" if reactions
+                        else f"{'-':>17} {'-':>8}")
+            wait = f"{statistics.median(waits):>15.0f} ms" if waits else f"{'-':>18}"
+            print(f"{echo_level:>5.1f} {'on' if gated else 'off':>10} {false_barge_ins:>10}/{len(fixtures):<5} {reaction} {wait}")
+            if gated:
+                assert false_barge_ins == 0, "the reply's own echo must not interrupt it"
+                # Detection needs min_speech_ms of speech; playback then stops at the next chunk
+                assert reactions and statistics.median(reactions) <= config.min_speech_ms + 4 * chunk_ms, \
+                    "playback should stop a fraction of a second after the caller starts talking"
+
+if __name__ == "__main__":
+    main()
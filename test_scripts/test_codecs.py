@@ -0,0 +1,145 @@
+import sys
+import os
+import argparse
+import base64
+import glob
+import json
+import shutil
+import statistics
+import tempfile
+import time
+import wave
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.audio_buffer import AudioRingBuffer
+from src.audio_codecs import UPLOAD_ENCODERS, encode_upload, open_decoder
+
+AUDIO_FIXTURES = os.path.join(project_root, "data", "audio_output", "*.wav")
+
+# Link profiles: (uplink bits/s, downlink bits/s, round trip seconds)
+LINKS = {
+    "3G": (384_000, 1_000_000, 0.15),
+    "congested LTE": (1_000_000, 3_000_000, 0.08),
+    "broadband": (10_000_000, 50_000_000, 0.02),
+}
+
+# Synthesis encodings benchmarked for download, with the soundfile format that produces them locally
+SYNTHESIS_FORMATS = {"LINEAR16": None, "OGG_OPUS": ("OGG", "OPUS"), "MP3": ("MP3", "MPEG_LAYER_III")}
+
+def load_fixture(path):
+    with wave.open(path, "rb") as wav:
+        rate = wav.getframerate()
+        buffer = AudioRingBuffer(sample_rate=rate, sample_width=wav.getsampwidth(), channels=wav.getnchannels())
+        buffer.write(wav.readframes(wav.getnframes()))
+    return buffer
+
+def json_payload_bytes(audio_bytes):
+    """Size of the REST request body: the audio travels base64-encoded inside JSON"""
+    return len(json.dumps({"audio": {"content": base64.b64encode(audio_bytes).decode("ascii")}}))
+
+def transfer_seconds(size, bits_per_second, round_trip):
+    return round_trip + size * 8 / bits_per_second
+
+def benchmark_uploads(buffers):
+    """Upload size and encode time per encoding; returns {encoding: (payload bytes, encode ms)} medians"""
+    results = {}
+    for encoding in UPLOAD_ENCODERS:
+        sizes, encode_ms = [], []
+        try:
+            for buffer in buffers:
+                start = time.perf_counter()
+                audio_bytes = encode_upload(buffer, encoding)
+                encode_ms.append((time.perf_counter() - start) * 1000)
+                sizes.append(json_payload_bytes(audio_bytes))
+        except Exception as e:
+            print(f"  {encoding:<9} unavailable here: {type(e).__name__}: {e}")
+            continue
+        results[encoding] = (statistics.median(sizes), statistics.median(encode_ms))
+    return results
+
+def write_synthesis_file(buffer, encoding, output_dir):
+    """The clip as the synthesis API would return it in this encoding"""
+    if SYNTHESIS_FORMATS[encoding] is None:
+        return encode_upload(buffer, "LINEAR16")
+    import numpy as np
+    import soundfile
+
+    file_format, subtype = SYNTHESIS_FORMATS[encoding]
+    path = os.path.join(output_dir, f"clip.{file_format.lower()}")
+    samples = np.frombuffer(b"".join(buffer.views()), dtype=np.int16).reshape(-1, buffer.channels)
+    soundfile.write(path, samples, buffer.sample_rate, format=file_format, subtype=subtype)
+    with open(path, "rb") as file:
+        return file.read()
+
+def benchmark_downloads(buffers, output_dir):
+    """Download size and decode timings per synthesis encoding"""
+    results = {}
+    for encoding in SYNTHESIS_FORMATS:
+        sizes, first_block_ms, full_decode_ms = [], [], []
+        try:
+            for buffer in buffers:
+                audio_bytes = write_synthesis_file(buffer, encoding, output_dir)
+                path = os.path.join(output_dir, "download")
+                with open(path, "wb") as file:
+                    file.write(audio_bytes)
+                sizes.append(len(json.dumps({"audioContent": base64.b64encode(audio_bytes).decode("ascii")})))
+                start = time.perf_counter()
+                decoded = open_decoder(path)
+                blocks = iter(decoded.blocks)
+                decoded_bytes = len(next(blocks))
+                first_block_ms.append((time.perf_counter() - start) * 1000)
+                decoded_bytes += sum(len(block) for block in blocks)
+                full_decode_ms.append((time.perf_counter() - start) * 1000)
+                assert decoded_bytes > 0.9 * len(buffer), f"{encoding} decode lost audio"
+        except Exception as e:
+            print(f"  {encoding:<9} unavailable here: {type(e).__name__}: {e}")
+            continue
+        results[encoding] = (statistics.median(sizes), statistics.median(first_block_ms), statistics.median(full_decode_ms))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PCM and compressed codecs for STT upload and TTS download")
+    parser.add_argument("--files", type=int, default=0, help="Number of fixtures (0 = all)")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(AUDIO_FIXTURES))
+    if args.files:
+        paths = paths[:args.files]
+    if not paths:
+        print(f"No WAV fixtures found in {AUDIO_FIXTURES}")
+        return
+    buffers = [load_fixture(path) for path in paths]
+    seconds = statistics.median(buffer.duration for buffer in buffers)
+    print(f"{len(buffers)} clips, median {seconds:.1f}s at {buffers[0].sample_rate} Hz\n")
+
+    print("Speech-to-text upload (base64 JSON request body)")
+    uploads = benchmark_uploads(buffers)
+    print(f"  {'encoding':<9} {'payload KB':>10} {'encode ms':>10} " + " ".join(f"{name:>14}" for name in LINKS))
+    for encoding, (size, encode_ms) in uploads.items():
+        links = " ".join(f"{(encode_ms / 1000 + transfer_seconds(size, up, rtt)) * 1000:>11.0f} ms"
+                         for up, _, rtt in LINKS.values())
+        print(f"  {encoding:<9} {size / 1024:>10.0f} {encode_ms:>10.1f} {links}")
+
+    output_dir = tempfile.mkdtemp(prefix="codec_benchmark_")
+    try:
+        print("\nText-to-speech download (base64 JSON response body) and streaming decode")
+        downloads = benchmark_downloads(buffers, output_dir)
+    finally:
+        shutil.rmtree(output_dir)
+    print(f"  {'encoding':<9} {'payload KB':>10} {'1st block ms':>12} {'decode ms':>10} " + " ".join(f"{name:>14}" for name in LINKS))
+    for encoding, (size, first_block_ms, full_decode_ms) in downloads.items():
+        # Time until playback can start: download, then the first decoded block
+        links = " ".join(f"{(transfer_seconds(size, down, rtt) + first_block_ms / 1000) * 1000:>11.0f} ms"
+                         for _, down, rtt in LINKS.values())
+        print(f"  {encoding:<9} {size / 1024:>10.0f} {first_block_ms:>12.2f} {full_decode_ms:>10.1f} {links}")
+
+    assert "LINEAR16" in uploads and "LINEAR16" in downloads, "the PCM baseline must always work"
+    for encoding in ("FLAC", "OGG_OPUS"):
+        if encoding in uploads:
+            print(f"\n{encoding} upload is {uploads[encoding][0] / uploads['LINEAR16'][0]:.0%} of the LINEAR16 payload")
+
+if __name__ == "__main__":
+    main()
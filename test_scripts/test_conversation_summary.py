@@ -0,0 +1,89 @@
+import sys
+import os
+import shutil
+import tempfile
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.conversation_summary import (
+    CHARS_PER_TOKEN, MAX_FOLD_TURNS, SUMMARY_MAX_TOKENS, ConversationSummarizer, build_history_context
+)
+from src.llm_backend import LLMBackend
+from src.session_store import FileSessionStore
+
+WINDOW = 5
+HISTORY_BUDGET = 300
+
+class VerboseBackend(LLMBackend):
+    """Stand-in summarizer that ignores the word limit and records its prompts"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def chat(self, messages, model, temperature=0.7):
+        self.prompts.append(messages[0]["content"])
+        return f"Summary {len(self.prompts)}: " + "the caller wants a cleaning next week " * 200
+
+def make_turn(number, words=20):
+    return {"user": f"Question {number} " + "word " * words, "assistant": f"Answer {number}.",
+            "dialogue_state": {"turns": number}}
+
+def main():
+    directory = tempfile.mkdtemp(prefix="conversation_summary_")
+    try:
+        store = FileSessionStore(directory)
+        backend = VerboseBackend()
+        summarizer = ConversationSummarizer(store, backend, window_turns=WINDOW)
+        for number in range(1, 101):
+            store.append("session_a", make_turn(number))
+
+        # Nothing to fold until a batch of turns has left the window
+        assert summarizer.maybe_summarize("session_a", WINDOW + 1, {}) is None
+        summarizer.maybe_summarize("session_a", 100, {}).result()
+        meta = store.load_meta("session_a")
+        assert meta["summarized_through"] == MAX_FOLD_TURNS, "one fold is capped at MAX_FOLD_TURNS turns"
+        assert len(meta["summary"]) <= SUMMARY_MAX_TOKENS * CHARS_PER_TOKEN + len(" ..."), "the summary is truncated"
+        assert meta["summary"].endswith(" ...")
+
+        # The next fold sends the previous summary and only the turns folded since
+        summarizer.fold("session_a", 100)
+        meta = store.load_meta("session_a")
+        assert meta["summarized_through"] == 2 * MAX_FOLD_TURNS
+        prompt = backend.prompts[-1]
+        assert "Summary 1:" in prompt
+        assert f"Question {MAX_FOLD_TURNS} " not in prompt and f"Question {MAX_FOLD_TURNS + 1} " in prompt
+        assert f"Question {2 * MAX_FOLD_TURNS} " in prompt and f"Question {2 * MAX_FOLD_TURNS + 1} " not in prompt
+        summarizer.fold("session_a", 100)
+        assert store.load_meta("session_a")["summarized_through"] == 100 - WINDOW, "the window stays verbatim"
+        print(f"100 turns folded in {len(backend.prompts)} calls, summary capped at {SUMMARY_MAX_TOKENS} tokens")
+
+        # The prompt history fits the budget: summary plus the newest unsummarized turns
+        meta = store.load_meta("session_a")
+        turns = store.load("session_a", last_n=10)
+        context = build_history_context(turns, meta, token_budget=HISTORY_BUDGET)
+        assert context.startswith("Summary of earlier conversation: Summary 3:")
+        assert len(context) // CHARS_PER_TOKEN <= HISTORY_BUDGET + 1
+        assert "Question 100 " in context and "Question 95 " not in context, "only unsummarized turns, newest first"
+
+        # A single huge turn is truncated, never dropped
+        huge = make_turn(101, words=5000)
+        context = build_history_context([huge], {}, token_budget=HISTORY_BUDGET)
+        assert context.startswith("User: Question 101") and context.endswith(" ...")
+        assert len(context) <= HISTORY_BUDGET * CHARS_PER_TOKEN + len(" ...")
+        print("history context truncated to the token budget")
+
+        # A summary left over from before a reset is discarded
+        store.reset("session_a")
+        store.save_meta("session_a", meta)
+        for number in range(1, 11):
+            store.append("session_a", make_turn(number))
+        assert summarizer.fold("session_a", 10)["summarized_through"] == 10 - WINDOW
+        assert "Summary 3:" not in backend.prompts[-1]
+        print("stale summary discarded after a reset")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+from datetime import datetime
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.conversation_flows import ConversationManager
+from src.dialogue_state import DialogueState, extract_slots
+
+NOW = datetime(2026, 1, 5, 10, 0)  # a Monday
+
+def run_turns(manager, messages):
+    """Answer messages one after another, restoring the state from the stored turns like LLMService does"""
+    history, results = [], []
+    for message in messages:
+        state = DialogueState.from_history(history)
+        result = manager.process_message(message, state=state, now=NOW)
+        # Turns are stored as JSON, so the state must survive a round trip
+        history.append(json.loads(json.dumps({"user": message, "dialogue_state": result["dialogue_state"].to_dict()})))
+        results.append(result)
+    return results
+
+def main():
+    assert extract_slots("tomorrow at 3", NOW) == {"date": "2026-01-06", "time": "15:00"}
+    assert extract_slots("next monday at 10:30am", NOW) == {"date": "2026-01-12", "time": "10:30"}
+    assert extract_slots("I have 3 kids", NOW) == {}, "a bare number is not a time"
+
+    manager = ConversationManager()
+
+    # The date and time arrive in separate turns, with a turn the flow does not understand in between
+    booking, date, unclear, time = run_turns(manager, [
+        "I'd like to book an appointment", "tomorrow", "hmm let me check", "at 3"
+    ])
+    assert booking["intent"] == "appointment" and "confirm_appointment" in booking["next_intents"]
+    assert date["slots"] == {"date": "2026-01-06"} and not date["resolved_by_state"]
+    assert unclear["intent"] == "fallback"
+    assert unclear["dialogue_state"].expected_intents == booking["next_intents"], "a fallback keeps the expectations"
+    assert unclear["slots"] == {"date": "2026-01-06"}, "slots carry over a fallback turn"
+    assert time["intent"] == "confirm_appointment" and time["resolved_by_state"]
+    assert time["slots"] == {"date": "2026-01-06", "time": "15:00"}
+    assert "Tuesday, January 6" in time["response"] and "3:00 PM" in time["response"], time["response"]
+    assert time["dialogue_state"].turns == 4
+    print(f"slots collected over 4 turns: {time['response']}")
+
+    # Slots survive an unrelated question; a later value replaces an earlier one
+    booking, hours, change = run_turns(manager, [
+        "Can I book an appointment tomorrow at 3?", "What hours are you open?", "actually make it friday"
+    ])
+    assert booking["slots"] == {"date": "2026-01-06", "time": "15:00"}
+    assert hours["intent"] == "business_hours" and hours["slots"] == booking["slots"]
+    assert change["slots"] == {"date": "2026-01-09", "time": "15:00"}
+    print("slots kept across an unrelated question and updated by a later answer")
+
+if __name__ == "__main__":
+    main()
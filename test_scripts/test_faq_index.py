@@ -0,0 +1,132 @@
+import sys
+import os
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import zlib
+
+import torch
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.faq_index import FAQIndex
+from src.faq_records import faq_text, faq_texts, new_faq_id
+
+DIMENSIONS = 384
+ENCODE_SECONDS_PER_TEXT = 0.002  # stand-in model cost per text
+
+class CountingEncoder:
+    """Deterministic stand-in embeddings that count how many texts were encoded"""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def __call__(self, texts):
+        self.encoded += len(texts)
+        time.sleep(ENCODE_SECONDS_PER_TEXT * len(texts))
+        vectors = []
+        for text in texts:
+            generator = torch.Generator().manual_seed(zlib.crc32(text.encode("utf-8")))
+            vectors.append(torch.randn(DIMENSIONS, generator=generator))
+        return torch.stack(vectors)
+
+def make_faqs(count):
+    return [{"id": new_faq_id(), "question": f"Question {i}?", "answer": f"Answer {i}.", "metadata": []}
+            for i in range(count)]
+
+def top_text(index, encoder, text):
+    results = index.search(encoder([text]), top_k=1)
+    return results[0][1] if results else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental FAQ index: single-record edits, tombstones, compaction")
+    parser.add_argument("--faqs", type=int, default=500)
+    parser.add_argument("--edits", type=int, default=50)
+    args = parser.parse_args()
+
+    index_dir = tempfile.mkdtemp(prefix="faq_index_")
+    try:
+        encoder = CountingEncoder()
+        writer = FAQIndex(index_dir, encode=encoder, background_compaction=False)
+        faqs = make_faqs(args.faqs)
+
+        start = time.perf_counter()
+        counts = writer.sync(faq_texts(faqs))
+        full_seconds = time.perf_counter() - start
+        assert counts == {"encoded": args.faqs, "unchanged": 0, "deleted": 0}
+        assert writer.sync(faq_texts(faqs))["encoded"] == 0, "an unchanged sync encodes nothing"
+
+        reader = FAQIndex(index_dir, encode=encoder, read_only=True)
+        assert len(reader) == args.faqs
+
+        # One edit encodes one record and is searchable in the reader process on its next refresh
+        edit_ms = []
+        for i in range(args.edits):
+            faq = faqs[i]
+            faq["answer"] = f"Updated answer {i}."
+            before = encoder.encoded
+            start = time.perf_counter()
+            assert writer.upsert(faq["id"], faq_text(faq))
+            reader.refresh()
+            edit_ms.append((time.perf_counter() - start) * 1000)
+            assert encoder.encoded - before == 1, "only the edited record is encoded"
+            assert top_text(reader, encoder, faq_text(faq)) == faq_text(faq)
+        assert not writer.upsert(faqs[0]["id"], faq_text(faqs[0])), "re-saving an unchanged record is a no-op"
+        print(f"full rebuild of {args.faqs} FAQs: {full_seconds * 1000:.0f} ms; "
+              f"single edit visible to readers: median {statistics.median(edit_ms):.1f} ms, max {max(edit_ms):.1f} ms")
+
+        # Deleted records disappear from search right away and stay as tombstones until compaction
+        removed = faqs.pop()
+        assert writer.delete(removed["id"])
+        reader.refresh()
+        assert top_text(reader, encoder, faq_text(removed)) != faq_text(removed)
+        assert len(reader) == len(faqs) and reader.stats()["tombstones"] > 0
+
+        # Compaction drops tombstones into a new generation; readers follow it
+        generation = writer.stats()["generation"]
+        writer.compact()
+        assert writer.stats()["tombstones"] == 0 and writer.stats()["generation"] == generation + 1
+        assert sorted(os.listdir(index_dir)) == sorted(["manifest.json", f"base.{generation + 1}.pt", f"log.{generation + 1}.jsonl"])
+        reader.refresh()
+        assert reader.texts() == writer.texts() == faq_texts(faqs)
+        print(f"compacted to generation {generation + 1}: {len(writer)} records, no tombstones")
+
+        # Background compaction while edits and searches keep going
+        background = FAQIndex(index_dir, encode=encoder)
+        stop = threading.Event()
+        misses = []
+
+        def search_loop():
+            while not stop.is_set():
+                reader.refresh()
+                if top_text(reader, encoder, faq_text(faqs[-1])) != faq_text(faqs[-1]):
+                    misses.append(1)
+
+        searcher = threading.Thread(target=search_loop)
+        searcher.start()
+        for round_ in range(3):
+            for faq in faqs[:args.edits]:
+                faq["answer"] = f"Round {round_} answer for {faq['question']}"
+                background.upsert(faq["id"], faq_text(faq))
+        while background.stats()["compacting"]:
+            time.sleep(0.01)
+        stop.set()
+        searcher.join()
+        reader.refresh()
+        assert not misses, "searches keep finding untouched records during compaction"
+        assert background.stats()["generation"] > generation + 1, "tombstones triggered a background compaction"
+        assert reader.texts() == background.texts() == faq_texts(faqs)
+
+        # A fresh process sees the same records
+        assert FAQIndex(index_dir, encode=encoder, read_only=True).texts() == faq_texts(faqs)
+        print(f"background compaction reached generation {background.stats()['generation']} with searches running")
+    finally:
+        shutil.rmtree(index_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.faq_records import faq_texts, load_all_faqs, load_faq_records
+
+def main():
+    data_dir = tempfile.mkdtemp(prefix="faq_records_")
+    try:
+        autogen_file = os.path.join(data_dir, "faq_autogen_responses.json")
+        manual_file = os.path.join(data_dir, "faq_manual_responses.json")
+
+        # Nothing published yet
+        assert load_all_faqs(autogen_file, manual_file) == []
+
+        # Files written before records had IDs, like the shipped data/faq_autogen_responses.json
+        with open(autogen_file, "w", encoding="utf-8") as file:
+            json.dump([{"question": f"Question {i}?", "answer": f"Answer {i}.", "metadata": []} for i in range(3)], file)
+        with open(manual_file, "w", encoding="utf-8") as file:
+            json.dump([{"id": "manual-1", "question": "Parking?", "answer": "Behind the building.", "metadata": []}], file)
+
+        faqs = load_all_faqs(autogen_file, manual_file)
+        assert [faq["question"] for faq in faqs] == ["Question 0?", "Question 1?", "Question 2?", "Parking?"]
+        assert all(faq.get("id") for faq in faqs), "every record has an ID after loading"
+        assert faqs[-1]["id"] == "manual-1", "existing IDs are kept"
+        assert len({faq["id"] for faq in faqs}) == len(faqs)
+
+        # The IDs are saved, so they stay the same on the next load (and in the FAQ index)
+        assert load_all_faqs(autogen_file, manual_file) == faqs
+        assert [faq["id"] for faq in load_faq_records(autogen_file)] == [faq["id"] for faq in faqs[:3]]
+        assert len(faq_texts(faqs)) == len(faqs)
+        print(f"{len(faqs)} records loaded with stable IDs")
+    finally:
+        shutil.rmtree(data_dir)
+
+if __name__ == "__main__":
+    main()
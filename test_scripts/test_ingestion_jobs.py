@@ -0,0 +1,147 @@
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src import ingestion_jobs
+from src.ingestion_jobs import (
+    DONE, FAILED, QUEUED, RUNNING, JobRunner, JobStore, append_jsonl, read_jsonl, tenant_data_dir
+)
+
+PAGES = 6
+STEP_SECONDS = 0.05
+
+class StandInStages:
+    """Checkpointing stand-ins for scrape -> embed -> publish that count the work they actually do"""
+
+    def __init__(self, fail_tenant=None, fail_at_page=None):
+        self.fail_tenant = fail_tenant
+        self.fail_at_page = fail_at_page
+        self.fetched = []
+        self.embedded = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def scrape(self, job, progress):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            done = {record["page"] for record in read_jsonl(job.path("pages.jsonl"))}
+            progress(pages_total=PAGES, pages_fetched=len(done))
+            for page in range(PAGES):
+                if page in done:
+                    continue
+                if job.tenant == self.fail_tenant and page == self.fail_at_page:
+                    self.fail_tenant = None
+                    raise ConnectionError(f"page {page} timed out")
+                time.sleep(STEP_SECONDS)
+                self.fetched.append((job.tenant, page))
+                append_jsonl(job.path("pages.jsonl"), {"page": page})
+                done.add(page)
+                progress(pages_fetched=len(done))
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def embed(self, job, progress):
+        self.embedded += 1
+        progress(chunks_embedded=PAGES * 3)
+
+    def publish(self, job, progress):
+        os.makedirs(job.data_dir, exist_ok=True)
+        with open(os.path.join(job.data_dir, "published.txt"), "w", encoding="utf-8") as file:
+            file.write(job.job_id)
+
+    def stages(self):
+        return [("scrape", self.scrape), ("embed", self.embed), ("publish", self.publish)]
+
+def main():
+    jobs_dir = tempfile.mkdtemp(prefix="ingestion_jobs_")
+    stage_names = ["scrape", "embed", "publish"]
+    try:
+        store = JobStore(os.path.join(jobs_dir, "jobs"))
+        stand_in = StandInStages(fail_tenant="clinic_a", fail_at_page=3)
+        runner = JobRunner(store, stand_in.stages(), concurrency=2)
+
+        first = store.submit("clinic_a", "https://a.example", "dental_clinic", stage_names,
+                             data_dir=os.path.join(jobs_dir, "clinic_a"))
+        assert store.submit("clinic_a", "https://a.example", "dental_clinic", stage_names).job_id == first.job_id, \
+            "a tenant has one active onboarding at a time"
+        second = store.submit("clinic_b", "https://b.example", "veterinary_clinic", stage_names,
+                              data_dir=os.path.join(jobs_dir, "clinic_b"))
+
+        # Progress is readable from another store (the UI process) while the jobs run
+        start = time.perf_counter()
+        assert runner.run_pending() == 2
+        time.sleep(STEP_SECONDS * 2)
+        polled = JobStore(store.jobs_dir).load(second.job_id)
+        assert polled.status == RUNNING and polled.stages["scrape"]["progress"].get("pages_total") == PAGES
+        runner.wait()
+        elapsed = time.perf_counter() - start
+        assert stand_in.max_running == 2, "two tenants onboard in parallel"
+        print(f"Two tenants scraped side by side, {elapsed * 1000:.0f} ms in total")
+
+        failed = store.load(first.job_id)
+        assert failed.status == FAILED and failed.stages["scrape"]["status"] == FAILED
+        assert "page 3 timed out" in failed.error
+        assert failed.stages["scrape"]["progress"]["pages_fetched"] == 3
+        assert store.load(second.job_id).status == DONE
+        print(f"clinic_a failed: {failed.error}")
+
+        # Retrying resumes the failed stage from its checkpoint and runs the rest once
+        store.retry(first.job_id)
+        assert store.load(first.job_id).status == QUEUED
+        runner.run_pending()
+        runner.wait()
+        resumed = store.load(first.job_id)
+        assert resumed.status == DONE and resumed.attempts == 2
+        pages_a = [page for tenant, page in stand_in.fetched if tenant == "clinic_a"]
+        assert pages_a == list(range(PAGES)), f"every page fetched exactly once, got {pages_a}"
+        assert stand_in.embedded == 2, "one embed per job"
+        with open(os.path.join(jobs_dir, "clinic_a", "published.txt"), encoding="utf-8") as file:
+            assert file.read() == first.job_id
+        print(f"clinic_a resumed at page 3 and finished on attempt {resumed.attempts}")
+
+        # A running job whose worker died is taken over once its heartbeat is stale
+        third = store.submit("clinic_c", "https://c.example", "dental_clinic", stage_names,
+                             data_dir=os.path.join(jobs_dir, "clinic_c"))
+        assert store.claim(third) is not None
+        store.save(third, lambda: setattr(third, "status", RUNNING))
+        assert runner.run_pending() == 0, "a live claim is respected"
+        store.save(third)
+        saved_stale = ingestion_jobs.JOB_STALE_SECONDS
+        ingestion_jobs.JOB_STALE_SECONDS = 0.0
+        try:
+            time.sleep(0.01)
+            assert runner.run_pending() == 1
+            runner.wait()
+        finally:
+            ingestion_jobs.JOB_STALE_SECONDS = saved_stale
+        assert store.load(third.job_id).status == DONE
+        print("clinic_c taken over from a dead worker and finished")
+
+        # Tenant names become directory names, so anything but a plain slug is refused
+        assert tenant_data_dir("clinic_a") == os.path.join(ingestion_jobs.TENANTS_DIR, "clinic_a")
+        for bad_tenant in ["../x", "..", "a/b", "/etc", "", "clinic a"]:
+            for attempt in (lambda: tenant_data_dir(bad_tenant),
+                            lambda: store.submit(bad_tenant, "https://x.example", "dental_clinic", stage_names)):
+                try:
+                    attempt()
+                except ValueError:
+                    continue
+                raise AssertionError(f"tenant {bad_tenant!r} was accepted")
+        assert len(store.list_jobs()) == 3, "no job was queued for an invalid tenant"
+        print("path-like tenant names rejected")
+    finally:
+        shutil.rmtree(jobs_dir)
+
+if __name__ == "__main__":
+    main()
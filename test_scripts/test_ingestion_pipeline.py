@@ -0,0 +1,114 @@
+import sys
+import os
+import argparse
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.ingestion_pipeline import PipelineStage, StagedPipeline, normalize_url
+
+# Stand-in costs per item in seconds
+FETCH_SECONDS = 0.08      # network round trip per page
+EXTRACT_SECONDS = 0.02    # HTML parsing (CPU)
+CHUNKS_PER_PAGE = 4
+EMBED_SECONDS_PER_BATCH = 0.05
+EMBED_SECONDS_PER_CHUNK = 0.004
+
+def fetch(page):
+    time.sleep(FETCH_SECONDS)
+    return [{"page": page, "html": f"<p>page {page}</p>"}]
+
+def extract(item):
+    """CPU-bound stand-in: runs in a pool process"""
+    deadline = time.perf_counter() + EXTRACT_SECONDS
+    while time.perf_counter() < deadline:
+        pass
+    return [{"page": item["page"], "text": item["html"][3:-4]}]
+
+def chunk(item):
+    return [{"page": item["page"], "part": part, "text": f"{item['text']} part {part}"} for part in range(CHUNKS_PER_PAGE)]
+
+def embed(batch):
+    time.sleep(EMBED_SECONDS_PER_BATCH + EMBED_SECONDS_PER_CHUNK * len(batch))
+    return [[(chunk["page"], chunk["part"]) for chunk in batch]]
+
+def build_stages(written, fetch_workers, extract_workers, queue_size):
+    return [
+        PipelineStage("fetch", fetch, workers=fetch_workers, queue_size=queue_size),
+        PipelineStage("extract", extract, workers=extract_workers, queue_size=queue_size, processes=True),
+        PipelineStage("chunk", chunk, queue_size=queue_size),
+        PipelineStage("embed", embed, queue_size=queue_size, batch_size=16, batch_wait=0.05),
+        PipelineStage("write", lambda keys: written.extend(keys) or [], queue_size=queue_size)
+    ]
+
+def phased(pages, fetch_workers, extract_workers, queue_size):
+    """Today's flow: every stage finishes over the whole site before the next one starts"""
+    written = []
+    items, total = list(range(pages)), 0.0
+    for stage in build_stages(written, fetch_workers, extract_workers, queue_size):
+        collected = []
+        collector = PipelineStage("collect", lambda item: collected.append(item) or [])
+        report = StagedPipeline([stage, collector]).run(items)
+        total += report.elapsed
+        items = collected
+    return total, written
+
+def main():
+    parser = argparse.ArgumentParser(description="Phased versus overlapped ingestion with stand-in stages")
+    parser.add_argument("--pages", type=int, default=80)
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--extract-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=8)
+    args = parser.parse_args()
+
+    assert normalize_url("https://a.example/about/#team") == normalize_url("https://a.example/about") == "https://a.example/about"
+
+    phased_seconds, phased_written = phased(args.pages, args.fetch_workers, args.extract_workers, args.queue_size)
+
+    written = []
+    pipeline = StagedPipeline(build_stages(written, args.fetch_workers, args.extract_workers, args.queue_size))
+    report = pipeline.run(range(args.pages))
+    print(report.format())
+
+    expected = sorted((page, part) for page in range(args.pages) for part in range(CHUNKS_PER_PAGE))
+    assert sorted(written) == sorted(phased_written) == expected, "every chunk of every page is written once"
+    for stats in report.stages:
+        assert stats.max_queue <= args.queue_size, f"{stats.name} queue exceeded its bound"
+
+    # Each stage's own busy time if it ran alone with its workers; the slowest bounds the pipeline
+    slowest = max(stats.busy_seconds / stats.workers for stats in report.stages)
+    print(f"\nphased {phased_seconds:.2f}s, overlapped {report.elapsed:.2f}s "
+          f"({report.elapsed / phased_seconds:.0%}), slowest stage {slowest:.2f}s ({report.bottleneck()})")
+    assert report.elapsed < 0.7 * phased_seconds, "overlapping stages should beat running them one after another"
+    assert report.elapsed < 1.5 * slowest + 0.5, "total time should approach the slowest stage"
+
+    # Backpressure: a slow writer holds the fetchers back instead of buffering the whole site
+    slow_written = []
+    stages = build_stages(slow_written, args.fetch_workers, args.extract_workers, 2)
+    stages[-1] = PipelineStage("write", lambda keys: time.sleep(0.05) or slow_written.extend(keys) or [], queue_size=2)
+    slow = StagedPipeline(stages).run(range(24))
+    assert all(stats.max_queue <= 2 for stats in slow.stages)
+    assert slow.stages[0].blocked_seconds > 0, "fetch waits for room downstream"
+    print(f"slow writer: fetch blocked {slow.stages[0].blocked_seconds:.2f}s, queues never above 2")
+
+    # A failing page is skipped when the stage allows it; otherwise the whole run stops and raises
+    def flaky(page):
+        if page == 3:
+            raise ConnectionError("timed out")
+        return [page]
+    kept = []
+    report = StagedPipeline([PipelineStage("fetch", flaky, workers=2, skip_errors=True),
+                             PipelineStage("write", lambda page: kept.append(page) or [])]).run(range(6))
+    assert sorted(kept) == [0, 1, 2, 4, 5] and report.stages[0].errors == 1
+    try:
+        StagedPipeline([PipelineStage("fetch", flaky, workers=2),
+                        PipelineStage("write", lambda page: [])]).run(range(100))
+        raise AssertionError("the error should propagate")
+    except ConnectionError:
+        pass
+    print("errors: skipped with skip_errors, otherwise the run stops and raises")
+
+if __name__ == "__main__":
+    main()
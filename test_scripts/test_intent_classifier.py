@@ -0,0 +1,88 @@
+import sys
+import os
+import re
+import shutil
+import tempfile
+import zlib
+
+import torch
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.conversation_flows import ConversationManager, default_flow
+from src.intent_classifier import EmbeddingIntentClassifier
+
+DIMENSIONS = 256
+
+class BagOfWordsEncoder:
+    """Deterministic stand-in embeddings (hashed word counts) that count how many texts were encoded"""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def __call__(self, texts):
+        self.encoded += len(texts)
+        vectors = torch.zeros(len(texts), DIMENSIONS)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(word.encode("utf-8")) % DIMENSIONS] += 1.0
+        return vectors
+
+class CountingClassifier(EmbeddingIntentClassifier):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def classify(self, query_embedding):
+        self.calls += 1
+        return super().classify(query_embedding)
+
+def main():
+    cache_dir = tempfile.mkdtemp(prefix="intent_classifier_")
+    try:
+        cache_file = os.path.join(cache_dir, "intent_centroids.pt")
+        encoder = BagOfWordsEncoder()
+        classifier = CountingClassifier(default_flow, encode=encoder, cache_file=cache_file)
+        manager = ConversationManager(intent_classifier=classifier)
+
+        # Keyword matches never consult the classifier
+        result = manager.process_message("What hours are you open?", encoder(["What hours are you open?"])[0])
+        assert result["intent"] == "business_hours" and classifier.calls == 0
+
+        # A paraphrase without keywords is classified by its embedding
+        paraphrase = "Is there parking nearby?"
+        embedding = encoder([paraphrase])[0]
+        intent, similarity = classifier.classify(embedding)
+        assert intent == "location" and similarity >= manager.confidence_threshold, (intent, similarity)
+
+        # The similarity threshold decides between the classifier's intent and the fallback
+        classifier.threshold = similarity
+        result = manager.process_message(paraphrase, embedding)
+        assert result["intent"] == "location" and result["confidence"] == similarity, "at the threshold is accepted"
+        classifier.threshold = similarity + 0.01
+        result = manager.process_message(paraphrase, embedding)
+        assert result["intent"] == "fallback" and result["response"] in default_flow.fallback_responses
+        assert manager.process_message(paraphrase)["intent"] == "fallback", "no embedding, no classifier"
+        print(f"'{paraphrase}' -> location at similarity {similarity:.2f}, fallback above it")
+
+        # Centroids are cached on disk and rebuilt only when the flow changes
+        encoded = encoder.encoded
+        cached = EmbeddingIntentClassifier(default_flow, encode=encoder, cache_file=cache_file)
+        assert cached.classify(embedding) == (intent, similarity)
+        assert encoder.encoded == encoded, "cached centroids are not re-encoded"
+        default_flow.intents["location"].examples.append("Which floor is the office on?")
+        default_flow.invalidate()
+        try:
+            cached.classify(embedding)
+            assert encoder.encoded > encoded, "a changed flow rebuilds the centroids"
+        finally:
+            default_flow.intents["location"].examples.pop()
+            default_flow.invalidate()
+        print("centroids cached per flow fingerprint")
+    finally:
+        shutil.rmtree(cache_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import sys
+import os
+import random
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.conversation_flows import ConversationFlow, Intent, default_flow
+from src.intent_matcher import IntentMatcher
+
+FLOW_SIZES = [5, 500, 5000]
+QUERIES = 2000
+# Small flows are scanned linearly and still check word boundaries, which the substring loop skips;
+# they may cost a little more than it, but never the ~4x the automaton alone did at this size
+SMALL_FLOW_MAX_SLOWDOWN = 2.5
+
+DEFAULT_FLOW_QUERIES = [
+    "hi, I'd like to book an appointment for tomorrow at 3pm", "where are you located?",
+    "what are your opening hours on saturday", "can I cancel my appointment", "thanks, bye",
+    "do you take insurance for cleaning"
+]
+
+def substring_analyze_intent(flow, user_input):
+    """The original nested-loop matcher, kept here as the benchmark baseline"""
+    user_input = user_input.lower()
+    max_score = 0
+    detected_intent = "fallback"
+    for intent_name, intent in flow.intents.items():
+        score = 0
+        for keyword in intent.keywords:
+            if keyword in user_input:
+                score += 1
+        if intent.conditions:
+            for condition in intent.conditions:
+                if condition.lower() in user_input:
+                    score += 0.5
+        score = score / (len(intent.keywords) + (len(intent.conditions or [])) * 0.5)
+        if score > max_score:
+            max_score = score
+            detected_intent = intent_name
+    return detected_intent, max_score
+
+def build_flow(size, rng):
+    vocabulary = [f"term{i}" for i in range(size * 3)]
+    intents = {}
+    for i in range(size):
+        keywords = rng.sample(vocabulary, 5)
+        intents[f"intent_{i}"] = Intent(
+            name=f"intent_{i}",
+            keywords=keywords + [f"{keywords[0]} {keywords[1]}"],
+            responses=["ok"],
+            conditions=[f"urgent{i}"]
+        )
+    return ConversationFlow(intents=intents, fallback_responses=["sorry"]), vocabulary
+
+def check_word_boundaries():
+    for text, expected in [("this is which one", "fallback"), ("hi there", "greeting"), ("where are you?", "location")]:
+        intent, _ = default_flow.analyze_intent(text)
+        print(f"'{text}' -> {intent} ({'ok' if intent == expected else 'expected ' + expected})")
+        assert intent == expected
+
+def check_scan_modes_agree(flow, queries):
+    """The per-phrase scan and the automaton give identical scores"""
+    linear = IntentMatcher(flow.intents, linear_scan=True)
+    automaton = IntentMatcher(flow.intents, linear_scan=False)
+    for query in queries:
+        assert linear.scores(query) == automaton.scores(query), query
+
+def time_per_query(analyze, queries, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            analyze(query)
+    return (time.perf_counter() - start) / (len(queries) * repeat) * 1e6
+
+def check_default_flow_cost():
+    """The flow the app ships with, on realistic turns"""
+    queries = DEFAULT_FLOW_QUERIES * 100
+    baseline_us = time_per_query(lambda query: substring_analyze_intent(default_flow, query), queries)
+    compiled_us = time_per_query(default_flow.analyze_intent, queries)
+    mode = "linear scan" if default_flow.compile().linear_scan else "automaton"
+    print(f"default flow: substring loop {baseline_us:.1f} us/query, matcher {compiled_us:.1f} us/query ({mode})")
+    assert default_flow.compile().linear_scan, "the shipped flow is small enough for the linear scan"
+    assert compiled_us < SMALL_FLOW_MAX_SLOWDOWN * baseline_us
+
+def main():
+    check_word_boundaries()
+    rng = random.Random(7)
+    check_scan_modes_agree(default_flow, DEFAULT_FLOW_QUERIES + ["thisthat hello-there", "", "which is it"])
+    check_default_flow_cost()
+
+    print(f"\n{'intents':>8} {'compile ms':>11} {'baseline us/query':>18} {'compiled us/query':>18} {'speedup':>8}  mode")
+    for size in FLOW_SIZES:
+        flow, vocabulary = build_flow(size, rng)
+        queries = [
+            " ".join(rng.choice(vocabulary + ["please", "can", "i", "the", "tomorrow"]) for _ in range(12))
+            for _ in range(QUERIES)
+        ]
+
+        start = time.perf_counter()
+        flow.compile()
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        baseline_queries = queries[:max(20, QUERIES * 5 // size)]
+        start = time.perf_counter()
+        for query in baseline_queries:
+            substring_analyze_intent(flow, query)
+        baseline_us = (time.perf_counter() - start) / len(baseline_queries) * 1e6
+
+        start = time.perf_counter()
+        for query in queries:
+            flow.analyze_intent(query)
+        compiled_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        check_scan_modes_agree(flow, baseline_queries[:200])
+        mode = "linear scan" if flow.compile().linear_scan else "automaton"
+        mismatches = sum(
+            1 for query in baseline_queries
+            if substring_analyze_intent(flow, query) != flow.analyze_intent(query)
+        )
+        print(f"{size:>8} {compile_ms:>11.1f} {baseline_us:>18.1f} {compiled_us:>18.1f} {baseline_us / compiled_us:>7.1f}x"
+              f"  {mode} ({mismatches} differ: baseline matched inside longer words)")
+        # Small flows must not pay for the automaton; large ones must gain from it
+        if size <= 10:
+            assert compiled_us < SMALL_FLOW_MAX_SLOWDOWN * baseline_us, "small flows should stay close to the substring loop"
+        else:
+            assert compiled_us < baseline_us, "large flows should beat the substring loop"
+
+if __name__ == "__main__":
+    main()
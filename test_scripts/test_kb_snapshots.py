@@ -0,0 +1,148 @@
+import sys
+import os
+import argparse
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.kb_snapshots import SnapshotFile, SnapshotStore
+
+def write_build(build_dir, version_label, rows):
+    """Stand-in build outputs: 'vectors' and FAQ records large enough that a torn read would show"""
+    os.makedirs(build_dir, exist_ok=True)
+    vectors = os.path.join(build_dir, "faq_responses_embeddings.pt")
+    with open(vectors, "w", encoding="utf-8") as file:
+        json.dump({"label": version_label, "texts": [f"{version_label} text {i}" for i in range(rows)],
+                   "embeddings": [[i / rows] * 64 for i in range(rows)]}, file)
+    records = os.path.join(build_dir, "faq_autogen_responses.json")
+    with open(records, "w", encoding="utf-8") as file:
+        json.dump([{"id": str(i), "question": f"{version_label} q{i}", "answer": "a"} for i in range(rows)], file)
+    return {"faq_responses_embeddings.pt": vectors, "faq_autogen_responses.json": records}
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned knowledge-base snapshots with atomic hot swap")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--rebuilds", type=int, default=5)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="kb_snapshots_")
+    try:
+        store = SnapshotStore(os.path.join(root, "kb"))
+        web_file = os.path.join(root, "web_scraped_data_embeddings.pt")
+        with open(web_file, "w", encoding="utf-8") as file:
+            json.dump({"texts": ["site chunk"], "embeddings": [[1.0]]}, file)
+        files = write_build(os.path.join(root, "build0"), "v0", args.rows)
+        files["web_scraped_data_embeddings.pt"] = web_file
+        first = store.build_and_publish(files, source="test")
+        assert store.verify(first) == []
+
+        reader = SnapshotFile(store, "faq_responses_embeddings.pt", load_json)
+        assert reader.get()["label"] == "v0" and reader.version == first
+
+        # Requests keep being served from complete versions while rebuilds publish new ones
+        stop = threading.Event()
+        served, errors = [], []
+
+        def serve():
+            while not stop.is_set():
+                try:
+                    data = reader.get()
+                    assert data is not None and len(data["texts"]) == args.rows == len(data["embeddings"])
+                    assert all(text.startswith(data["label"]) for text in data["texts"][::100])
+                    served.append(data["label"])
+                except Exception as e:
+                    errors.append(repr(e))
+
+        threads = [threading.Thread(target=serve) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        publish_ms = []
+        for n in range(1, args.rebuilds + 1):
+            build = write_build(os.path.join(root, f"build{n}"), f"v{n}", args.rows)
+            start = time.perf_counter()
+            store.build_and_publish(build, source="test")
+            publish_ms.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.05)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors[:3]
+        labels = sorted(set(served), key=lambda label: int(label[1:]))
+        assert labels[-1] == f"v{args.rebuilds}", "readers moved to the last version without a restart"
+        print(f"{len(served)} requests served across {len(labels)} versions, none failed or torn; "
+              f"build+publish {max(publish_ms):.0f} ms at most")
+
+        # Unchanged files are carried over by hard link, not copied
+        current = store.current_version()
+        previous = store.manifest(current)["parent"]
+        assert os.path.samefile(store.path(previous, "web_scraped_data_embeddings.pt"),
+                                store.path(current, "web_scraped_data_embeddings.pt"))
+
+        # Old versions are garbage-collected; the current one and a few for rollback remain
+        assert len(store.versions()) == 3 and current in store.versions()
+        assert not any(name.startswith(".build-") for name in os.listdir(store.kb_dir))
+
+        # A version that fails its checksum is not served; the previous one stays live
+        bad = store.build(write_build(os.path.join(root, "bad"), "bad", args.rows), source="test")
+        with open(store.path(bad, "faq_responses_embeddings.pt"), "r+", encoding="utf-8") as file:
+            file.write("[")
+        store.publish(bad)
+        assert reader.get()["label"] == f"v{args.rebuilds}" and reader.version == current
+        print(f"corrupt version {bad} rejected, still serving {reader.version}")
+
+        # Rollback is a pointer swap
+        assert store.rollback() == current
+        assert store.rollback() != current
+        assert reader.get()["label"] == f"v{args.rebuilds - 1}"
+        print(f"rolled back to {reader.version}")
+
+        # A flat file written after the current version is reported once, until it or the version changes
+        legacy_file = os.path.join(root, "faq_responses_embeddings.pt")
+        with open(legacy_file, "w", encoding="utf-8") as file:
+            json.dump({"label": "legacy"}, file)
+        created_at = store.manifest(store.current_version())["created_at"]
+        os.utime(legacy_file, (created_at - 60, created_at - 60))
+        assert not reader.warn_if_shadowed(legacy_file), "an older flat file is not reported"
+        os.utime(legacy_file, (created_at + 60, created_at + 60))
+        assert reader.warn_if_shadowed(legacy_file)
+        assert not reader.warn_if_shadowed(legacy_file), "reported once"
+        os.utime(legacy_file, (time.time() - 1, time.time() - 1))
+        store.build_and_publish({"faq_responses_embeddings.pt": legacy_file}, source="test")
+        assert not reader.warn_if_shadowed(legacy_file), "published, so served"
+        assert reader.get()["label"] == "legacy"
+
+        # Concurrent publishers (one store each, as separate processes would have) keep each other's files
+        publishers = 4
+
+        def publish_own_file(number):
+            own_store = SnapshotStore(store.kb_dir)
+            path = os.path.join(root, f"publisher_{number}.json")
+            for round_number in range(5):
+                with open(path, "w", encoding="utf-8") as file:
+                    json.dump({"publisher": number, "round": round_number}, file)
+                own_store.build_and_publish({f"publisher_{number}.json": path}, source="test")
+
+        threads = [threading.Thread(target=publish_own_file, args=(number,)) for number in range(publishers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        current = store.current_version()
+        assert all(f"publisher_{number}.json" in store.manifest(current)["files"] for number in range(publishers))
+        assert store.verify(current) == []
+        print(f"{publishers} concurrent publishers: every file in the current version")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
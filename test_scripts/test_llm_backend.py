@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.llm_backend import OpenAIBackend
+from src.llm_service import LLMService
+from src.local_llm_server import StandInConfig, start_stand_in_server
+
+REQUESTS = 200
+CONCURRENCY = 20
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def main():
+    # Start the stand-in with a lognormal latency tail and 1% injected errors
+    config = StandInConfig(latency_ms=150, distribution="lognormal", spread=0.6,
+                           tokens_per_second=200, response_tokens=30, error_rate=0.01, seed=42)
+    server = start_stand_in_server(config)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    print(f"Stand-in server running at {base_url}")
+
+    llm_service = LLMService(backend=OpenAIBackend(base_url=base_url, max_retries=0))
+    conversation_result = {"intent": "appointment", "confidence": 0.5, "response": "When would you like to come in?"}
+
+    def run_turn(i):
+        start = time.monotonic()
+        try:
+            llm_service.generate_llm_response(f"Can I book an appointment? (caller {i})", conversation_result, [])
+            ok = True
+        except Exception:
+            ok = False
+        return time.monotonic() - start, ok
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(run_turn, range(REQUESTS)))
+    elapsed = time.monotonic() - start
+
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    print(f"Requests: {REQUESTS}, concurrency: {CONCURRENCY}, errors: {errors}")
+    print(f"Throughput: {REQUESTS / elapsed:.1f} req/s")
+    for pct in (50, 95, 99):
+        print(f"p{pct}: {percentile(latencies, pct) * 1000:.0f} ms")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import sys
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.llm_backend import LLMBackend
+from src.llm_service import LLMService, llm_inflight
+from src.singleflight import SingleFlight
+
+BACKEND_SECONDS = 0.3  # slow enough that the second caller arrives while the first call is in flight
+
+class CountingBackend(LLMBackend):
+    """Stand-in backend that counts chat calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def chat(self, messages, model, temperature=0.7):
+        with self._lock:
+            self.calls += 1
+        time.sleep(BACKEND_SECONDS)
+        return "We are open 9 to 5, Monday to Friday."
+
+def ask_concurrently(llm_service, turns):
+    """Run generate_llm_response for each (user_input, conversation_result, history, time) at once"""
+    replies = [None] * len(turns)
+
+    def run(i, user_input, conversation_result, history, current_time):
+        replies[i] = llm_service.generate_llm_response(
+            user_input, conversation_result, history, current_time,
+            relevant_information=["Hours: 9 to 5, Monday to Friday."]
+        )
+
+    threads = [threading.Thread(target=run, args=(i, *turn)) for i, turn in enumerate(turns)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return replies
+
+def check_waiter_count():
+    """waiters counts the callers blocked on a call, and drops back to zero once they return"""
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("key", release.wait))
+    leader.start()
+    while flight.in_flight() == 0:
+        time.sleep(0.001)
+    call = flight._calls["key"]
+    waiters = [threading.Thread(target=flight.do, args=("key", release.wait)) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    while call.waiters < 3:
+        time.sleep(0.001)
+    try:
+        flight.do("key", release.wait, timeout=0.01)
+    except TimeoutError:
+        pass
+    assert call.waiters == 3, "a waiter that timed out is no longer counted"
+    release.set()
+    for thread in [leader, *waiters]:
+        thread.join()
+    assert call.waiters == 0 and flight.stats["coalesced"] == 4 and flight.stats["timeouts"] == 1
+    print("waiter count back to zero after the call completes")
+
+def main():
+    backend = CountingBackend()
+    llm_service = LLMService(backend=backend)
+
+    # Two callers ask the same question within the same minute. The prompts differ in the seconds
+    # and in the randomly picked rule-based template, but the question is the same.
+    first = {"intent": "hours", "confidence": 0.9, "response": "We're open 9-5 on weekdays."}
+    second = {"intent": "hours", "confidence": 0.9, "response": "Our hours are 9 to 5, Monday to Friday."}
+    coalesced = llm_inflight.stats["coalesced"]
+    replies = ask_concurrently(llm_service, [
+        ("What are your hours?", first, [], datetime(2026, 1, 5, 10, 30, 12, tzinfo=pytz.UTC)),
+        ("what are your hours", second, [], datetime(2026, 1, 5, 10, 30, 41, tzinfo=pytz.UTC)),
+    ])
+    assert backend.calls == 1, f"identical concurrent questions made {backend.calls} backend calls"
+    assert llm_inflight.stats["coalesced"] == coalesced + 1
+    assert replies[0] == replies[1]
+    print("two concurrent identical questions: 1 backend call")
+
+    # Different questions, or the same question in a different conversation, are not merged
+    backend.calls = 0
+    history = [{"user": "Can I book for Monday?", "assistant": "Sure, what time?", "intent": "appointment"}]
+    ask_concurrently(llm_service, [
+        ("What are your hours?", first, [], datetime(2026, 1, 5, 10, 31, 5, tzinfo=pytz.UTC)),
+        ("Where are you located?", first, [], datetime(2026, 1, 5, 10, 31, 5, tzinfo=pytz.UTC)),
+        ("What are your hours?", first, history, datetime(2026, 1, 5, 10, 31, 5, tzinfo=pytz.UTC)),
+    ])
+    assert backend.calls == 3, f"distinct turns made {backend.calls} backend calls"
+    print("distinct questions and conversations: 3 backend calls")
+
+    check_waiter_count()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.session_cache import CachedSessionStore
+from src.session_store import FileSessionStore
+
+TURNS = 50
+
+# Appends turns through a cache that would not flush for a minute, then exits normally
+EXITING_WRITER = """
+import sys
+sys.path.append({root!r})
+from src.session_cache import CachedSessionStore
+from src.session_store import FileSessionStore
+store = CachedSessionStore(FileSessionStore({directory!r}), flush_delay=60)
+for i in range({turns}):
+    store.append("session_exit", {{"turn": i}})
+"""
+
+class FlakyStore(FileSessionStore):
+    """File store whose first batch write fails"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.failures = 1
+
+    def append_many(self, turns):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk unavailable")
+        super().append_many(turns)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def main():
+    directory = tempfile.mkdtemp(prefix="session_cache_")
+    try:
+        # Turns are served from memory at once and reach the store only when flushed
+        backing = FileSessionStore(directory)
+        cache = CachedSessionStore(backing, flush_delay=60)
+        assert cache.load("session_a") == []
+        for i in range(TURNS):
+            cache.append("session_a", {"turn": i})
+        assert backing.load("session_a") == [], "nothing written before the flush delay"
+        assert cache.load("session_a", last_n=2) == [{"turn": TURNS - 2}, {"turn": TURNS - 1}]
+        assert cache.stats["hits"] == 1 and backing.load("session_a") == [], "served from memory"
+
+        # Shutdown flushes everything still pending
+        cache.close()
+        assert FileSessionStore(directory).load("session_a") == [{"turn": i} for i in range(TURNS)]
+        print(f"{TURNS} pending turns flushed on close()")
+
+        # ... including at interpreter exit, without an explicit close()
+        code = EXITING_WRITER.format(root=project_root, directory=directory, turns=TURNS)
+        subprocess.run([sys.executable, "-c", code], check=True)
+        assert FileSessionStore(directory).load("session_exit") == [{"turn": i} for i in range(TURNS)]
+        print(f"{TURNS} pending turns flushed at interpreter exit")
+
+        # The background writer flushes after flush_delay; a failed batch is retried, not lost
+        flaky = FlakyStore(directory)
+        cache = CachedSessionStore(flaky, flush_delay=0.05)
+        for i in range(TURNS):
+            cache.append("session_b", {"turn": i})
+        wait_for(lambda: cache.stats["flush_errors"] == 1)
+        wait_for(lambda: cache.stats["flushed_turns"] == TURNS)
+        assert FileSessionStore(directory).load("session_b") == [{"turn": i} for i in range(TURNS)]
+        cache.close()
+        print("background flush retried after a failed batch, no turn lost or duplicated")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
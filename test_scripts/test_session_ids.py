@@ -0,0 +1,78 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.session_ids import new_session_id, session_created_at
+from src.session_store import FileSessionStore
+
+TOTAL_SESSIONS = 100_000
+PROCESSES = 4
+THREADS_PER_PROCESS = 8
+
+def create_sessions(args):
+    """Create sessions from several threads of one worker process; returns their IDs"""
+    directory, count = args
+    store = FileSessionStore(directory, fsync_policy="never")
+
+    def create(_):
+        session_id = new_session_id()
+        store.append(session_id, {"user": "Hello", "assistant": "Hi, how can I help?"})
+        return session_id
+
+    with ThreadPoolExecutor(max_workers=THREADS_PER_PROCESS) as executor:
+        return list(executor.map(create, range(count), chunksize=256))
+
+def check_migration(directory):
+    """Flat and legacy files from the old layout are found and moved into their shard"""
+    legacy_id, flat_id = "session_20250101_093000", "session_20250101_093001"
+    with open(os.path.join(directory, f"{legacy_id}.json"), "w", encoding="utf-8") as file:
+        file.write('[{"user": "Hi", "assistant": "Hello"}]')
+    with open(os.path.join(directory, f"{flat_id}.jsonl"), "w", encoding="utf-8") as file:
+        file.write('{"user": "Hi", "assistant": "Hello"}\n')
+
+    store = FileSessionStore(directory, fsync_policy="never")
+    assert store.exists(legacy_id) and store.exists(flat_id)
+    assert store.load(flat_id) == [{"user": "Hi", "assistant": "Hello"}]
+    assert store.log.migrate_layout() == 1
+    assert store.load(legacy_id, last_n=1) == [{"user": "Hi", "assistant": "Hello"}]
+    assert not any(name.endswith((".json", ".jsonl")) for name in os.listdir(directory))
+    assert session_created_at(legacy_id).minute == 30
+    print("Migration of flat and legacy sessions: OK")
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        directory = os.path.join(workdir, "sessions")
+        per_process = TOTAL_SESSIONS // PROCESSES
+        start = time.perf_counter()
+        with Pool(PROCESSES) as pool:
+            results = pool.map(create_sessions, [(directory, per_process)] * PROCESSES)
+        elapsed = time.perf_counter() - start
+
+        session_ids = [session_id for ids in results for session_id in ids]
+        files = sum(len(names) for _, _, names in os.walk(directory))
+        shards = len(os.listdir(directory))
+        print(f"Created {len(session_ids)} sessions in {elapsed:.1f}s "
+              f"({PROCESSES} processes x {THREADS_PER_PROCESS} threads)")
+        print(f"Unique IDs: {len(set(session_ids))}, files: {files}, shard directories: {shards}")
+        assert len(set(session_ids)) == TOTAL_SESSIONS, "session ID collision"
+        assert files == TOTAL_SESSIONS, "sessions shared a file"
+
+        assert all(session_created_at(session_id) for session_id in session_ids[:1000]), "unparseable session ID"
+
+        migration_dir = os.path.join(workdir, "migration")
+        os.makedirs(migration_dir)
+        check_migration(migration_dir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import sys
+import os
+import json
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.session_log import FSYNC_NEVER, SessionLog
+
+SESSION_ID = "session_crash"
+MIN_TURNS_BEFORE_KILL = 200
+
+# Appends numbered turns until it is killed
+WRITER = """
+import sys
+sys.path.append({root!r})
+from src.session_log import SessionLog
+log = SessionLog({directory!r}, fsync_policy="always")
+i = 0
+while True:
+    log.append({session_id!r}, {{"turn": i, "user": "x" * (i % 300)}})
+    if i == {announce}:
+        print("ready", flush=True)
+    i += 1
+"""
+
+def kill_writer_mid_run(directory):
+    """Start a process appending turns to one session and SIGKILL it while it is writing"""
+    code = WRITER.format(root=project_root, directory=directory, session_id=SESSION_ID, announce=MIN_TURNS_BEFORE_KILL)
+    writer = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+    assert writer.stdout.readline().strip() == "ready"
+    time.sleep(0.05)
+    writer.send_signal(signal.SIGKILL)
+    writer.wait()
+
+def main():
+    directory = tempfile.mkdtemp(prefix="session_log_")
+    try:
+        kill_writer_mid_run(directory)
+        log = SessionLog(directory, fsync_policy=FSYNC_NEVER)
+        turns = log.read_all(SESSION_ID)
+        assert len(turns) > MIN_TURNS_BEFORE_KILL
+        assert [turn["turn"] for turn in turns] == list(range(len(turns))), "no turn lost or reordered before the kill"
+        print(f"writer killed after {len(turns)} turns; all of them reload in order")
+
+        # A crash in the middle of a record leaves a torn last line, which reads skip
+        path = log.path(SESSION_ID)
+        with open(path, "ab") as file:
+            file.write(json.dumps({"turn": len(turns), "user": "cut short"}).encode("utf-8")[:20])
+        assert log.read_all(SESSION_ID) == turns
+        assert log.read_last(SESSION_ID, 3) == turns[-3:]
+
+        # The next append starts on a fresh line, so the torn record never swallows it
+        log.append(SESSION_ID, {"turn": len(turns), "user": "after the crash"})
+        reloaded = SessionLog(directory).read_all(SESSION_ID)
+        assert reloaded == turns + [{"turn": len(turns), "user": "after the crash"}]
+        assert SessionLog(directory).read_last(SESSION_ID, 2) == reloaded[-2:]
+        print("torn record skipped; appends after the crash reload cleanly")
+
+        # Legacy JSON array files are migrated on first touch
+        legacy = SessionLog(directory, sharded=False).legacy_path("session_legacy")
+        with open(legacy, "w", encoding="utf-8") as file:
+            json.dump([{"turn": 0}, {"turn": 1}], file)
+        assert log.read_last("session_legacy", 5) == [{"turn": 0}, {"turn": 1}]
+        assert not os.path.exists(legacy) and os.path.exists(log.path("session_legacy"))
+        print("legacy session migrated to the append-only layout")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import random
+import shutil
+import tempfile
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.session_store import FileSessionStore, SQLiteSessionStore
+
+# Pass --full to include the 1M session run (several GB of files for the file store)
+SESSION_COUNTS = [1_000, 100_000, 1_000_000] if "--full" in sys.argv else [1_000, 100_000]
+TURNS_PER_SESSION = 5
+SAMPLE_TURNS = 500
+BATCH_SIZE = 5_000
+
+def make_turn(i):
+    return {
+        "user": f"What time are you open on day {i % 7}?",
+        "assistant": "We're open from 9 AM to 5 PM, Monday through Friday.",
+        "intent": "business_hours",
+        "timestamp": f"2025-01-{1 + i % 28:02d}T10:00:00+00:00"
+    }
+
+def populate(store, count):
+    batch = []
+    for session in range(count):
+        for turn in range(TURNS_PER_SESSION):
+            batch.append((f"session_{session:07d}", make_turn(turn)))
+        if len(batch) >= BATCH_SIZE:
+            store.append_many(batch)
+            batch = []
+    store.append_many(batch)
+
+def measure_turns(store, count):
+    """A chat turn: read the last 5 turns of a session, then append one"""
+    rng = random.Random(1)
+    latencies = []
+    for i in range(SAMPLE_TURNS):
+        session_id = f"session_{rng.randrange(count):07d}"
+        start = time.perf_counter()
+        store.load(session_id, last_n=5)
+        store.append(session_id, make_turn(i))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], latencies[int(len(latencies) * 0.99)]
+
+def main():
+    print(f"{'store':>8} {'sessions':>10} {'populate s':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for count in SESSION_COUNTS:
+        for name in ("file", "sqlite"):
+            workdir = tempfile.mkdtemp()
+            try:
+                if name == "file":
+                    store = FileSessionStore(os.path.join(workdir, "sessions"), fsync_policy="never")
+                else:
+                    store = SQLiteSessionStore(os.path.join(workdir, "sessions.db"))
+                start = time.perf_counter()
+                populate(store, count)
+                populate_s = time.perf_counter() - start
+                p50, p95, p99 = measure_turns(store, count)
+                print(f"{name:>8} {count:>10} {populate_s:>11.1f} {p50 * 1000:>8.2f} {p95 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+                store.close()
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import sys
+import os
+import argparse
+import statistics
+import threading
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.speculation import EXACT, NEAR, Speculator, normalize_transcript, transcript_similarity
+from src.streaming_stt import StandInRecognizer
+
+RATE = 16000
+CHUNK = 1024
+
+UTTERANCES = [
+    "Hi, are you accepting new patients this month?",
+    "What time do you open on Saturday mornings?",
+    "I would like to book a cleaning for next Tuesday at three.",
+    "Do you take Delta Dental insurance, or should I bring a card?",
+    "Where can I park when I come in for my appointment?",
+]
+
+class StandInPreparation:
+    """Stands in for LLMService._prepare_context: history load, query encoding, search and intent"""
+
+    def __init__(self, prepare_ms):
+        self.prepare_ms = prepare_ms
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        time.sleep(self.prepare_ms / 1000)
+        return {"query": text}
+
+def speak(transcript, speculator, speed):
+    """Stream silent frames through the stand-in recognizer, speculating on the interims; returns the final transcript"""
+    recognizer = StandInRecognizer(transcript, sample_rate=RATE, sample_width=2)
+    on_result = (lambda result: None if result.is_final else speculator.submit(result.text)) if speculator else None
+    recognizer.start(on_result)
+    seconds = len(transcript.split()) / recognizer.words_per_second + 0.5
+    frame = b"\0\0" * CHUNK
+    for _ in range(int(seconds * RATE / CHUNK)):
+        recognizer.send(frame)
+        time.sleep(CHUNK / RATE / speed)
+    return recognizer.finish()
+
+def run_turn(transcript, prepare_ms, speed, speculative):
+    """Time from the final transcript to a prepared turn context"""
+    prepare = StandInPreparation(prepare_ms)
+    speculator = Speculator(prepare) if speculative else None
+    final = speak(transcript, speculator, speed)
+    start = time.perf_counter()
+    match = speculator.take(final) if speculator else None
+    context = match[1] if match and match[0] == EXACT else prepare(final)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert normalize_transcript(context["query"]) == normalize_transcript(final)
+    return elapsed, match[0] if match else None, speculator.stats if speculator else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn preparation hidden behind the caller's speech by speculating on interims")
+    parser.add_argument("--prepare-ms", type=float, default=250, help="Stand-in retrieval and intent analysis time")
+    parser.add_argument("--speed", type=float, default=2.0, help="Replay speed of the stand-in audio; 1 = real time")
+    args = parser.parse_args()
+
+    # Matching ignores case and punctuation; a changed word at the end is a near match
+    assert normalize_transcript("Are you open, on Saturday?") == "are you open on saturday"
+    assert transcript_similarity("are you open on saturday", "are you open on saturday") == 1.0
+    assert transcript_similarity("do you take delta dental insurance", "do you take delta dental insurance cards") >= 0.85
+    assert transcript_similarity("are you open", "where can i park") < 0.5
+
+    prepare = StandInPreparation(0)
+    speculator = Speculator(prepare)
+    for text in ("Hi", "hi are", "hi are you", "hi are you open", "Hi, are you open?"):
+        speculator.submit(text)
+    time.sleep(0.05)
+    assert "Hi" not in prepare.calls, "one-word interims are not prepared"
+    assert prepare.calls.count("hi are you open") <= 1 and "Hi, are you open?" not in prepare.calls, \
+        "an interim with the same words is prepared once"
+    assert speculator.take("Hi, are you open?")[0] == EXACT
+    speculator.submit("hi are you open today")
+    assert speculator.take("anything") is None and prepare.calls[-1] != "hi are you open today", \
+        "nothing is prepared after the turn ends"
+
+    speculator = Speculator(StandInPreparation(0))
+    speculator.submit("do you take delta dental insurance or should I bring")
+    time.sleep(0.05)
+    kind, context = speculator.take("Do you take Delta Dental insurance, or should I bring a card?")
+    assert kind == NEAR and context["query"].endswith("bring"), "retrieval on a near-identical interim is reused"
+
+    # A slow preparation still running for the final words is waited for, not restarted
+    speculator = Speculator(StandInPreparation(300))
+    speculator.submit("where can I park")
+    time.sleep(0.05)
+    start = time.perf_counter()
+    assert speculator.take("Where can I park?")[0] == EXACT
+    assert (time.perf_counter() - start) * 1000 < 300
+
+    print(f"{'utterance':<64} {'no speculation':>15} {'speculative':>12} {'match':>6} {'prepared':>9} {'superseded':>11}")
+    baseline, speculative = [], []
+    for transcript in UTTERANCES:
+        plain_ms, _, _ = run_turn(transcript, args.prepare_ms, args.speed, speculative=False)
+        spec_ms, kind, stats = run_turn(transcript, args.prepare_ms, args.speed, speculative=True)
+        baseline.append(plain_ms)
+        speculative.append(spec_ms)
+        print(f"{transcript:<64} {plain_ms:>12.0f} ms {spec_ms:>9.0f} ms {kind or '-':>6} "
+              f"{stats['started']:>9} {stats['superseded']:>11}")
+
+    print(f"\nFinal transcript -> turn context, median: {statistics.median(baseline):.0f} ms without speculation, "
+          f"{statistics.median(speculative):.0f} ms speculative")
+    assert statistics.median(speculative) < statistics.median(baseline) / 2
+
+    # Preparation runs on one thread: interims never pile up behind it
+    threads_before = threading.active_count()
+    speculator = Speculator(StandInPreparation(args.prepare_ms))
+    words = UTTERANCES[2].split()
+    for count in range(2, len(words) + 1):
+        speculator.submit(" ".join(words[:count]))
+    assert threading.active_count() <= threads_before + 1
+    speculator.cancel()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import sys
+import os
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+import wave
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.llm_backend import LLMBackend
+from src.speech_pipeline import SpeechPipeline, split_sentences
+
+REPLIES = [
+    "Thanks for calling! We're open from 9 a.m. to 5 p.m., Monday through Friday. "
+    "Dr. Patel has openings on Tuesday and Thursday afternoons. Would either of those work for you?",
+    "I can help with that. Our office is at 123 Business Street, Suite 100. "
+    "There is free parking behind the building. Is there anything else I can help you with today?",
+    "Of course. A cleaning appointment usually takes about forty five minutes. "
+    "Please arrive ten minutes early to fill in your paperwork. "
+    "If you need to cancel, let us know at least a day in advance. We look forward to seeing you!",
+]
+
+class StandInStreamingBackend(LLMBackend):
+    """Streams a fixed reply word by word after a first-token delay"""
+
+    def __init__(self, reply, first_token_ms, tokens_per_second):
+        self.reply = reply
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second
+
+    def chat(self, messages, model, temperature=0.7):
+        return "".join(self.stream_chat(messages, model, temperature))
+
+    def stream_chat(self, messages, model, temperature=0.7):
+        time.sleep(self.first_token_ms / 1000)
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(1 / self.tokens_per_second)
+            yield word if i == len(words) - 1 else word + " "
+
+class StandInTTS:
+    """Writes a silent WAV as long as the sentence takes to say, after a per-request latency"""
+
+    RATE = 16000
+
+    def __init__(self, output_dir, latency_ms, ms_per_char, chars_per_second):
+        self.output_dir = output_dir
+        self.latency_ms = latency_ms
+        self.ms_per_char = ms_per_char
+        self.chars_per_second = chars_per_second
+        self.count = 0
+
+    def __call__(self, text):
+        time.sleep((self.latency_ms + self.ms_per_char * len(text)) / 1000)
+        self.count += 1
+        path = os.path.join(self.output_dir, f"sentence_{self.count}.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.RATE)
+            wav.writeframes(b"\0\0" * int(len(text) / self.chars_per_second * self.RATE))
+        return path
+
+def play(path):
+    """Block for the length of the audio, like a blocking write to the output stream"""
+    with wave.open(path, "rb") as wav:
+        time.sleep(wav.getnframes() / wav.getframerate())
+
+def sequential(backend, tts):
+    """The current flow: full reply, then one synthesis call, then playback"""
+    start = time.perf_counter()
+    reply = backend.chat([], model="stand-in")
+    audio_file = tts(reply)
+    first_audio = time.perf_counter() - start
+    play(audio_file)
+    return first_audio * 1000, (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-audio with sentence-pipelined TTS, using local stand-ins")
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--tokens-per-second", type=float, default=30)
+    parser.add_argument("--tts-latency-ms", type=float, default=250)
+    parser.add_argument("--tts-ms-per-char", type=float, default=2.0)
+    parser.add_argument("--speech-chars-per-second", type=float, default=60, help="Playback speed of the stand-in audio")
+    args = parser.parse_args()
+
+    # Sentence splitting keeps abbreviations and times together and merges very short sentences
+    assert list(split_sentences(["Hi! Thanks", " for calling. Dr. Lee is in at 9 a.m. tomorrow.\nBye"])) == [
+        "Hi! Thanks for calling.", "Dr. Lee is in at 9 a.m. tomorrow.", "Bye"
+    ]
+
+    output_dir = tempfile.mkdtemp(prefix="speech_pipeline_")
+    try:
+        print(f"{'reply':>5} {'sentences':>9} {'first audio seq':>16} {'first audio pipe':>17} {'done seq':>9} {'done pipe':>10} {'max gap':>8}")
+        seq_first, pipe_first = [], []
+        for i, reply in enumerate(REPLIES):
+            backend = StandInStreamingBackend(reply, args.first_token_ms, args.tokens_per_second)
+            tts = StandInTTS(output_dir, args.tts_latency_ms, args.tts_ms_per_char, args.speech_chars_per_second)
+            first_seq, done_seq = sequential(backend, tts)
+
+            spoken = []
+            pipeline = SpeechPipeline(synthesize=tts, play=play)
+            text, timings = pipeline.run(backend.stream_chat([], model="stand-in"), on_text=spoken.append)
+            assert text == reply.strip() and "".join(spoken) == reply, "the full reply is passed through"
+            assert timings.sentences >= 3
+            # The caller hears the first sentence one synthesis after it was generated
+            assert timings.first_playback_ms - timings.first_sentence_ms < timings.tts_ms[0] + 50
+
+            seq_first.append(first_seq)
+            pipe_first.append(timings.first_playback_ms)
+            gap = max(timings.playback_gaps_ms) if timings.playback_gaps_ms else 0
+            print(f"{i + 1:>5} {timings.sentences:>9} {first_seq:>13.0f} ms {timings.first_playback_ms:>14.0f} ms "
+                  f"{done_seq:>6.0f} ms {timings.playback_done_ms:>7.0f} ms {gap:>5.0f} ms")
+            print(f"      stages: first token {timings.first_token_ms:.0f} ms, first sentence {timings.first_sentence_ms:.0f} ms, "
+                  f"first audio ready {timings.first_audio_ready_ms:.0f} ms, LLM done {timings.llm_done_ms:.0f} ms")
+
+        print(f"\nMedian time to first audio: sequential {statistics.median(seq_first):.0f} ms, "
+              f"pipelined {statistics.median(pipe_first):.0f} ms")
+        assert statistics.median(pipe_first) < statistics.median(seq_first)
+
+        # Cancelling stops after the current sentence
+        tts = StandInTTS(output_dir, args.tts_latency_ms, args.tts_ms_per_char, args.speech_chars_per_second)
+        pipeline = SpeechPipeline(synthesize=tts, play=lambda path: (play(path), pipeline.cancel()))
+        _, timings = pipeline.run(StandInStreamingBackend(REPLIES[2], 0, 200).stream_chat([], model="stand-in"))
+        assert not timings.playback_gaps_ms, "nothing plays after cancel()"
+        print("cancel(): playback stopped after the first sentence")
+    finally:
+        shutil.rmtree(output_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.session_store import SQLiteSessionStore
+
+BATCH = 5
+MIN_BATCHES_BEFORE_KILL = 100
+
+# Appends batches of numbered turns over several sessions until it is killed
+WRITER = """
+import sys
+sys.path.append({root!r})
+from src.session_store import SQLiteSessionStore
+store = SQLiteSessionStore({db_file!r})
+batch = 0
+while True:
+    store.append_many([(f"session_{{i}}", {{"batch": batch, "turn": i}}) for i in range({size})])
+    if batch == {announce}:
+        print("ready", flush=True)
+    batch += 1
+"""
+
+def kill_writer_mid_run(db_file):
+    code = WRITER.format(root=project_root, db_file=db_file, size=BATCH, announce=MIN_BATCHES_BEFORE_KILL)
+    writer = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+    assert writer.stdout.readline().strip() == "ready"
+    time.sleep(0.05)
+    writer.send_signal(signal.SIGKILL)
+    writer.wait()
+
+def main():
+    directory = tempfile.mkdtemp(prefix="sqlite_session_store_")
+    try:
+        db_file = os.path.join(directory, "chat_sessions.db")
+        kill_writer_mid_run(db_file)
+        assert os.path.exists(f"{db_file}-wal"), "the killed writer left its write-ahead log behind"
+
+        # Reopening replays the WAL: every committed batch is there, in order, and none is half-written
+        store = SQLiteSessionStore(db_file)
+        histories = [store.load(f"session_{i}") for i in range(BATCH)]
+        batches = [turn["batch"] for turn in histories[0]]
+        assert len(batches) > MIN_BATCHES_BEFORE_KILL
+        assert batches == list(range(len(batches))), "no batch lost or reordered before the kill"
+        assert all([turn["batch"] for turn in history] == batches for history in histories), "batches are atomic"
+        assert store.load("session_0", last_n=3) == histories[0][-3:]
+        print(f"writer killed after {len(batches)} batches; all of them reload, none partially")
+
+        # Writes continue on the recovered database and survive another reopen
+        store.append("session_0", {"batch": len(batches), "turn": 0})
+        store.save_meta("session_0", {"summary": "after the crash"})
+        store.close()
+        reopened = SQLiteSessionStore(db_file)
+        assert reopened.load("session_0", last_n=1) == [{"batch": len(batches), "turn": 0}]
+        assert reopened.load_meta("session_0") == {"summary": "after the crash"}
+        assert reopened.list_sessions() == [f"session_{i}" for i in range(BATCH)]
+        reopened.close()
+        print("writes after recovery reload in a new connection")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import sys
+import os
+import argparse
+import base64
+import glob
+import statistics
+import tempfile
+import time
+import wave
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.streaming_stt import StandInRecognizer, wav_frames
+
+AUDIO_FIXTURES = os.path.join(project_root, "data", "audio_output", "*.wav")
+CHUNK = 1024
+
+# Upload-after-stop model for the same stand-in service
+BATCH_RECOGNITION_FACTOR = 0.15  # recognition time per second of audio
+UPLINK_BYTES_PER_SECOND = 1_000_000 / 8 * 2  # 2 Mbit/s
+
+def transcript_for(path):
+    """Sidecar <name>.txt if present, otherwise a placeholder sentence"""
+    sidecar = os.path.splitext(path)[0] + ".txt"
+    if os.path.exists(sidecar):
+        with open(sidecar, "r", encoding="utf-8") as file:
+            return file.read().strip()
+    return f"I would like to book an appointment for next week please this is fixture {os.path.basename(path)}"
+
+def stream_fixture(path, speed, final_latency_ms):
+    with wave.open(path, "rb") as wav:
+        rate, width = wav.getframerate(), wav.getsampwidth()
+        duration = wav.getnframes() / rate
+
+    transcript = transcript_for(path)
+    interims = []
+    recognizer = StandInRecognizer(transcript, final_latency_ms=final_latency_ms, sample_rate=rate, sample_width=width)
+    recognizer.start(lambda result: None if result.is_final else interims.append(result.text))
+    for frame in wav_frames(path, CHUNK, speed=speed):
+        recognizer.send(frame)
+    end_of_audio = time.perf_counter()
+    final = recognizer.finish()
+    latency = time.perf_counter() - end_of_audio
+
+    assert final == transcript, f"wrong final transcript for {path}"
+    assert interims and all(transcript.startswith(text) for text in interims), "interims must be prefixes of the final"
+    return duration, latency, len(interims)
+
+def batch_local_work(path):
+    """Time the upload-after-stop path's local work: join, temp WAV write, read back, base64"""
+    with wave.open(path, "rb") as wav:
+        params = wav.getparams()
+        frames = [wav.readframes(CHUNK) for _ in range(0, wav.getnframes(), CHUNK)]
+    start = time.perf_counter()
+    audio = b"".join(frames)
+    temp_file = os.path.join(tempfile.gettempdir(), "stt_benchmark.wav")
+    with wave.open(temp_file, "wb") as out:
+        out.setparams(params)
+        out.writeframes(audio)
+    with open(temp_file, "rb") as file:
+        payload = base64.b64encode(file.read())
+    os.remove(temp_file)
+    return time.perf_counter() - start, len(payload)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay WAV fixtures through the streaming STT path")
+    parser.add_argument("--files", type=int, default=4, help="Number of fixtures to replay (0 = all)")
+    parser.add_argument("--speed", type=float, default=4.0, help="Replay speed; 1 = real time")
+    parser.add_argument("--final-latency-ms", type=float, default=150, help="Stand-in recognizer finalisation time")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(AUDIO_FIXTURES))
+    if args.files:
+        paths = paths[:args.files]
+    if not paths:
+        print(f"No WAV fixtures found in {AUDIO_FIXTURES}")
+        return
+
+    streaming, batch = [], []
+    print(f"{'fixture':<32} {'audio s':>8} {'interims':>9} {'stream ms':>10} {'batch ms':>9}")
+    for path in paths:
+        duration, latency, interims = stream_fixture(path, args.speed, args.final_latency_ms)
+        local_work, payload_bytes = batch_local_work(path)
+        batch_latency = local_work + payload_bytes / UPLINK_BYTES_PER_SECOND + duration * BATCH_RECOGNITION_FACTOR
+        streaming.append(latency)
+        batch.append(batch_latency)
+        print(f"{os.path.basename(path):<32} {duration:>8.1f} {interims:>9} {latency * 1000:>10.0f} {batch_latency * 1000:>9.0f}")
+
+    print(f"\nEnd of audio -> final transcript, median: streaming {statistics.median(streaming) * 1000:.0f} ms, "
+          f"upload after stop {statistics.median(batch) * 1000:.0f} ms (modelled upload and recognition)")
+    assert max(streaming) < 0.5, "final transcript should arrive within a few hundred ms of the end of audio"
+
+if __name__ == "__main__":
+    main()
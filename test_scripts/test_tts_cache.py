@@ -0,0 +1,107 @@
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.tts_cache import TTSCache, canned_responses, tts_cache_key
+
+SYNTHESIS_SECONDS = 0.3  # typical round trip to the synthesis API
+AUDIO_BYTES = 200_000    # roughly 6 s of 16 kHz LINEAR16 audio
+
+class FakeSynthesizer:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            self.calls += 1
+        time.sleep(SYNTHESIS_SECONDS)
+        return text.encode("utf-8").ljust(AUDIO_BYTES, b"\0")
+
+def key_for(text):
+    return tts_cache_key(text, "en-US-Neural2-F", "en-US", 0.9, 0.0, "LINEAR16")
+
+def test_repeated_responses(cache_dir):
+    synthesizer = FakeSynthesizer()
+    cache = TTSCache(cache_dir)
+    texts = canned_responses()
+
+    start = time.perf_counter()
+    for text in texts:
+        cache.fetch(key_for(text), lambda: synthesizer(text))
+    prewarm_seconds = time.perf_counter() - start
+    assert synthesizer.calls == len(texts), "every canned response is synthesized once"
+
+    # A day of calls repeating the same canned lines
+    latencies = []
+    for _ in range(20):
+        for text in texts:
+            start = time.perf_counter()
+            path = cache.fetch(key_for(text), lambda: synthesizer(text))
+            latencies.append(time.perf_counter() - start)
+            assert path and os.path.exists(path)
+    assert synthesizer.calls == len(texts), "repeats must not call the API"
+    print(f"{len(texts)} canned responses pre-warmed in {prewarm_seconds:.1f}s; "
+          f"{len(latencies)} repeats served in {max(latencies) * 1000:.2f} ms max "
+          f"(vs {SYNTHESIS_SECONDS * 1000:.0f} ms per API call)")
+
+    # Any change to the voice settings is a different entry
+    assert key_for(texts[0]) != tts_cache_key(texts[0], "en-US-Neural2-F", "en-US", 1.0, 0.0, "LINEAR16")
+
+def test_budget_and_eviction(cache_dir):
+    synthesizer = FakeSynthesizer()
+    cache = TTSCache(cache_dir, max_bytes=AUDIO_BYTES * 5)
+    for i in range(5):
+        cache.fetch(key_for(f"answer {i}"), lambda: synthesizer(f"answer {i}"))
+    # Touch answer 0 so answer 1 is the least recently used
+    assert cache.get(key_for("answer 0"))
+    cache.fetch(key_for("answer 5"), lambda: synthesizer("answer 5"))
+    assert cache.size_bytes() <= cache.max_bytes and len(cache) == 5
+    assert cache.get(key_for("answer 1")) is None, "least recently used entry is evicted"
+    assert cache.get(key_for("answer 0")), "recently used entry is kept"
+    files = os.listdir(cache_dir)
+    assert len(files) == 5, f"disk holds only the budget, found {len(files)} files"
+
+    # Recency survives a restart: mtimes order the index
+    time.sleep(0.01)
+    cache.get(key_for("answer 2"))
+    reopened = TTSCache(cache_dir, max_bytes=AUDIO_BYTES * 4)
+    assert reopened.get(key_for("answer 2")), "entry used most recently before the restart is kept"
+    assert len(reopened) == 4
+    print(f"Budget of {cache.max_bytes // 1000} KB held at {len(cache)} files with {cache.stats['evictions']} evictions; "
+          "LRU order restored after restart")
+
+def test_concurrent_misses(cache_dir):
+    synthesizer = FakeSynthesizer()
+    cache = TTSCache(cache_dir)
+    text = "We're open from 9 AM to 5 PM, Monday through Friday."
+    paths = []
+    threads = [
+        threading.Thread(target=lambda: paths.append(cache.fetch(key_for(text), lambda: synthesizer(text))))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert synthesizer.calls == 1 and len(set(paths)) == 1, "concurrent misses share one synthesis"
+    assert cache.fetch(key_for("failed"), lambda: None) is None and cache.get(key_for("failed")) is None
+    print("8 concurrent requests for the same answer made 1 API call; failed synthesis is not cached")
+
+def main():
+    for test in (test_repeated_responses, test_budget_and_eviction, test_concurrent_misses):
+        cache_dir = tempfile.mkdtemp(prefix="tts_cache_")
+        try:
+            test(cache_dir)
+        finally:
+            shutil.rmtree(cache_dir)
+
+if __name__ == "__main__":
+    main()
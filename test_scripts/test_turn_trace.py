@@ -0,0 +1,147 @@
+import sys
+import os
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.turn_trace import TURN_LATENCY_BUDGET_MS, TurnTrace, histogram, over_budget, stage_percentiles, traced
+
+# Stand-in stage durations in ms (mean, jitter), roughly what a REST turn costs
+STAGE_MS = {
+    "endpoint": (1000, 50),
+    "encode": (5, 2),
+    "stt": (600, 300),
+    "retrieval": (80, 30),
+    "intent": (40, 20),
+    "llm": (900, 500),
+    "tts": (300, 150),
+    "playback_start": (15, 5)
+}
+
+def simulated_turn(rng, scale):
+    """A traced turn with sleeps standing in for each stage; returns the turn saved at first audio"""
+    saved = []
+    trace = TurnTrace()
+    # The turn is saved when the first audio plays, with the complete trace
+    trace.on_finish(lambda: saved.append({"timestamp": time.time(), **trace.to_turn_fields()}))
+    for stage, (mean, jitter) in STAGE_MS.items():
+        with traced(trace, stage):
+            time.sleep(max(0.0, rng.gauss(mean, jitter)) * scale / 1000)
+    assert not saved, "nothing is saved before the first audio"
+    trace.finish()
+    trace.finish()
+    assert len(saved) == 1, "finish() saves the turn exactly once"
+    return saved[0]
+
+def check_unfinished_turns_saved():
+    """A traced turn whose trace is never finished is still saved, without a latency"""
+    from src.llm_backend import LLMBackend
+    from src.llm_service import LLMService
+    from src.session_store import FileSessionStore
+
+    class CannedBackend(LLMBackend):
+        def chat(self, messages, model, temperature=0.7):
+            return "We are open 9 to 5."
+
+    directory = tempfile.mkdtemp(prefix="turn_trace_")
+    try:
+        store = FileSessionStore(directory)
+        llm_service = LLMService(backend=CannedBackend(), session_store=store)
+        session_id = llm_service.generate_session_id()
+
+        finished = TurnTrace()
+        llm_service.handle_chat("What are your hours?", session_id, trace=finished)
+        assert store.load(session_id) == [], "a traced turn waits for its first audio"
+        finished.finish()
+        assert store.load(session_id)[0]["latency_ms"] == finished.latency_ms
+
+        # The caller never calls finish(): the next turn saves it before reading the history
+        llm_service.handle_chat("Where are you located?", session_id, trace=TurnTrace())
+        llm_service.handle_chat("Do you take walk-ins?", session_id)
+        turns = store.load(session_id)
+        assert [turn["user"] for turn in turns] == ["What are your hours?", "Where are you located?", "Do you take walk-ins?"]
+        assert turns[1]["latency_ms"] is None and "stages" in turns[1]
+
+        # ... and so does process exit
+        llm_service.handle_chat("Bye!", session_id, trace=TurnTrace())
+        llm_service.save_unfinished_turns()
+        assert store.load(session_id)[-1]["user"] == "Bye!"
+        print("unfinished traced turns saved without latency")
+    finally:
+        shutil.rmtree(directory)
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn tracing, deferred saves and the latency report")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--scale", type=float, default=0.05, help="Fraction of the stand-in stage times to actually sleep")
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    # Stage bookkeeping: first occurrence wins, untraced turns are a no-op
+    trace = TurnTrace(start=time.monotonic() - 0.5)
+    trace.add("tts", 120)
+    trace.add("tts", 90)
+    assert trace.stages == {"tts": 120}, "a pipelined reply keeps the first sentence's synthesis"
+    with traced(None, "stt"):
+        pass
+    threads = [threading.Thread(target=trace.add, args=("stt", i)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(trace.stages) == 2
+    trace.finish()
+    assert trace.latency_ms >= 500, "the clock starts at the end of the caller's speech"
+    late = []
+    trace.on_finish(lambda: late.append(True))
+    assert late, "callbacks registered after finish() run immediately"
+    abandoned = TurnTrace()
+    saved = []
+    abandoned.on_finish(lambda: saved.append(abandoned.to_turn_fields()))
+    abandoned.abandon()
+    abandoned.finish()
+    assert saved == [{"latency_ms": None, "stages": {}}], "an abandoned trace saves once, without a latency"
+
+    turns = [simulated_turn(rng, args.scale) for _ in range(args.turns)]
+    for turn in turns:
+        assert turn["latency_ms"] >= sum(turn["stages"].values()) - 1, "stages fit inside the end-to-end latency"
+
+    # Report in real milliseconds: scale the sleeps back up
+    for turn in turns:
+        turn["latency_ms"] = round(turn["latency_ms"] / args.scale, 1)
+        turn["stages"] = {stage: round(ms / args.scale, 1) for stage, ms in turn["stages"].items()}
+    turns.append({"role": "user", "content": "typed, not traced"})
+    sessions = {"session_a": turns[:len(turns) // 2], "session_b": turns[len(turns) // 2:]}
+
+    report = stage_percentiles(turns)
+    assert list(report)[:2] == ["endpoint", "encode"] and list(report)[-1] == "end_to_end", "pipeline order"
+    assert report["end_to_end"]["count"] == args.turns
+    print(f"{'stage':<16} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for stage, row in report.items():
+        assert row["p50_ms"] <= row["p95_ms"] <= row["p99_ms"] <= row["max_ms"]
+        print(f"{stage:<16} {row['count']:>6} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['max_ms']:>8.0f}")
+
+    latencies = [turn["latency_ms"] for turn in turns if "latency_ms" in turn]
+    buckets = histogram(latencies, buckets_ms=(2000, 2500, 3000, 4000))
+    assert sum(count for _, count in buckets) == args.turns
+    print("\n" + "  ".join(f"{label} ms: {count}" for label, count in buckets))
+
+    slow = over_budget(sessions, TURN_LATENCY_BUDGET_MS)
+    assert len(slow) == sum(latency > TURN_LATENCY_BUDGET_MS for latency in latencies)
+    assert all(a["latency_ms"] >= b["latency_ms"] for a, b in zip(slow, slow[1:])), "slowest first"
+    print(f"\n{len(slow)} of {args.turns} turns over the {TURN_LATENCY_BUDGET_MS} ms budget")
+    for row in slow[:5]:
+        print(f"  {row['session_id']} turn {row['turn']}: {row['latency_ms']:.0f} ms "
+              f"(slowest: {row['slowest_stage']} {row['slowest_stage_ms']:.0f} ms)")
+
+    check_unfinished_turns_saved()
+
+if __name__ == "__main__":
+    main()
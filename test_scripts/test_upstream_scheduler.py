@@ -0,0 +1,130 @@
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.upstream_scheduler import (
+    HOLD_MESSAGE, PRIORITY_BACKGROUND, PRIORITY_LIVE_CHAT, PRIORITY_LIVE_VOICE, ProviderLimits,
+    SchedulerOverloaded, UpstreamScheduler, set_scheduler
+)
+
+def expect_overloaded(fn):
+    try:
+        fn()
+    except SchedulerOverloaded:
+        return
+    raise AssertionError("request was admitted instead of shed")
+
+def check_priority_order():
+    """With one slot busy, queued requests are admitted live voice first, background last"""
+    scheduler = UpstreamScheduler({"llm": ProviderLimits(max_concurrency=1)})
+    order = []
+    threads = []
+    with scheduler.slot("llm"):
+        for priority in (PRIORITY_BACKGROUND, PRIORITY_LIVE_CHAT, PRIORITY_LIVE_VOICE):
+            thread = threading.Thread(target=scheduler.call, args=("llm", lambda p=priority: order.append(p), priority))
+            thread.start()
+            threads.append(thread)
+            while scheduler.stats()["llm"]["queue_depth"] < len(threads):
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert order == [PRIORITY_LIVE_VOICE, PRIORITY_LIVE_CHAT, PRIORITY_BACKGROUND], order
+    print("queued requests admitted in priority order")
+
+def check_shedding():
+    scheduler = UpstreamScheduler({"llm": ProviderLimits(max_concurrency=1, max_queue=1)})
+    with scheduler.slot("llm"):
+        # Past its deadline
+        start = time.monotonic()
+        expect_overloaded(lambda: scheduler.call("llm", lambda: None, PRIORITY_LIVE_VOICE, deadline=0.05))
+        assert time.monotonic() - start < 1.0
+        # Queue full
+        waiter = threading.Thread(target=scheduler.call, args=("llm", lambda: None, PRIORITY_BACKGROUND))
+        waiter.start()
+        while scheduler.stats()["llm"]["queue_depth"] < 1:
+            time.sleep(0.001)
+        expect_overloaded(lambda: scheduler.call("llm", lambda: None, PRIORITY_LIVE_VOICE))
+    waiter.join()
+    stats = scheduler.stats()["llm"]
+    assert stats["shed"] == 2 and stats["admitted"] == 2 and stats["active"] == 0
+    print("requests past their deadline or over the queue limit shed")
+
+def check_hold_message():
+    """An overloaded LLM turn is answered with HOLD_MESSAGE and not saved to the history"""
+    from src.llm_backend import LLMBackend
+    from src.llm_service import LLMService
+    from src.session_store import FileSessionStore
+
+    class CountingBackend(LLMBackend):
+        calls = 0
+
+        def chat(self, messages, model, temperature=0.7):
+            self.calls += 1
+            return "We are open 9 to 5."
+
+    directory = tempfile.mkdtemp(prefix="upstream_scheduler_")
+    backend = CountingBackend()
+    set_scheduler(UpstreamScheduler({"llm": ProviderLimits(max_concurrency=1, max_queue=0)}))
+    try:
+        store = FileSessionStore(directory)
+        llm_service = LLMService(backend=backend, session_store=store)
+        session_id = llm_service.generate_session_id()
+        assert llm_service.handle_chat("What are your hours?", session_id) == HOLD_MESSAGE
+        assert backend.calls == 0 and store.load(session_id) == []
+        print("overloaded turn answered with the hold message, history untouched")
+    finally:
+        set_scheduler(None)
+        shutil.rmtree(directory)
+
+def check_voice_hold_message():
+    """A shed STT or TTS request in the voice path plays the cached hold message instead"""
+    from src.streaming_stt import StandInRecognizer
+    from src.tts_cache import TTSCache
+    from src.voice_interface import VoiceInterface
+
+    directory = tempfile.mkdtemp(prefix="upstream_scheduler_voice_")
+    # No queue: every STT and TTS request is shed
+    scheduler = UpstreamScheduler({"stt": ProviderLimits(max_concurrency=1, max_queue=0),
+                                   "tts": ProviderLimits(max_concurrency=1, max_queue=0)})
+    set_scheduler(scheduler)
+    os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+    try:
+        voice = VoiceInterface(tts_cache=TTSCache(os.path.join(directory, "tts_cache")))
+        hold_audio = voice.tts_cache.put(voice._tts_key(HOLD_MESSAGE), b"hold clip", voice.tts_encoding)
+        played = []
+        voice.speak = lambda audio_file: played.append(audio_file) or True
+        voice.play_audio_response = played.append
+        # Recorded utterance: the upload is shed
+        voice.audio_buffer.write(b"\x00\x01" * 1600)
+        assert voice.transcribe_audio() == "" and played == [hold_audio]
+
+        # Streaming recognizer shed: no second STT request is made for the same utterance
+        voice.recognizer = StandInRecognizer("What are your hours?")
+        voice.recognizer.start()
+        assert voice.finish_transcription() == "" and played == [hold_audio] * 2
+
+        # Synthesis shed: the reply is replaced by the hold message, spoken once per streamed reply
+        assert voice.text_to_speech("We are open 9 to 5.") == hold_audio
+        voice.speak_stream(iter(["We are open from 9 to 5 on weekdays. ", "On Saturdays we open at 10 in the morning. "]))
+        assert played == [hold_audio] * 3
+        assert scheduler.stats()["stt"]["shed"] == 2
+        print("shed voice STT and TTS requests answered with the cached hold message")
+    finally:
+        set_scheduler(None)
+        shutil.rmtree(directory)
+
+def main():
+    check_priority_order()
+    check_shedding()
+    check_hold_message()
+    check_voice_hold_message()
+
+if __name__ == "__main__":
+    main()
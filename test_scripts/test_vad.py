@@ -0,0 +1,126 @@
+import sys
+import os
+import argparse
+import glob
+import random
+import statistics
+import struct
+import time
+import wave
+
+# Add the root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from src.audio_buffer import AudioRingBuffer
+from src.voice_activity import NO_SPEECH, SPEECH_END, SPEECH_START, VADConfig, VoiceActivityDetector, frame_rms
+
+AUDIO_FIXTURES = os.path.join(project_root, "data", "audio_output", "*.wav")
+CHUNK = 1024
+LEADING_SILENCE = 1.0   # seconds between clicking record and starting to speak
+TRAILING_SILENCE = 2.0  # seconds between finishing speaking and clicking stop
+NOISE_LEVEL = 60        # background noise standard deviation (16-bit samples)
+
+def noise(seconds, rate, rng):
+    count = int(seconds * rate)
+    return struct.pack(f"<{count}h", *(int(rng.gauss(0, NOISE_LEVEL)) for _ in range(count)))
+
+def capture(stream, rate, config, endpointing=True):
+    """Run the VoiceInterface capture loop over a byte stream; returns (buffer, event times, vad ms per frame)"""
+    vad = VoiceActivityDetector(rate, 2, config)
+    buffer = AudioRingBuffer(sample_rate=rate)
+    events = {}
+    frame_bytes = CHUNK * 2
+    vad_time = 0.0
+    frames = 0
+    for offset in range(0, len(stream), frame_bytes):
+        frame = stream[offset:offset + frame_bytes]
+        start = time.perf_counter()
+        event = vad.process(frame)
+        vad_time += time.perf_counter() - start
+        frames += 1
+        if event == SPEECH_START:
+            for pending in vad.take_pre_roll():
+                buffer.write(pending)
+        elif vad.in_speech:
+            buffer.write(frame)
+        if event and event not in events:
+            events[event] = (offset + len(frame)) / (rate * 2)
+        if endpointing and event in (SPEECH_END, NO_SPEECH):
+            break
+    if vad.in_speech:
+        buffer.truncate(vad.trailing_bytes())
+    return buffer, events, vad_time / frames * 1000
+
+def last_speech_seconds(speech, rate):
+    """End of the last frame loud enough to be speech (recordings may carry their own trailing silence)"""
+    frame_bytes = CHUNK * 2
+    end = 0
+    for offset in range(0, len(speech), frame_bytes):
+        if frame_rms(speech[offset:offset + frame_bytes]) >= VADConfig().min_rms:
+            end = min(offset + frame_bytes, len(speech))
+    return end / (rate * 2)
+
+def run_fixtures(fixtures, config, verbose):
+    latency_saved, bytes_saved, vad_costs, premature = [], [], [], 0
+    for name, rate, stream, speech_seconds in fixtures:
+        buffer, events, vad_ms = capture(stream, rate, config)
+        speech_end = LEADING_SILENCE + speech_seconds
+        # Without VAD the turn ends when stop is clicked, after all of the trailing silence
+        stop_clicked = len(stream) / (rate * 2)
+        endpoint_delay = events.get(SPEECH_END, stop_clicked) - speech_end
+        saved_fraction = 1 - len(buffer) / len(stream)
+        vad_costs.append(vad_ms)
+        if endpoint_delay < 0:
+            # A pause inside the utterance was longer than the hangover
+            premature += 1
+        else:
+            latency_saved.append((stop_clicked - speech_end - endpoint_delay) * 1000)
+            bytes_saved.append(saved_fraction)
+        if verbose:
+            print(f"  {name:<32} {speech_seconds:>6.1f}s {len(stream) / 1024:>6.0f} KB -> {len(buffer) / 1024:>5.0f} KB "
+                  f"endpoint {endpoint_delay * 1000:>7.0f} ms after speech")
+    return latency_saved, bytes_saved, vad_costs, premature
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure VAD endpointing savings over recorded WAV fixtures")
+    parser.add_argument("--hangover-ms", type=float, nargs="*", default=[700, 1000, 1500])
+    parser.add_argument("--files", type=int, default=0, help="Number of fixtures (0 = all)")
+    parser.add_argument("--verbose", action="store_true", help="Print every fixture")
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    paths = sorted(glob.glob(AUDIO_FIXTURES))
+    if args.files:
+        paths = paths[:args.files]
+    fixtures = []
+    for path in paths:
+        with wave.open(path, "rb") as wav:
+            rate = wav.getframerate()
+            speech = wav.readframes(wav.getnframes())
+        stream = noise(LEADING_SILENCE, rate, rng) + speech + noise(TRAILING_SILENCE, rate, rng)
+        fixtures.append((os.path.basename(path), rate, stream, last_speech_seconds(speech, rate)))
+    if not fixtures:
+        print(f"No WAV fixtures found in {AUDIO_FIXTURES}")
+        return
+
+    print(f"{len(fixtures)} fixtures, each padded with {LEADING_SILENCE}s before and {TRAILING_SILENCE}s after speech "
+          f"(the time taken to click record and stop)\n")
+    print(f"{'hangover ms':>11} {'complete':>9} {'premature':>10} {'latency saved':>14} {'bytes saved':>12} {'VAD ms/frame':>13}")
+    for hangover in args.hangover_ms:
+        latency_saved, bytes_saved, vad_costs, premature = run_fixtures(
+            fixtures, VADConfig(hangover_ms=hangover), args.verbose
+        )
+        complete = len(latency_saved)
+        print(f"{hangover:>11.0f} {complete:>9} {premature:>10} "
+              f"{(statistics.median(latency_saved) if complete else 0):>11.0f} ms "
+              f"{(statistics.median(bytes_saved) if complete else 0):>12.0%} {statistics.mean(vad_costs):>13.3f}")
+    print("\nPremature: the turn ended during a pause inside the utterance.")
+
+    # A recording with nobody speaking is discarded before any STT call
+    buffer, events, _ = capture(noise(10.0, 16000, rng), 16000, VADConfig())
+    assert len(buffer) == 0 and NO_SPEECH in events, "silent recording should be discarded"
+    print(f"Silent recording: discarded after {events[NO_SPEECH]:.1f}s, 0 bytes uploaded")
+
+if __name__ == "__main__":
+    main()